@@ -1,7 +1,8 @@
 """Lab_3 apps package init."""
 __all__ = [
+    "concurrency",
     "config",
-    "retry",
+    "metrics",
     "openrouter_client",
     "runner",
 ]
@@ -0,0 +1,152 @@
+"""Adaptive concurrency limiting for batch runs.
+
+Instead of a hand-picked ``limit``, ``AdaptiveLimit`` discovers how much
+concurrency the upstream can take. It follows AIMD: while round-trip
+times stay close to the best one seen, the limit grows by about one per
+limit's worth of completed calls. Timeouts, 429s or RTTs inflated past
+``latency_tolerance`` times the baseline cut it multiplicatively, at most
+once per RTT so one burst of failures is not counted many times. A call
+cut short by the caller's own deadline says nothing about the upstream and
+leaves the limit alone.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+import httpx
+
+from common.deadline import DeadlineExceeded
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Timeouts and HTTP 429 mean the upstream is overloaded; other errors do not."""
+    if isinstance(exc, DeadlineExceeded):
+        # The caller's budget ran out, not the upstream's capacity
+        return False
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, httpx.TimeoutException)):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit driven by round-trip time and overload signals."""
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        backoff_ratio: float = 0.7,
+        latency_tolerance: float = 2.0,
+        rtt_alpha: float = 0.2,
+        baseline_window: int = 500,
+        is_drop: Callable[[BaseException], bool] = is_overload,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            initial_limit: Concurrency to start from
+            min_limit: Floor the limit is never cut below
+            max_limit: Ceiling the limit never grows past
+            backoff_ratio: Multiplier applied to the limit on overload
+            latency_tolerance: RTT over this multiple of the baseline counts as overload
+            rtt_alpha: EWMA weight of the newest RTT sample
+            baseline_window: Samples after which the baseline (minimum) RTT is
+                re-learned, so a permanently slower upstream is not punished forever
+            is_drop: Decides whether a failed call signals overload
+            clock: Monotonic time source (overridable in tests)
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("require 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff_ratio < 1:
+            raise ValueError("backoff_ratio must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.rtt_alpha = rtt_alpha
+        self.baseline_window = baseline_window
+        self.is_drop = is_drop
+        self._clock = clock
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._changed = asyncio.Condition()
+        self.rtt: Optional[float] = None
+        self.min_rtt: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = float("-inf")
+        self.drops = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        """Wait until a call fits under the current limit."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def release(self, rtt: Optional[float] = None, dropped: bool = False) -> None:
+        """Finish a call; ``rtt=None`` (e.g. a cancelled call) leaves the limit alone."""
+        async with self._changed:
+            self._in_flight -= 1
+            if rtt is not None:
+                self.on_sample(rtt, dropped)
+            self._changed.notify_all()
+
+    def on_sample(self, rtt: float, dropped: bool = False) -> None:
+        """Adjust the limit for one completed call."""
+        self._samples += 1
+        self.rtt = rtt if self.rtt is None else self.rtt + self.rtt_alpha * (rtt - self.rtt)
+        if self.min_rtt is None or rtt < self.min_rtt:
+            self.min_rtt = rtt
+        elif self._samples % self.baseline_window == 0:
+            self.min_rtt = self.rtt
+
+        if dropped:
+            self.drops += 1
+        inflated = self.min_rtt > 0 and self.rtt > self.latency_tolerance * self.min_rtt
+        if dropped or inflated:
+            now = self._clock()
+            # One cut per round trip: the calls that overlapped it saw the same overload
+            if now - self._last_decrease >= self.rtt:
+                self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+                self._last_decrease = now
+        elif self._in_flight + 1 >= self.limit / 2:
+            # Only grow when the limit is actually being used
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+
+    @asynccontextmanager
+    async def permit(self) -> AsyncIterator[None]:
+        """Hold one slot for a call, timing it and classifying its failure."""
+        await self.acquire()
+        started = self._clock()
+        try:
+            yield
+        except DeadlineExceeded:
+            # A truncated call is neither an RTT sample nor an overload signal
+            await self.release()
+            raise
+        except Exception as exc:
+            await self.release(self._clock() - started, self.is_drop(exc))
+            raise
+        except BaseException:
+            await self.release()
+            raise
+        await self.release(self._clock() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "rtt": self.rtt,
+            "min_rtt": self.min_rtt,
+            "drops": self.drops,
+        }
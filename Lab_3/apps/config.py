@@ -21,11 +21,14 @@ API_KEY = _load_local_key() or os.getenv("OPENROUTER_API_KEY", "")
 # OpenRouter endpoint and default model
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 DEFAULT_MODEL = "mistralai/devstral-2512:free"
+# Equivalent models to route across (comma-separated); a pool of one is a fixed model
+MODEL_POOL = [m.strip() for m in os.getenv("OPENROUTER_MODELS", "").split(",") if m.strip()] or [DEFAULT_MODEL]
 
 CONFIG = {
     "API_KEY": API_KEY,
     "OPENROUTER_URL": OPENROUTER_URL,
     "DEFAULT_MODEL": DEFAULT_MODEL,
+    "MODEL_POOL": MODEL_POOL,
     "TIMEOUT": 30,  # seconds
     "RETRY_COUNT": 3,
 }
@@ -0,0 +1,40 @@
+"""Metrics of the OpenRouter client.
+
+They are defined on the shared registry of ``common.metrics``; serve
+``REGISTRY.expose()`` from whatever process embeds the client.
+"""
+from common.metrics import CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram  # noqa: F401
+
+
+# --- Metrics of the OpenRouter client ------------------------------------
+
+PHASE_SECONDS = Histogram(
+    "openrouter_client_phase_seconds",
+    "Time spent per phase of an upstream attempt: queueing (scheduler slot and rate limiter), upstream and parsing",
+    ["phase"],
+)
+RESPONSES = Counter(
+    "openrouter_client_responses_total",
+    "Upstream responses by model and status code ('error' when no response arrived)",
+    ["model", "status"],
+)
+RETRIES = Counter("openrouter_client_retries_total", "Upstream attempts that were retries")
+IN_FLIGHT = Gauge("openrouter_client_in_flight", "Upstream attempts in progress")
+POOL_CAPACITY = Gauge("openrouter_client_pool_capacity", "Connection limit summed over the open connection pools")
+# Not read from the pool: attempts blocked on a free connection are included
+INFLIGHT_RATIO = Gauge(
+    "openrouter_client_inflight_ratio",
+    "Upstream attempts in progress over the summed connection limit (a proxy; may exceed 1)",
+)
+INFLIGHT_RATIO.set_function(lambda: IN_FLIGHT.value() / POOL_CAPACITY.value() if POOL_CAPACITY.value() else 0.0)
+TOKENS = Counter("openrouter_client_tokens_total", "Tokens reported in upstream usage, by model and kind", ["model", "kind"])
+
+
+def record_usage(usage: object, model: str) -> None:
+    """Count prompt and completion tokens from an upstream ``usage`` object."""
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if isinstance(tokens, (int, float)):
+            TOKENS.labels(model, kind).inc(tokens)
@@ -1,15 +1,27 @@
 """Async OpenRouter client with timeout and retry behaviour.
 
-This module will try to import configuration and an async retry helper
-from `app.config` and `app.retry`. If those aren't available it will
-fall back to reasonable defaults.
+This module will try to import configuration from `app.config`. If that
+isn't available it will fall back to reasonable defaults. Retries go
+through the shared engine in `common.retry`.
 """
 import asyncio
-from typing import Any
+import time
+from contextlib import nullcontext
+from typing import Dict, Optional, Union
 
 import httpx
 
-# Try importing settings and retry helper from expected package locations
+from common.breaker import OPEN, CircuitBreaker
+from common.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from common.ratelimit import AdaptiveRateLimiter
+from common.retry import RetryBudget, RetryPolicy, acall_with_retry, parse_retry_after
+from common.router import LatencyRouter
+from common.scheduler import FairScheduler, current_priority, schedule_as
+from common.singleflight import SingleFlight
+from common.sqlite_cache import SQLiteCache, content_key
+from .metrics import IN_FLIGHT, PHASE_SECONDS, POOL_CAPACITY, RESPONSES, RETRIES, record_usage
+
+# Try importing settings from expected package locations
 try:
     from app.config import OPENROUTER_API_KEY, OPENROUTER_URL, DEFAULT_MODEL
 except Exception:
@@ -25,136 +37,315 @@ except Exception:
         DEFAULT_MODEL = "gpt-4o-mini"
 
 try:
-    from app.retry import retry_async  # type: ignore
-except Exception:
-    retry_async = None
+    import h2  # noqa: F401
 
+    _HAS_H2 = True
+except ImportError:
+    _HAS_H2 = False
 
-def _make_retry_decorator(attempts: int = 3, delay: float = 1.0):
-    """Return an async retry decorator used as a fallback when `retry_async` is missing."""
 
-    def decorator(fn):
-        async def wrapper(*args, **kwargs):
-            last_exc = None
-            for attempt in range(attempts):
-                try:
-                    return await fn(*args, **kwargs)
-                except httpx.HTTPStatusError as e:
-                    status = e.response.status_code if e.response is not None else None
-                    if status == 429 or (status is not None and 500 <= status < 600):
-                        last_exc = e
-                        await asyncio.sleep(delay)
-                        continue
-                    raise
-                except (httpx.ReadTimeout, httpx.ConnectError, httpx.TransportError) as e:
-                    last_exc = e
-                    await asyncio.sleep(delay)
-                    continue
-            raise last_exc
+def is_transient_error(exc: BaseException) -> bool:
+    """Retry on timeouts, transport errors, HTTP 429 and 5xx; never on other 4xx."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status == 429 or (status is not None and 500 <= status < 600)
+    return isinstance(exc, httpx.TransportError)
 
-        return wrapper
 
-    return decorator
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Count 5xx and transport errors against the upstream; 4xx (incl. 429) do not."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status is not None and status >= 500
+    return isinstance(exc, httpx.TransportError)
 
 
 class OpenRouterClient:
-    def __init__(self, model: str = DEFAULT_MODEL, timeout_s: float = 15.0) -> None:
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        timeout_s: float = 15.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        coalesce: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        router: Optional[LatencyRouter] = None,
+        scheduler: Optional[FairScheduler] = None,
+        cache: Optional[SQLiteCache] = None,
+        url: Optional[str] = None,
+        max_tokens: int = 256,
+    ) -> None:
         self.model = model
+        # Endpoint override, e.g. a local mock upstream for benchmarks
+        self.url = url or OPENROUTER_URL
         self.timeout_s = timeout_s
+        # Completion cap sent with each request; the limiter reserves it up front with the prompt
+        self.max_tokens = max_tokens
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it
+        self.http2 = http2 and _HAS_H2
+        self._client = None
+        # When enabled, concurrent generate() calls for the same prompt share one request
+        self._flight = SingleFlight() if coalesce else None
+        # Backoff with jitter, honouring Retry-After; the budget is per client
+        self.retry_policy = retry_policy or RetryPolicy(
+            attempts=3,
+            base_delay=0.5,
+            max_delay=10.0,
+            retryable=is_transient_error,
+            budget=RetryBudget(),
+            min_attempt_time=0.1,
+        )
+        # Optional limiter, typically shared by every client hitting the same account
+        self.rate_limiter = rate_limiter
+        # Optional breaker; build it with is_failure=is_upstream_failure. It guards
+        # ``model``; routed models each get a clone, so one dead target cannot
+        # open the circuit for the healthy ones
+        self.breaker = breaker
+        self._breakers: Dict[str, CircuitBreaker] = {model: breaker} if breaker is not None else {}
+        # Optional router over a pool of equivalent models; replaces the fixed model.
+        # Build it with is_failure=is_upstream_failure; it re-probes with this client
+        self.router = router
+        if router is not None and router.probe is None:
+            router.probe = self.probe
+        # Optional shared budget; attempts queue by the class/tenant set with schedule_as
+        self.scheduler = scheduler
+        # Optional persistent cache (may be shared across processes); reruns of a job are served from it
+        self.cache = cache
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the long-lived pooled client, creating it on first use."""
+        if self._client is None:
+            kwargs = {"timeout": httpx.Timeout(self.timeout_s), "limits": self.limits}
+            if self.http2:
+                kwargs["http2"] = True
+            self._client = httpx.AsyncClient(**kwargs)
+            POOL_CAPACITY.inc(self.limits.max_connections)
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled client and its keep-alive connections."""
+        if self.router is not None:
+            await self.router.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            POOL_CAPACITY.dec(self.limits.max_connections)
+
+    async def __aenter__(self) -> "OpenRouterClient":
+        self._get_client()
+        if self.router is not None:
+            self.router.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
 
     async def _call_api(self, prompt: str) -> str:
+        """Make one attempt, failing fast while the circuit breaker is open."""
+        if self.scheduler is None:
+            return await self._routed_post(prompt)
+        # Slots are taken per attempt, so backoff sleeps don't hold one
+        started = time.perf_counter()
+        async with self.scheduler.slot():
+            PHASE_SECONDS.labels("queueing").observe(time.perf_counter() - started)
+            return await self._routed_post(prompt)
+
+    async def _routed_post(self, prompt: str) -> str:
+        if self.router is None:
+            return await self._guarded_post(prompt, self.model)
+        # Each attempt is routed afresh, so a retry can move to a healthier target;
+        # targets whose breaker is open are skipped while another one is available
+        tripped = [name for name, breaker in self._breakers.items() if breaker.state == OPEN]
+        return await self._guarded_post(prompt, self.router.pick(exclude=tripped))
+
+    def _guard(self, model: str):
+        """Circuit-breaker guard for one attempt to model (no-op without a breaker)."""
+        if self.breaker is None:
+            return nullcontext()
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = self.breaker.clone()
+        return breaker.guard()
+
+    async def _guarded_post(self, prompt: str, model: str) -> str:
+        # The breaker is checked first: a call it rejects never reached the target,
+        # so it must not show up in the router's latency and error stats
+        with self._guard(model):
+            if self.router is None:
+                return await self._post(prompt, model)
+            with self.router.track(model):
+                return await self._post(prompt, model)
+
+    async def probe(self, model: str) -> None:
+        """Cheap health check for the router: one tiny request to model."""
+        await self._post("ping", model, max_tokens=1)
+
+    async def _post(self, prompt: str, model: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
         headers = {}
         if OPENROUTER_API_KEY:
             headers["Authorization"] = f"Bearer {OPENROUTER_API_KEY}"
 
-        timeout = httpx.Timeout(self.timeout_s)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # Post a minimal payload; adapter users may change this shape
-            resp = await client.post(OPENROUTER_URL, json={"model": self.model, "input": prompt}, headers=headers)
+        client = self._get_client()
+        max_tokens = max_tokens or self.max_tokens
+        # Prompt estimate plus the whole completion cap; settled against the reported usage
+        reserved = len(prompt) // 4 + 1 + max_tokens
+        if self.rate_limiter is not None:
+            with PHASE_SECONDS.time("queueing"):
+                await self.rate_limiter.acquire(reserved)
+        # Post a minimal payload; adapter users may change this shape
+        kwargs = {}
+        deadline = current_deadline()
+        if deadline is not None:
+            # The attempt may not outlive the caller's overall budget
+            kwargs["timeout"] = deadline.timeout(self.timeout_s)
+        model = model or self.model
+        IN_FLIGHT.inc()
+        try:
+            with PHASE_SECONDS.time("upstream"):
+                resp = await client.post(self.url, json={"model": model, "input": prompt, "max_tokens": max_tokens}, headers=headers, **kwargs)
+        except httpx.TransportError:
+            RESPONSES.labels(model, "error").inc()
+            raise
+        finally:
+            IN_FLIGHT.dec()
+        RESPONSES.labels(model, resp.status_code).inc()
+        data = None
+        if resp.status_code < 400:
+            # Decode the body once; the limiter and the parser both read it
+            with PHASE_SECONDS.time("parsing"):
+                data = self._decode(resp)
+        if self.rate_limiter is not None:
+            self._observe_rate_limit(resp, reserved, data)
+
+        # Retryable statuses: 429 and 5xx
+        if resp.status_code == 429 or 500 <= resp.status_code < 600:
+            # raise HTTPStatusError so retry decorators can catch it
+            resp.raise_for_status()
+
+        # For other 4xx errors, do NOT retry; raise to caller
+        if 400 <= resp.status_code < 500:
+            resp.raise_for_status()
 
-            # Retryable statuses: 429 and 5xx
-            if resp.status_code == 429 or 500 <= resp.status_code < 600:
-                # raise HTTPStatusError so retry decorators can catch it
-                resp.raise_for_status()
+        return self._parse(resp, data, model)
 
-            # For other 4xx errors, do NOT retry; raise to caller
-            if 400 <= resp.status_code < 500:
-                resp.raise_for_status()
+    @staticmethod
+    def _decode(resp):
+        # The JSON body, or None when the upstream answered with plain text
+        try:
+            return resp.json()
+        except Exception:
+            return None
 
-            # Return best-effort string from JSON or raw text
+    @staticmethod
+    def _parse(resp, data, model: str) -> str:
+        # Return best-effort string from JSON or raw text
+        try:
+            # Common shapes: {'output': '...'} or {'choices': [{'text': '...'}]}
+            if isinstance(data, dict):
+                record_usage(data.get("usage"), model)
+                if "output" in data:
+                    return data["output"]
+                if "text" in data:
+                    return data["text"]
+                if "choices" in data and isinstance(data["choices"], list) and data["choices"]:
+                    first = data["choices"][0]
+                    if isinstance(first, dict) and "text" in first:
+                        return first["text"]
+            return resp.text
+        except Exception:
+            return resp.text
+
+    def _observe_rate_limit(self, resp, reserved: int, data=None) -> None:
+        """Feed the response status, rate-limit headers and usage back to the limiter.
+
+        ``data`` is the body already decoded by ``_post``; it is not parsed again here.
+        """
+        headers = resp.headers
+        if resp.status_code == 429:
+            self.rate_limiter.on_rate_limited(parse_retry_after(headers.get("Retry-After")), headers)
+            return
+        if resp.status_code < 400:
+            self.rate_limiter.on_success(headers)
             try:
-                data = resp.json()
-                # Common shapes: {'output': '...'} or {'choices': [{'text': '...'}]}
-                if isinstance(data, dict):
-                    if "output" in data:
-                        return data["output"]
-                    if "text" in data:
-                        return data["text"]
-                    if "choices" in data and isinstance(data["choices"], list) and data["choices"]:
-                        first = data["choices"][0]
-                        if isinstance(first, dict) and "text" in first:
-                            return first["text"]
-                return resp.text
+                usage = data.get("usage") or {}
+                self.rate_limiter.settle(reserved, int(usage["total_tokens"]))
             except Exception:
-                return resp.text
+                pass
 
-    async def generate(self, prompt: str) -> str:
+    async def generate(self, prompt: str, deadline: Union[None, float, Deadline] = None) -> str:
+        """
+        Generate a completion, coalescing identical in-flight prompts if enabled.
+
+        With a ``cache``, completions are memoized by model and prompt, so
+        rerunning the same batch only pays for prompts not seen before.
+        ``deadline`` (a Deadline or a budget in seconds) bounds the whole call:
+        every attempt, backoff sleep and per-attempt timeout draws on what is
+        left of it, and DeadlineExceeded is raised once it runs out. Without
+        one, the deadline of the surrounding ``deadline_scope`` (if any) applies.
+        """
+        with deadline_scope(deadline):
+            if self.cache is None:
+                return await self._generate_shared(prompt)
+            key = content_key(*self._cache_scope(), prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            result = await self._generate_shared(prompt)
+            await self.cache.aset(key, result)
+            return result
+
+    def _cache_scope(self) -> tuple:
+        # A routed client may answer from any model in its pool
+        return tuple(self.router.targets) if self.router is not None else (self.model,)
+
+    async def _generate_shared(self, prompt: str) -> str:
+        if self._flight is not None:
+            # The shared call runs without the first caller's deadline or tenant;
+            # only callers of the same priority class share it
+            priority = current_priority()
+
+            async def shared() -> str:
+                with schedule_as(priority):
+                    return await self._generate(prompt)
+
+            return await self._flight.do((self.model, prompt, priority), shared)
+        return await self._generate(prompt)
+
+    async def _counted_call(self, prompt: str, attempts: list) -> str:
+        # Every attempt after the first is a retry
+        if attempts:
+            RETRIES.inc()
+        attempts.append(None)
+        return await self._call_api(prompt)
+
+    async def _generate(self, prompt: str) -> str:
         """
         Requirements:
-        - Use httpx.AsyncClient
+        - Use the client's pooled httpx.AsyncClient
         - Apply timeout
         - Retry on timeouts, transport errors, HTTP 429 and 5xx
         - Do NOT retry on other 4xx errors
         """
-        attempts = 3
-        delay = 1.0
-
-        timeout = httpx.Timeout(self.timeout_s)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            for attempt in range(attempts):
-                try:
-                    resp = await client.post(OPENROUTER_URL, json={"model": self.model, "input": prompt}, headers={"Authorization": f"Bearer {OPENROUTER_API_KEY}"} if OPENROUTER_API_KEY else None)
-
-                    # Retryable statuses: 429 and 5xx
-                    if resp.status_code == 429 or 500 <= resp.status_code < 600:
-                        # retryable server error: sleep and retry unless last attempt
-                        if attempt == attempts - 1:
-                            resp.raise_for_status()
-                        await asyncio.sleep(delay)
-                        continue
-
-                    # For other 4xx errors, do NOT retry; raise to caller
-                    if 400 <= resp.status_code < 500:
-                        resp.raise_for_status()
-
-                    # Return best-effort string from JSON or raw text
-                    try:
-                        data = resp.json()
-                        if isinstance(data, dict):
-                            if "output" in data:
-                                return data["output"]
-                            if "text" in data:
-                                return data["text"]
-                            if "choices" in data and isinstance(data["choices"], list) and data["choices"]:
-                                first = data["choices"][0]
-                                if isinstance(first, dict) and "text" in first:
-                                    return first["text"]
-                        return resp.text
-                    except Exception:
-                        return resp.text
-
-                except httpx.HTTPStatusError as e:
-                    status = e.response.status_code if e.response is not None else None
-                    if status == 429 or (status is not None and 500 <= status < 600):
-                        if attempt == attempts - 1:
-                            raise
-                        await asyncio.sleep(delay)
-                        continue
-                    # Non-retryable HTTP error
-                    raise
-                except (httpx.ReadTimeout, httpx.ConnectError, httpx.TransportError) as e:
-                    if attempt == attempts - 1:
-                        raise
-                    await asyncio.sleep(delay)
-                    continue
-
+        # Each attempt reuses the pooled client, so retries skip the handshake
+        deadline = current_deadline()
+        attempts: list = []
+        if deadline is None:
+            return await acall_with_retry(self._counted_call, prompt, attempts, policy=self.retry_policy)
+        # Per-phase httpx timeouts can add up; the deadline is a hard ceiling
+        try:
+            timeout = deadline.timeout()
+            call = acall_with_retry(self._counted_call, prompt, attempts, policy=self.retry_policy)
+            return await asyncio.wait_for(call, timeout)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("Deadline exceeded while generating") from e
@@ -1,38 +1,180 @@
 import asyncio
-from typing import Awaitable, Callable, List
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from common.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from .concurrency import AdaptiveLimit
 
 AsyncStrFn = Callable[[str], Awaitable[str]]
+Prompts = Union[Iterable[str], AsyncIterable[str]]
+DeadlineLike = Union[None, float, Deadline]
+
+# Marks the end of the prompt stream for one worker
+_DONE = object()
+
+
+async def _call_before_deadline(fn: AsyncStrFn, prompt: str) -> str:
+	deadline = current_deadline()
+	if deadline is None:
+		return await fn(prompt)
+	# Don't start a call once the budget is spent, and cut off one that overruns it
+	try:
+		timeout = deadline.timeout()
+		return await asyncio.wait_for(fn(prompt), timeout)
+	except DeadlineExceeded:
+		raise
+	except asyncio.TimeoutError as e:
+		raise DeadlineExceeded("Deadline exceeded while running prompt") from e
 
 
-async def run_many(fn: AsyncStrFn, prompts: List[str]) -> List[str]:
+async def run_many(fn: AsyncStrFn, prompts: List[str], deadline: DeadlineLike = None) -> List[str]:
 	"""
 	Run fn(prompt) concurrently for all prompts and return results in the same order.
 	Requirements:
 	- Use asyncio.gather
 	- Do NOT run sequentially in a for-loop with await inside the loop
+	`deadline` (a Deadline or seconds) bounds the whole run; calls inherit it.
 	"""
-	tasks = [asyncio.create_task(fn(p)) for p in prompts]
+	with deadline_scope(deadline):
+		tasks = [asyncio.create_task(_call_before_deadline(fn, p)) for p in prompts]
 	return await asyncio.gather(*tasks)
 
 
-async def run_many_with_limit(fn: AsyncStrFn, prompts: List[str], limit: int) -> List[str]:
+async def run_many_with_limit(
+	fn: AsyncStrFn,
+	prompts: List[str],
+	limit: int,
+	limiter: Optional[AdaptiveLimit] = None,
+	deadline: DeadlineLike = None,
+) -> List[str]:
 	"""
 	Run fn(prompt) concurrently but limit the number of in-flight tasks to `limit`.
 	Hint:
 	- Use asyncio.Semaphore
 	- Preserve output order
+	Only `limit` workers exist at any time (see iter_many); the first failure
+	is raised and the remaining work is cancelled. Pass an AdaptiveLimit as
+	`limiter` to let concurrency adapt below `limit` instead of fixing it.
+	`deadline` bounds the whole run, as in run_many.
+	"""
+	results: List[Any] = [None] * len(prompts)
+	async for index, result in iter_many(fn, prompts, limit, limiter=limiter, deadline=deadline):
+		if isinstance(result, BaseException):
+			raise result
+		results[index] = result
+	return results
+
+
+async def _aiter_prompts(prompts: Prompts) -> AsyncIterator[str]:
+	if hasattr(prompts, "__aiter__"):
+		async for prompt in prompts:
+			yield prompt
+	else:
+		for prompt in prompts:
+			yield prompt
+
+
+async def iter_many(
+	fn: AsyncStrFn,
+	prompts: Prompts,
+	limit: int,
+	ordered: bool = False,
+	reorder_window: Optional[int] = None,
+	limiter: Optional[AdaptiveLimit] = None,
+	deadline: DeadlineLike = None,
+) -> AsyncIterator[Tuple[int, Union[str, BaseException]]]:
+	"""
+	Stream (index, result) pairs for fn(prompt) over any (async) iterable of prompts.
+
+	A fixed pool of `limit` workers pulls prompts from a bounded queue, so at
+	most `limit` calls are in flight and memory stays O(limit) however many
+	prompts there are. A failed call yields its exception instead of a result.
+	Pairs come out as calls complete; with `ordered=True` they come out in
+	input order through a reorder buffer holding at most `reorder_window`
+	(default 2 * limit) results, and new prompts wait while a slow one holds
+	the head of the line. Closing the generator early cancels the workers.
+	With an adaptive `limiter`, `limit` is the ceiling and each call also
+	waits for a permit, so the number in flight follows `limiter.limit`.
+	With a `deadline` (or one already current), prompts still queued when it
+	expires yield DeadlineExceeded without being started.
 	"""
 	if limit <= 0:
 		raise ValueError("limit must be > 0")
+	window = reorder_window or 2 * limit
+	if window < 1:
+		raise ValueError("reorder_window must be > 0")
+	if deadline is not None and not isinstance(deadline, Deadline):
+		deadline = Deadline.after(deadline)
+	deadline = deadline or current_deadline()
 
-	sem = asyncio.Semaphore(limit)
+	todo: asyncio.Queue = asyncio.Queue(maxsize=limit)
+	done: asyncio.Queue = asyncio.Queue(maxsize=limit)
+	next_index = 0
+	window_open = asyncio.Condition()
+	feed_error: List[BaseException] = []
 
-	async def _worker(prompt: str) -> str:
-		async with sem:
-			return await fn(prompt)
+	async def _feed() -> None:
+		try:
+			index = 0
+			async for prompt in _aiter_prompts(prompts):
+				if ordered:
+					# Don't start what the reorder buffer could not hold
+					async with window_open:
+						await window_open.wait_for(lambda: index < next_index + window)
+				await todo.put((index, prompt))
+				index += 1
+		except Exception as exc:
+			feed_error.append(exc)
+		# Not in a finally: once cancelled, nobody is left to drain the queue
+		for _ in range(limit):
+			await todo.put(_DONE)
 
-	tasks = [asyncio.create_task(_worker(p)) for p in prompts]
-	return await asyncio.gather(*tasks)
+	async def _work() -> None:
+		# Each worker task has its own context, so the scope doesn't leak to the caller
+		with deadline_scope(deadline):
+			await _work_items()
+
+	async def _work_items() -> None:
+		while True:
+			item = await todo.get()
+			if item is _DONE:
+				await done.put(_DONE)
+				return
+			index, prompt = item
+			try:
+				if limiter is None:
+					result: Union[str, BaseException] = await _call_before_deadline(fn, prompt)
+				else:
+					async with limiter.permit():
+						result = await _call_before_deadline(fn, prompt)
+			except Exception as exc:
+				result = exc
+			await done.put((index, result))
+
+	tasks = [asyncio.create_task(_feed())] + [asyncio.create_task(_work()) for _ in range(limit)]
+	pending: Dict[int, Union[str, BaseException]] = {}
+	finished = 0
+	try:
+		while finished < limit:
+			item = await done.get()
+			if item is _DONE:
+				finished += 1
+				continue
+			if not ordered:
+				yield item
+				continue
+			pending[item[0]] = item[1]
+			while next_index in pending:
+				result = pending.pop(next_index)
+				next_index += 1
+				async with window_open:
+					window_open.notify_all()
+				yield next_index - 1, result
+		if feed_error:
+			raise feed_error[0]
+	finally:
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
 
 
 if __name__ == "__main__":
@@ -44,6 +186,6 @@ if __name__ == "__main__":
 		prompts = ["a", "b", "c", "d"]
 		print(await run_many(_demo_fn, prompts))
 		print(await run_many_with_limit(_demo_fn, prompts, limit=2))
+		print([pair async for pair in iter_many(_demo_fn, iter(prompts), limit=2, ordered=True)])
 
 	asyncio.run(_main())
-
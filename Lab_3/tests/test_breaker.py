@@ -0,0 +1,30 @@
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.breaker import CircuitBreaker, CircuitOpenError
+from common.retry import RetryPolicy
+
+
+@pytest.mark.asyncio
+async def test_client_fails_fast_once_open(monkeypatch):
+    posts = []
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            posts.append(json)
+            return httpx.Response(503, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    breaker = CircuitBreaker(min_calls=2, is_failure=oc.is_upstream_failure)
+    policy = RetryPolicy(attempts=2, base_delay=0, retryable=oc.is_transient_error)
+    client = oc.OpenRouterClient(breaker=breaker, retry_policy=policy)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.generate("p")
+    with pytest.raises(CircuitOpenError):
+        await client.generate("p")
+    assert len(posts) == 2
@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+import pytest
+
+from Lab_3.apps.concurrency import AdaptiveLimit, is_overload
+from Lab_3.apps.runner import run_many_with_limit
+from common.deadline import DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def busy(limiter: AdaptiveLimit) -> None:
+    # Pretend the limit is fully used so successes may grow it
+    limiter._in_flight = limiter.limit
+
+
+def test_grows_while_latency_is_flat():
+    limiter = AdaptiveLimit(initial_limit=4, max_limit=10, clock=FakeClock())
+    for _ in range(100):
+        busy(limiter)
+        limiter.on_sample(0.1)
+    assert limiter.limit == 10
+    assert limiter.rtt == pytest.approx(0.1)
+
+
+def test_does_not_grow_when_limit_is_unused():
+    limiter = AdaptiveLimit(initial_limit=8, clock=FakeClock())
+    for _ in range(50):
+        limiter.on_sample(0.1)
+    assert limiter.limit == 8
+
+
+def test_cuts_on_drop_once_per_rtt():
+    clock = FakeClock()
+    limiter = AdaptiveLimit(initial_limit=10, backoff_ratio=0.5, clock=clock)
+    limiter.on_sample(1.0)
+    limiter.on_sample(1.0, dropped=True)
+    limiter.on_sample(1.0, dropped=True)
+    assert limiter.limit == 5
+    assert limiter.drops == 2
+
+    clock.now = 1.0
+    limiter.on_sample(1.0, dropped=True)
+    assert limiter.limit == 2
+
+
+def test_cuts_on_latency_inflation_but_not_below_min():
+    clock = FakeClock()
+    limiter = AdaptiveLimit(initial_limit=8, min_limit=2, backoff_ratio=0.5, rtt_alpha=1.0, clock=clock)
+    limiter.on_sample(0.1)
+    for step in range(5):
+        clock.now = step + 1.0
+        limiter.on_sample(0.5)
+    assert limiter.limit == 2
+    assert limiter.min_rtt == 0.1
+
+
+def test_overload_classification():
+    request = httpx.Request("GET", "https://example.test")
+    assert is_overload(asyncio.TimeoutError())
+    assert is_overload(httpx.ReadTimeout("slow", request=request))
+    assert is_overload(httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request)))
+    assert not is_overload(httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request)))
+    assert not is_overload(DeadlineExceeded("out of budget"))
+
+    class SessionTimeout(Exception):
+        pass
+
+    assert not is_overload(SessionTimeout())  # matched by type, not by name
+
+
+@pytest.mark.asyncio
+async def test_deadline_exceeded_leaves_the_limit_unchanged():
+    clock = FakeClock()
+    limiter = AdaptiveLimit(initial_limit=4, clock=clock)
+    limiter.on_sample(0.1)
+    for _ in range(3):
+        limiter._in_flight = limiter.limit - 1  # the permit fills the limit, so a success would grow it
+        with pytest.raises(DeadlineExceeded):
+            async with limiter.permit():
+                clock.now += 5.0
+                raise DeadlineExceeded("out of budget")
+    assert limiter.limit == 4
+    assert limiter.drops == 0
+    assert limiter.rtt == pytest.approx(0.1)
+
+
+@pytest.mark.asyncio
+async def test_runner_follows_adaptive_limit():
+    limiter = AdaptiveLimit(initial_limit=2, max_limit=4)
+    current = 0
+    max_concurrent = 0
+
+    async def fn(s: str) -> str:
+        nonlocal current, max_concurrent
+        current += 1
+        max_concurrent = max(max_concurrent, current)
+        await asyncio.sleep(0.001)
+        current -= 1
+        return s
+
+    prompts = [str(i) for i in range(40)]
+    assert await run_many_with_limit(fn, prompts, limit=8, limiter=limiter) == prompts
+    assert max_concurrent <= 4
+    assert limiter.limit > 2
+    assert limiter.in_flight == 0
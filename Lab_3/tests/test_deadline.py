@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.deadline import DeadlineExceeded
+from Lab_3.apps.runner import iter_many, run_many
+
+
+@pytest.mark.asyncio
+async def test_generate_is_bounded_by_deadline(monkeypatch):
+    timeouts = []
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None, timeout=None):
+            timeouts.append(timeout)
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    client = oc.OpenRouterClient(timeout_s=15.0)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with pytest.raises(DeadlineExceeded):
+        await client.generate("p", deadline=0.2)
+
+    assert loop.time() - started < 1.0
+    assert 0 < timeouts[0] <= 0.2
+
+
+@pytest.mark.asyncio
+async def test_run_many_shares_one_deadline():
+    async def fn(s: str) -> str:
+        await asyncio.sleep(0.01 if s == "fast" else 10)
+        return s
+
+    results = await asyncio.gather(run_many(fn, ["fast", "slow"], deadline=0.1), return_exceptions=True)
+    assert isinstance(results[0], DeadlineExceeded)
+
+
+@pytest.mark.asyncio
+async def test_iter_many_does_not_start_work_after_deadline():
+    started = []
+
+    async def fn(s: str) -> str:
+        started.append(s)
+        await asyncio.sleep(0.05)
+        return s
+
+    pairs = dict([pair async for pair in iter_many(fn, [str(i) for i in range(10)], limit=1, deadline=0.08)])
+    assert len(pairs) == 10
+    assert len(started) <= 3
+    assert sum(isinstance(r, DeadlineExceeded) for r in pairs.values()) >= 7
@@ -0,0 +1,71 @@
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.retry import RetryPolicy
+from Lab_3.apps import metrics
+
+
+@pytest.mark.asyncio
+async def test_client_records_statuses_retries_tokens_and_phases(monkeypatch):
+    responses = [
+        httpx.Response(503, request=httpx.Request("POST", "http://x")),
+        httpx.Response(
+            200,
+            json={"output": "done", "usage": {"prompt_tokens": 7, "completion_tokens": 2}},
+            request=httpx.Request("POST", "http://x"),
+        ),
+    ]
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            return responses.pop(0)
+
+        async def aclose(self):
+            pass
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    ok_before = metrics.RESPONSES.value("metrics/model", 200)
+    failed_before = metrics.RESPONSES.value("metrics/model", 503)
+    retries_before = metrics.RETRIES.value()
+    prompt_before = metrics.TOKENS.value("metrics/model", "prompt")
+    parsed_before = metrics.PHASE_SECONDS.labels("parsing").count
+
+    client = oc.OpenRouterClient(
+        model="metrics/model",
+        max_connections=4,
+        retry_policy=RetryPolicy(attempts=2, base_delay=0, retryable=oc.is_transient_error),
+    )
+    async with client:
+        assert metrics.POOL_CAPACITY.value() >= 4
+        assert metrics.INFLIGHT_RATIO.value() == metrics.IN_FLIGHT.value() / metrics.POOL_CAPACITY.value()
+        assert await client.generate("p") == "done"
+
+    assert metrics.RESPONSES.value("metrics/model", 503) == failed_before + 1
+    assert metrics.RESPONSES.value("metrics/model", 200) == ok_before + 1
+    assert metrics.RETRIES.value() == retries_before + 1
+    assert metrics.TOKENS.value("metrics/model", "prompt") == prompt_before + 7
+    assert metrics.PHASE_SECONDS.labels("parsing").count == parsed_before + 1
+    assert metrics.IN_FLIGHT.value() == 0
+
+
+@pytest.mark.asyncio
+async def test_transport_errors_count_as_error_status(monkeypatch):
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            raise httpx.ConnectError("refused")
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    before = metrics.RESPONSES.value("metrics/down", "error")
+    client = oc.OpenRouterClient(
+        model="metrics/down", retry_policy=RetryPolicy(attempts=1, retryable=oc.is_transient_error)
+    )
+    with pytest.raises(httpx.ConnectError):
+        await client.generate("p")
+    assert metrics.RESPONSES.value("metrics/down", "error") == before + 1
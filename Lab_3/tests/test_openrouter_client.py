@@ -1,7 +1,10 @@
+import asyncio
+
 import pytest
 import httpx
 
 import Lab_3.apps.openrouter_client as oc
+from common.retry import RetryBudget, RetryPolicy
 
 
 class DummyResponse:
@@ -25,9 +28,11 @@ class DummyResponse:
 
 
 class DummyClient:
-    def __init__(self, timeout=None, responses=None):
+    def __init__(self, timeout=None, responses=None, **kwargs):
         # copy responses list so factory can be reused
         self._responses = list(responses or [])
+        self.kwargs = kwargs
+        self.closed = False
 
     async def __aenter__(self):
         return self
@@ -35,6 +40,9 @@ class DummyClient:
     async def __aexit__(self, exc_type, exc, tb):
         return False
 
+    async def aclose(self):
+        self.closed = True
+
     async def post(self, url, json, headers=None):
         if not self._responses:
             return DummyResponse(200, json_data={"output": "ok:" + json.get("input", "")})
@@ -44,9 +52,12 @@ class DummyClient:
         return resp
 
 
-def make_client_factory(responses):
-    def factory(timeout=None):
-        return DummyClient(timeout=timeout, responses=responses)
+def make_client_factory(responses, created=None):
+    def factory(timeout=None, **kwargs):
+        client = DummyClient(timeout=timeout, responses=responses, **kwargs)
+        if created is not None:
+            created.append(client)
+        return client
 
     return factory
 
@@ -59,6 +70,21 @@ async def test_generate_success(monkeypatch):
     assert out == "hello"
 
 
+@pytest.mark.asyncio
+async def test_generate_posts_to_url_override(monkeypatch):
+    urls = []
+
+    class Client(DummyClient):
+        async def post(self, url, json, headers=None):
+            urls.append(url)
+            return await super().post(url, json, headers)
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    client = oc.OpenRouterClient(url="http://127.0.0.1:9999/chat")
+    assert await client.generate("p") == "ok:p"
+    assert urls == ["http://127.0.0.1:9999/chat"]
+
+
 @pytest.mark.asyncio
 async def test_generate_retries_on_5xx_then_succeeds(monkeypatch):
     monkeypatch.setattr(
@@ -89,3 +115,62 @@ async def test_generate_retries_on_timeout(monkeypatch):
     client = oc.OpenRouterClient()
     out = await client.generate("p")
     assert out == "ok"
+
+
+@pytest.mark.asyncio
+async def test_generate_reuses_pooled_client(monkeypatch):
+    created = []
+    monkeypatch.setattr(
+        oc.httpx,
+        "AsyncClient",
+        make_client_factory([DummyResponse(500), DummyResponse(200, json_data={"output": "a"})], created),
+    )
+    policy = RetryPolicy(retryable=oc.is_transient_error, base_delay=0)
+    client = oc.OpenRouterClient(max_connections=8, keepalive_expiry=5.0, retry_policy=policy)
+    assert await client.generate("p") == "a"
+    assert await client.generate("q") == "ok:q"
+    assert len(created) == 1
+    assert created[0].kwargs["limits"].max_connections == 8
+    assert created[0].kwargs["limits"].keepalive_expiry == 5.0
+
+
+@pytest.mark.asyncio
+async def test_client_context_manager_closes_pool(monkeypatch):
+    created = []
+    monkeypatch.setattr(oc.httpx, "AsyncClient", make_client_factory([], created))
+    async with oc.OpenRouterClient() as client:
+        assert await client.generate("p") == "ok:p"
+    assert len(created) == 1
+    assert created[0].closed
+    assert client._client is None
+
+
+@pytest.mark.asyncio
+async def test_generate_coalesces_identical_prompts(monkeypatch):
+    posts = []
+
+    class SlowClient(DummyClient):
+        async def post(self, url, json, headers=None):
+            posts.append(json["input"])
+            await asyncio.sleep(0.01)
+            return DummyResponse(200, json_data={"output": "ok:" + json["input"]})
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", lambda **kwargs: SlowClient(**kwargs))
+    client = oc.OpenRouterClient(coalesce=True)
+    results = await asyncio.gather(client.generate("p"), client.generate("p"), client.generate("q"))
+    assert results == ["ok:p", "ok:p", "ok:q"]
+    assert sorted(posts) == ["p", "q"]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_keep_their_own_deadlines(monkeypatch):
+    class SlowClient(DummyClient):
+        async def post(self, url, json, headers=None):
+            await asyncio.sleep(0.1)
+            return DummyResponse(200, json_data={"output": "ok:" + json["input"]})
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", lambda **kwargs: SlowClient(**kwargs))
+    client = oc.OpenRouterClient(coalesce=True)
+    hurried, patient = await asyncio.gather(client.generate("p", deadline=0.02), client.generate("p"), return_exceptions=True)
+    assert isinstance(hurried, oc.DeadlineExceeded)
+    assert patient == "ok:p"
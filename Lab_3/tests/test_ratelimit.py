@@ -0,0 +1,83 @@
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.ratelimit import AdaptiveRateLimiter
+from common.retry import RetryPolicy
+
+
+@pytest.mark.asyncio
+async def test_client_feeds_429_into_limiter(monkeypatch):
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0"}, request=httpx.Request("POST", "https://x")),
+        httpx.Response(200, json={"output": "ok", "usage": {"total_tokens": 3}}, request=httpx.Request("POST", "https://x")),
+    ]
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            return responses.pop(0)
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    limiter = AdaptiveRateLimiter(max_rps=50, min_rps=1)
+    client = oc.OpenRouterClient(rate_limiter=limiter, retry_policy=RetryPolicy(base_delay=0, retryable=oc.is_transient_error))
+
+    assert await client.generate("prompt") == "ok"
+    assert limiter.rate_limited == 1
+    assert limiter.rps < 50
+
+
+@pytest.mark.asyncio
+async def test_client_decodes_the_body_once_and_settles_usage(monkeypatch):
+    class CountingResponse(httpx.Response):
+        decoded = 0
+
+        def json(self, **kwargs):
+            CountingResponse.decoded += 1
+            return super().json(**kwargs)
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            return CountingResponse(
+                200, json={"output": "ok", "usage": {"total_tokens": 3}}, request=httpx.Request("POST", "https://x")
+            )
+
+    settled = []
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    limiter = AdaptiveRateLimiter(max_rps=50, tokens_per_minute=600)
+    monkeypatch.setattr(limiter, "settle", lambda reserved, actual: settled.append(actual))
+    client = oc.OpenRouterClient(rate_limiter=limiter)
+
+    assert await client.generate("prompt") == "ok"
+    assert CountingResponse.decoded == 1
+    assert settled == [3]
+
+
+@pytest.mark.asyncio
+async def test_client_reserves_the_prompt_and_the_completion_cap(monkeypatch):
+    payloads = []
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            payloads.append(json)
+            return httpx.Response(200, json={"output": "ok"}, request=httpx.Request("POST", "https://x"))
+
+    reserved = []
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    limiter = AdaptiveRateLimiter(max_rps=50, tokens_per_minute=60_000)
+    monkeypatch.setattr(limiter, "reserve", lambda tokens=0: reserved.append(tokens) or 0.0)
+    client = oc.OpenRouterClient(rate_limiter=limiter, max_tokens=100)
+
+    await client.generate("p" * 40)
+    await client.probe("m")
+
+    assert [p["max_tokens"] for p in payloads] == [100, 1]
+    assert reserved == [11 + 100, 2 + 1]
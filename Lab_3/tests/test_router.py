@@ -0,0 +1,85 @@
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.breaker import CircuitBreaker, CircuitOpenError
+from common.retry import RetryPolicy
+from common.router import LatencyRouter
+
+
+@pytest.mark.asyncio
+async def test_client_retries_on_another_target(monkeypatch):
+    posts = []
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            posts.append(json["model"])
+            if json["model"] == "down":
+                return httpx.Response(503, request=httpx.Request("POST", url))
+            return httpx.Response(200, json={"output": json["model"]}, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    router = LatencyRouter(["down", "up"], eject_consecutive_failures=1, is_failure=oc.is_upstream_failure)
+    router.record("up", True, 5.0)  # make "down" look attractive at first
+    policy = RetryPolicy(attempts=2, base_delay=0, retryable=oc.is_transient_error)
+    client = oc.OpenRouterClient(router=router, retry_policy=policy)
+
+    assert await client.generate("p") == "up"
+    assert posts == ["down", "up"]
+    assert router.snapshot()["down"]["ejected"]
+    assert router.probe == client.probe
+
+
+@pytest.mark.asyncio
+async def test_breaker_rejections_are_not_recorded_by_the_router(monkeypatch):
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            return httpx.Response(503, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    router = LatencyRouter(["down"], is_failure=oc.is_upstream_failure)
+    breaker = CircuitBreaker(min_calls=2, is_failure=oc.is_upstream_failure)
+    policy = RetryPolicy(attempts=2, base_delay=0, retryable=oc.is_transient_error)
+    client = oc.OpenRouterClient(router=router, breaker=breaker, retry_policy=policy)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.generate("p")
+    for _ in range(3):
+        with pytest.raises(CircuitOpenError):
+            await client.generate("p")
+    assert router.snapshot()["down"]["calls"] == 2
+
+
+@pytest.mark.asyncio
+async def test_dead_pool_member_does_not_open_the_breaker_of_the_healthy_one(monkeypatch):
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            if json["model"] == "bad":
+                return httpx.Response(503, request=httpx.Request("POST", url))
+            return httpx.Response(200, json={"output": "ok"}, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    router = LatencyRouter(["good", "bad"], is_failure=oc.is_upstream_failure)
+    breaker = CircuitBreaker(min_calls=10, is_failure=oc.is_upstream_failure)
+    router.record("good", True, 5.0)  # "bad" looks faster, so it takes the first calls
+    client = oc.OpenRouterClient(router=router, breaker=breaker, retry_policy=RetryPolicy(attempts=1))
+
+    outcomes = []
+    for _ in range(40):
+        try:
+            outcomes.append(await client.generate("p"))
+        except (httpx.HTTPStatusError, CircuitOpenError) as exc:
+            outcomes.append(type(exc).__name__)
+
+    # Only the calls "bad" took before the router ejected it fail; "good" is never rejected
+    assert outcomes.count("HTTPStatusError") == router.snapshot()["bad"]["calls"]
+    assert outcomes.count("ok") == 40 - outcomes.count("HTTPStatusError")
@@ -2,7 +2,7 @@ import asyncio
 
 import pytest
 
-from Lab_3.apps.runner import run_many, run_many_with_limit
+from Lab_3.apps.runner import iter_many, run_many, run_many_with_limit
 
 
 @pytest.mark.asyncio
@@ -37,3 +37,94 @@ async def test_run_many_with_limit_respects_limit():
     results = await run_many_with_limit(fn, prompts, limit=2)
     assert results == [p.upper() for p in prompts]
     assert max_concurrent <= 2
+
+
+@pytest.mark.asyncio
+async def test_run_many_with_limit_raises_first_failure():
+    async def fn(s: str) -> str:
+        if s == "b":
+            raise RuntimeError("boom")
+        return s
+
+    with pytest.raises(RuntimeError):
+        await run_many_with_limit(fn, ["a", "b", "c"], limit=2)
+
+
+@pytest.mark.asyncio
+async def test_iter_many_yields_as_completed_with_exceptions():
+    async def fn(s: str) -> str:
+        await asyncio.sleep(0.03 if s == "slow" else 0.0)
+        if s == "bad":
+            raise ValueError(s)
+        return s.upper()
+
+    pairs = [pair async for pair in iter_many(fn, ["slow", "a", "bad"], limit=3)]
+    assert pairs[-1] == (0, "SLOW")
+    results = dict(pairs)
+    assert results[1] == "A"
+    assert isinstance(results[2], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_iter_many_ordered_from_async_iterable():
+    async def prompts():
+        for i in range(20):
+            yield str(i)
+
+    async def fn(s: str) -> str:
+        await asyncio.sleep(0.001 * (int(s) % 3))
+        return s
+
+    pairs = [pair async for pair in iter_many(fn, prompts(), limit=4, ordered=True)]
+    assert pairs == [(i, str(i)) for i in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_iter_many_pulls_prompts_lazily():
+    pulled = 0
+    current = 0
+    max_concurrent = 0
+
+    def prompts():
+        nonlocal pulled
+        for i in range(10_000):
+            pulled += 1
+            yield str(i)
+
+    async def fn(s: str) -> str:
+        nonlocal current, max_concurrent
+        current += 1
+        max_concurrent = max(max_concurrent, current)
+        await asyncio.sleep(0)
+        current -= 1
+        return s
+
+    gen = iter_many(fn, prompts(), limit=3)
+    seen = [await gen.__anext__() for _ in range(5)]
+    await gen.aclose()
+
+    assert len(seen) == 5
+    assert max_concurrent <= 3
+    # Only a bounded look-ahead is ever read from the source
+    assert pulled <= 5 + 3 * 3
+
+
+@pytest.mark.asyncio
+async def test_iter_many_ordered_bounds_reorder_buffer():
+    started = []
+    release = asyncio.Event()
+
+    async def fn(s: str) -> str:
+        started.append(s)
+        if s == "0":
+            await release.wait()
+        return s
+
+    gen = iter_many(fn, (str(i) for i in range(100)), limit=2, ordered=True, reorder_window=4)
+    first = asyncio.ensure_future(gen.__anext__())
+    await asyncio.sleep(0.01)
+    # The head of the line is stuck, so no more than the window has started
+    assert len(started) <= 4
+    release.set()
+    assert await first == (0, "0")
+    await gen.aclose()
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.scheduler import FairScheduler, schedule_as
+from Lab_3.apps.runner import run_many_with_limit
+
+
+@pytest.mark.asyncio
+async def test_wrapped_runner_respects_global_budget():
+    scheduler = FairScheduler(concurrency=2)
+    current = 0
+    max_concurrent = 0
+
+    async def fn(s: str) -> str:
+        nonlocal current, max_concurrent
+        current += 1
+        max_concurrent = max(max_concurrent, current)
+        await asyncio.sleep(0.001)
+        current -= 1
+        return s
+
+    job = scheduler.wrap(fn, priority="batch", tenant="backfill")
+    prompts = [str(i) for i in range(10)]
+    results = await asyncio.gather(
+        run_many_with_limit(job, prompts, limit=5),
+        run_many_with_limit(scheduler.wrap(fn), prompts, limit=5),
+    )
+    assert results == [prompts, prompts]
+    assert max_concurrent <= 2
+    assert scheduler.stats()["classes"]["batch"]["dispatched"] == 10
+
+
+@pytest.mark.asyncio
+async def test_client_uses_labels_from_schedule_as(monkeypatch):
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            return httpx.Response(200, json={"output": "ok"}, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    scheduler = FairScheduler(concurrency=4)
+    client = oc.OpenRouterClient(scheduler=scheduler)
+    with schedule_as("batch", "backfill"):
+        assert await client.generate("p") == "ok"
+    assert scheduler.stats()["classes"]["batch"]["dispatched"] == 1
+    assert scheduler.stats()["classes"]["interactive"]["dispatched"] == 0
@@ -0,0 +1,32 @@
+import httpx
+import pytest
+
+import Lab_3.apps.openrouter_client as oc
+from common.sqlite_cache import SQLiteCache
+
+
+@pytest.mark.asyncio
+async def test_generate_reruns_are_served_from_the_cache(monkeypatch, tmp_path):
+    calls = []
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def post(self, url, json, headers=None):
+            calls.append(json["input"])
+            return httpx.Response(200, json={"output": f"out:{json['input']}"}, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(oc.httpx, "AsyncClient", Client)
+    path = str(tmp_path / "cache.db")
+    first = oc.OpenRouterClient(model="m", cache=SQLiteCache(path))
+    assert [await first.generate(p) for p in ("a", "b")] == ["out:a", "out:b"]
+
+    # A fresh client (e.g. another worker, or a rerun) shares the file
+    second = oc.OpenRouterClient(model="m", cache=SQLiteCache(path))
+    assert [await second.generate(p) for p in ("a", "b", "c")] == ["out:a", "out:b", "out:c"]
+    assert calls == ["a", "b", "c"]
+
+    other_model = oc.OpenRouterClient(model="n", cache=SQLiteCache(path))
+    await other_model.generate("a")
+    assert calls == ["a", "b", "c", "a"]
@@ -0,0 +1,228 @@
+"""Admission control and load shedding for the API.
+
+A bounded number of requests run at once; a bounded queue holds the next
+few, each with a deadline. Everything else is rejected immediately with a
+``Retry-After`` hint instead of being accepted and left to time out: a
+full queue answers 429, and a request whose deadline cannot be met (by
+estimate, or after waiting) answers 503. Admitted requests keep a stable
+latency under overload because the queue in front of them is short.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Sequence
+from urllib.parse import parse_qs
+
+from app.tracing import admitted, record_phase
+from common.deadline import Deadline, deadline_scope
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight count plus a bounded FIFO wait queue with deadlines."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_queue: int = 128,
+        queue_timeout: float = 5.0,
+        service_alpha: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_in_flight: Requests processed at the same time
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Longest a request may wait when it sets no deadline
+            service_alpha: EWMA weight for the service-time estimate
+            clock: Monotonic time source (overridable in tests)
+        """
+        if max_in_flight < 1 or max_queue < 0:
+            raise ValueError("require max_in_flight >= 1 and max_queue >= 0")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.service_alpha = service_alpha
+        self._clock = clock
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.service_time: Optional[float] = None
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_deadline = 0
+        self.timed_out = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def deadline_in(self, seconds: float) -> float:
+        """Absolute deadline ``seconds`` from now on this controller's clock."""
+        return self._clock() + seconds
+
+    def estimated_wait(self) -> float:
+        """Rough time until a newly queued request would get a slot."""
+        if self.service_time is None:
+            return 0.0
+        return (len(self._waiters) + 1) * self.service_time / self.max_in_flight
+
+    def _retry_after(self) -> float:
+        return max(1.0, self.estimated_wait())
+
+    async def acquire(self, deadline: Optional[float] = None) -> float:
+        """
+        Take a slot or raise OverloadedError; return the admission time.
+
+        ``deadline`` is an absolute time on this controller's clock.
+        """
+        now = self._clock()
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            self.admitted += 1
+            return now
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise OverloadedError(429, "Too many requests queued", self._retry_after())
+        budget = self.queue_timeout if deadline is None else min(self.queue_timeout, deadline - now)
+        if budget <= 0 or self.estimated_wait() > budget:
+            self.rejected_deadline += 1
+            raise OverloadedError(503, "Request deadline cannot be met", self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), budget)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted at the last moment: keep the slot
+                self.admitted += 1
+                return self._clock()
+            self.timed_out += 1
+            raise OverloadedError(503, "Timed out waiting for capacity", self._retry_after())
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if not waiter.done():
+                waiter.cancel()
+        self.admitted += 1
+        return self._clock()
+
+    def release(self, started: Optional[float]) -> None:
+        """Free a slot; ``started`` (from acquire) feeds the service-time estimate."""
+        if started is not None:
+            elapsed = self._clock() - started
+            if self.service_time is None:
+                self.service_time = elapsed
+            else:
+                self.service_time += self.service_alpha * (elapsed - self.service_time)
+        self._in_flight -= 1
+        while self._waiters and self._in_flight < self.max_in_flight:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the waiter
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_deadline": self.rejected_deadline,
+            "timed_out": self.timed_out,
+        }
+
+
+def _request_budget(scope) -> Optional[float]:
+    """Seconds from X-Request-Timeout or ?timeout=; malformed values are left to the endpoint."""
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("timeout")
+    value = values[0] if values else None
+    if value is None:
+        for name, header in scope.get("headers", []):
+            if name == b"x-request-timeout":
+                value = header.decode("latin-1")
+                break
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that admits requests under ``paths`` through a controller.
+
+    The slot is held until the response has been fully sent, so streaming
+    responses count as in flight for their whole duration. A budget sent
+    as ``X-Request-Timeout`` (or the ``timeout`` query parameter) is the
+    request's deadline: it bounds the wait in the queue, and the time spent
+    there is taken out of the budget the endpoint sees. Paths under
+    ``exclude`` are let through without a slot.
+    """
+
+    def __init__(
+        self, app, controller: AdmissionController, paths: Sequence[str] = ("/",), exclude: Sequence[str] = ()
+    ):
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(self.paths) or (self.exclude and path.startswith(self.exclude)):
+            await self.app(scope, receive, send)
+            return
+
+        budget = _request_budget(scope)
+        arrived = Deadline.after(budget) if budget is not None and budget > 0 else None
+        deadline = self.controller.deadline_in(budget) if arrived is not None else None
+        waiting = time.perf_counter()
+        try:
+            started = await self.controller.acquire(deadline)
+        except OverloadedError as e:
+            await self._reject(send, e)
+            return
+        record_phase("queueing", waiting)
+        try:
+            with deadline_scope(arrived), admitted():
+                await self.app(scope, receive, send)
+        finally:
+            self.controller.release(started)
+
+    @staticmethod
+    async def _reject(send, error: OverloadedError) -> None:
+        body = json.dumps({"detail": error.reason}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(error.retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,179 @@
+"""LRU + TTL caches for summarize responses: in-process, or shared on disk."""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from app.models import SummarizeResponse
+from common.sqlite_cache import SQLiteCache, content_key
+
+CacheKey = Tuple[str, str, int]
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace so trivially re-wrapped inputs share a key."""
+    return " ".join(text.split())
+
+
+def make_key(model: str, text: str, max_length: int) -> CacheKey:
+    """Build a cache key from the model, a hash of the normalized text and max_length."""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return (model, digest, max_length)
+
+
+class SummaryCache:
+    """Bounded LRU cache of SummarizeResponse objects with a per-entry TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached responses (UTF-8 JSON bytes)
+            ttl_seconds: How long an entry stays valid after it is stored
+            clock: Monotonic time source (overridable in tests)
+
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if max_entries <= 0 or max_bytes <= 0 or ttl_seconds <= 0:
+            raise ValueError("Cache limits must be positive")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> (expires_at, size_bytes, response), oldest first
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, SummarizeResponse]]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[SummarizeResponse]:
+        """Return the cached response for key, or None if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, response = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def set(self, key: CacheKey, response: SummarizeResponse) -> None:
+        """Store response under key, evicting least recently used entries as needed."""
+        size = len(response.model_dump_json().encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (self._clock() + self.ttl_seconds, size, response)
+        self.current_bytes += size
+
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def aset(self, key: CacheKey, response: SummarizeResponse) -> None:
+        """``set`` for async callers; the in-process cache never blocks, so it runs inline."""
+        self.set(key, response)
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Return the current size and hit/miss/eviction counters."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: CacheKey) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+class PersistentSummaryCache:
+    """
+    SummaryCache interface over a SQLite file shared by every worker on a host.
+
+    Use it when the API runs as several uvicorn/gunicorn workers: each
+    worker would otherwise keep its own copy of the cache, and lose it on
+    restart. Entries are stored as compact JSON keyed by a digest of the
+    in-process cache key.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: SQLite file shared by the workers
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of the encoded responses
+            ttl_seconds: How long an entry stays valid after it is stored
+            clock: Wall-clock time source (overridable in tests)
+        """
+        self.store = SQLiteCache(path, max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds, clock=clock)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def get(self, key: CacheKey) -> Optional[SummarizeResponse]:
+        """Return the cached response for key, or None if absent, expired or unreadable."""
+        data = self.store.get(content_key(*key))
+        if data is None:
+            return None
+        try:
+            return SummarizeResponse(**data)
+        except (TypeError, ValueError):
+            return None
+
+    def set(self, key: CacheKey, response: SummarizeResponse) -> None:
+        """Store response under key for every worker sharing the file."""
+        self.store.set(content_key(*key), response.model_dump())
+
+    async def aset(self, key: CacheKey, response: SummarizeResponse) -> None:
+        """``set`` on a worker thread, off the event loop."""
+        await self.store.aset(content_key(*key), response.model_dump())
+
+    def clear(self) -> None:
+        """Drop every entry for all workers; counters are kept."""
+        self.store.clear()
+
+    def stats(self) -> dict:
+        """Return the shared size and this worker's hit/miss/eviction counters."""
+        return self.store.stats()
@@ -0,0 +1,104 @@
+"""Prompt compaction: drop what costs input tokens but carries no content.
+
+Documents pasted into /summarize often arrive with HTML or Markdown
+markup, runs of blank lines and indentation, and boilerplate repeated on
+every page (headers, footers, disclaimers). All of it is billed as input
+tokens. ``Compactor`` removes it in one pass per stage, keeping paragraph
+breaks (long-document chunking splits on them). Only unambiguous markup
+is stripped: tags with known HTML names and well-formed attributes, and
+Markdown syntax delimited like Markdown, so code (``List<String>``,
+``__init__``, ``2**10``) and comparisons (``x<y and y>z``) pass through.
+Dropping repeated lines is off by default, since repeats in poems, logs
+and tables carry meaning. Compacting a compacted
+text changes nothing (doubly escaped entities aside), so every layer that
+sees an input may compact it without saving tokens twice.
+"""
+import html
+import re
+
+# Attributes of a real tag: name, name=value, name="value" or name='value'
+_ATTRIBUTES = r"""(?:\s+[\w:-]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'<>=`]+))?)*\s*/?>"""
+_BLOCK_NAMES = "p|div|br|hr|li|ul|ol|dl|dt|dd|tr|table|thead|tbody|tfoot|h[1-6]|section|article|aside|header|footer|nav|main|blockquote|pre|figure|figcaption"
+_INLINE_NAMES = "html|head|body|title|meta|link|a|abbr|b|i|u|s|em|strong|small|mark|span|font|code|kbd|sub|sup|img|td|th|caption|label|cite|q|time"
+
+_BLOCKS = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+_BLOCK_TAGS = re.compile(rf"</?(?:{_BLOCK_NAMES})\b{_ATTRIBUTES}", re.IGNORECASE)
+_TAGS = re.compile(rf"</?(?:{_INLINE_NAMES})\b{_ATTRIBUTES}", re.IGNORECASE)
+_MD_IMAGES = re.compile(r"!\[([^\]]*)\]\([^)\s]*\)")
+_MD_LINKS = re.compile(r"(?<![\w\]])\[([^\]]+)\]\([^)\s]*\)")
+# Only ** and ~~ around words: __ is everywhere in code (__init__)
+_MD_EMPHASIS = re.compile(r"(?<![\w*~])(\*\*|~~)(?=\S)(.+?)(?<=\S)\1(?![\w*~])")
+_MD_LINE_MARKERS = re.compile(r"^[ \t]*(?:#{1,6}[ \t]+|>[ \t]?|```.*$)", re.MULTILINE)
+_SPACES = re.compile("[ \t\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+class Compactor:
+    """Configurable text compaction applied to inputs before they are sent upstream."""
+
+    def __init__(
+        self,
+        collapse_whitespace: bool = True,
+        strip_markup: bool = True,
+        dedupe_lines: bool = False,
+        min_duplicate_chars: int = 8,
+    ):
+        """
+        Args:
+            collapse_whitespace: Collapse runs of spaces, trim lines and keep at
+                most one blank line between paragraphs
+            strip_markup: Remove HTML tags with known names, comments, scripts
+                and styles (block tags become line breaks, entities are
+                decoded) and Markdown link, image, bold, strikethrough,
+                heading and fence syntax
+            dedupe_lines: Drop lines repeating an earlier line (compared
+                ignoring case and spacing), e.g. page headers and footers;
+                only for inputs where repeats are boilerplate
+            min_duplicate_chars: Shorter lines are kept even when repeated,
+                since short lines ("Yes.", list markers) often repeat meaningfully
+        """
+        self.collapse_whitespace = collapse_whitespace
+        self.strip_markup = strip_markup
+        self.dedupe_lines = dedupe_lines
+        self.min_duplicate_chars = min_duplicate_chars
+
+    def compact(self, text: str) -> str:
+        if self.strip_markup:
+            text = self._strip_markup(text)
+        if self.dedupe_lines:
+            text = self._dedupe_lines(text)
+        if self.collapse_whitespace:
+            text = self._collapse_whitespace(text)
+        return text
+
+    @staticmethod
+    def _strip_markup(text: str) -> str:
+        if "&" in text:
+            # Decoded first, so escaped markup goes the same way as real markup
+            text = html.unescape(text)
+        if "<" in text:
+            text = _BLOCKS.sub("", text)
+            text = _BLOCK_TAGS.sub("\n", text)
+            text = _TAGS.sub("", text)
+        if "](" in text:
+            text = _MD_IMAGES.sub(r"\1", text)
+            text = _MD_LINKS.sub(r"\1", text)
+        text = _MD_EMPHASIS.sub(r"\2", text)
+        return _MD_LINE_MARKERS.sub("", text)
+
+    def _dedupe_lines(self, text: str) -> str:
+        seen = set()
+        kept = []
+        for line in text.split("\n"):
+            normalized = " ".join(line.split()).casefold()
+            if len(normalized) >= self.min_duplicate_chars:
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+            kept.append(line)
+        return "\n".join(kept)
+
+    @staticmethod
+    def _collapse_whitespace(text: str) -> str:
+        text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.replace("\r\n", "\n").split("\n"))
+        return _BLANK_LINES.sub("\n\n", text).strip()
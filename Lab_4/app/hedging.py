@@ -0,0 +1,145 @@
+"""Hedged requests and ordered model fallback.
+
+A hedged call starts on the first candidate model. If it has not answered
+within the observed latency percentile, a second request is fired at the
+next candidate (or the same model again) and the first success wins; the
+loser is cancelled. Hedges are capped at a fraction of requests so tail
+cutting can never double upstream load. A candidate that fails with a
+retryable error hands over to the next one immediately.
+"""
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """When to hedge: a latency percentile delay plus a cap on the hedge rate."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay: float = 0.05,
+        max_delay: float = 10.0,
+        max_hedge_ratio: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        """
+        Args:
+            percentile: Latency percentile after which a hedge is sent
+            min_delay: Lower bound on the hedge delay in seconds
+            max_delay: Upper bound on the hedge delay in seconds
+            max_hedge_ratio: Maximum hedges as a fraction of requests
+            window: Number of recent latencies the percentile is computed over
+            min_samples: Latencies needed before hedging starts
+        """
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def observe(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little data."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    def try_hedge(self) -> bool:
+        """Take a hedge slot if that keeps hedges within max_hedge_ratio of requests."""
+        if self.hedges + 1 > self.max_hedge_ratio * self.requests:
+            return False
+        self.hedges += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "delay": self.delay(),
+        }
+
+
+async def hedged(
+    call: Callable[[str], Awaitable[T]],
+    models: List[str],
+    policy: Optional[HedgePolicy] = None,
+    should_fallback: Callable[[BaseException], bool] = lambda exc: True,
+) -> T:
+    """
+    Run ``call(model)`` over the ordered candidate models and return the first success.
+
+    With a single model, hedges go to the same model. Without a policy the
+    candidates are only used as a sequential fallback on failure.
+    """
+    if not models:
+        raise ValueError("at least one model is required")
+    loop = asyncio.get_running_loop()
+    if policy is not None:
+        policy.requests += 1
+
+    pending = {}
+    next_model = 0
+    last_error: Optional[BaseException] = None
+
+    def launch(hedge: bool) -> None:
+        nonlocal next_model
+        # A lone model is hedged against itself
+        model = models[min(next_model, len(models) - 1)]
+        next_model += 1
+        pending[asyncio.ensure_future(call(model))] = (loop.time(), hedge)
+
+    def can_launch() -> bool:
+        return next_model < len(models) or len(models) == 1
+
+    launch(hedge=False)
+    try:
+        while pending:
+            timeout = None
+            if policy is not None and len(pending) == 1 and can_launch():
+                timeout = policy.delay()
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # Slow response: hedge if the budget allows, otherwise keep waiting
+                if policy.try_hedge():
+                    launch(hedge=True)
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    continue
+
+            for task in done:
+                started, was_hedge = pending.pop(task)
+                if task.exception() is None:
+                    if policy is not None:
+                        policy.observe(loop.time() - started)
+                        if was_hedge:
+                            policy.hedge_wins += 1
+                    return task.result()
+                last_error = task.exception()
+                if not should_fallback(last_error):
+                    raise last_error
+                if not pending and next_model < len(models):
+                    launch(hedge=False)
+        raise last_error
+    finally:
+        for task in pending:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # finished alongside the winner; mark it retrieved
@@ -0,0 +1,358 @@
+"""Asynchronous summarization jobs: a persistent store and a worker pool.
+
+A job is accepted with an id right away and run in the background by a
+fixed number of workers, so a long document no longer ties up an HTTP
+connection (and a caller's timeout no longer throws the finished work
+away). Job state lives in a SQLite file, so queued and finished jobs
+survive a restart: on start, jobs that were queued or interrupted while
+running are queued again. The id is derived from the tenant and the
+request content, so a tenant submitting an identical job gets the existing
+one back instead of running it twice; only a failed or expired job is run
+again. Jobs are stored under a tenant label (a digest of the API key),
+never the credential itself.
+
+The store is meant to be owned by one process; several processes sharing
+one file would each requeue the others' unfinished jobs on restart.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.admission import OverloadedError
+from app.models import SummarizeJob, SummarizeRequest, SummarizeResponse
+from common.sqlite_cache import content_key
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    tenant TEXT,
+    result TEXT,
+    status_code INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated_at);
+"""
+
+_COLUMNS = "id, status, result, status_code, error, created_at, updated_at"
+
+
+def job_id(model: str, request: SummarizeRequest, tenant: Optional[str] = None) -> str:
+    """Id shared by a tenant's identical jobs: a digest of the tenant label, model, text and max_length."""
+    return content_key(tenant or "", model, " ".join(request.text.split()), request.max_length).hex()[:32]
+
+
+class JobStore:
+    """
+    Job records in a local SQLite file (or ``:memory:``).
+
+    Calls are short synchronous statements. ``JobManager`` makes the reads
+    inline and runs the writes on a worker thread, as the summary cache
+    does, so a write waiting on the file lock never stalls the event loop.
+    Unlike the cache, errors are raised: a job that cannot be recorded must
+    not be reported as accepted.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: float = 24 * 3600.0, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            path: SQLite file holding the jobs (":memory:" keeps them in this process only)
+            ttl_seconds: How long a finished job stays retrievable
+            clock: Wall-clock time source (overridable in tests)
+
+        Raises:
+            ValueError: If ttl_seconds is not positive
+        """
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, job_id: str) -> Optional[SummarizeJob]:
+        """Return the job, or None if unknown or finished longer than the TTL ago."""
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (row[1] in FINISHED and row[6] + self.ttl_seconds <= self._clock()):
+            return None
+        return SummarizeJob(
+            id=row[0],
+            status=row[1],
+            result=SummarizeResponse.model_validate_json(row[2]) if row[2] is not None else None,
+            status_code=row[3],
+            error=row[4],
+            created_at=row[5],
+            updated_at=row[6],
+        )
+
+    def request(self, job_id: str) -> Optional[Tuple[SummarizeRequest, Optional[str]]]:
+        """The submitted request and tenant label of a job."""
+        with self._lock:
+            row = self._db.execute("SELECT request, tenant FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return (SummarizeRequest.model_validate_json(row[0]), row[1]) if row is not None else None
+
+    def create(self, job_id: str, request: SummarizeRequest, tenant: Optional[str]) -> SummarizeJob:
+        """Record a queued job, replacing a failed or expired one with the same id.
+
+        ``tenant`` is a label for scheduling, such as a digest of the API key;
+        it is written to the file, so it must not be a credential.
+        """
+        now = self._clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, request, tenant, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, request = excluded.request, "
+                "tenant = excluded.tenant, result = NULL, status_code = NULL, error = NULL, "
+                "created_at = excluded.created_at, updated_at = excluded.updated_at",
+                (job_id, QUEUED, request.model_dump_json(), tenant, now, now),
+            )
+        return SummarizeJob(id=job_id, status=QUEUED, created_at=now, updated_at=now)
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running; False if it is not queued (e.g. already taken)."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, self._clock(), job_id, QUEUED),
+            )
+        return cursor.rowcount == 1
+
+    def finish(
+        self,
+        job_id: str,
+        result: Optional[SummarizeResponse] = None,
+        status_code: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record the outcome: a result, or the status code and detail of the failure."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, status_code = ?, error = ?, updated_at = ? WHERE id = ?",
+                (
+                    SUCCEEDED if error is None else FAILED,
+                    result.model_dump_json() if result is not None else None,
+                    status_code,
+                    error,
+                    self._clock(),
+                    job_id,
+                ),
+            )
+
+    def recover(self) -> List[str]:
+        """Requeue jobs interrupted while running; return every queued id, oldest first."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+            rows = self._db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self) -> int:
+        """Delete finished jobs past their TTL; return how many were removed."""
+        cutoff = self._clock() - self.ttl_seconds
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE updated_at <= ? AND status IN (?, ?)", (cutoff, SUCCEEDED, FAILED)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class JobManager:
+    """
+    Runs stored jobs on ``workers`` background tasks.
+
+    At most ``max_queue`` jobs wait at once; beyond that ``submit`` sheds
+    with a 429 ``OverloadedError`` carrying a Retry-After estimate, like
+    admission control does for synchronous requests. Callers can wait for
+    a job to finish (long-polling) without polling the store.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run: Callable[[SummarizeRequest, Optional[str]], Awaitable[SummarizeResponse]],
+        describe_error: Callable[[Exception], Tuple[int, str]] = lambda e: (500, str(e)),
+        workers: int = 4,
+        max_queue: int = 256,
+        purge_interval: float = 60.0,
+    ):
+        """
+        Args:
+            store: Where job state is kept
+            run: Produces the summary of one job from its request and tenant
+            describe_error: Maps a failure of ``run`` to (status_code, detail)
+            workers: Jobs run concurrently
+            max_queue: Jobs allowed to wait for a worker
+            purge_interval: Least seconds between sweeps of expired jobs
+
+        Raises:
+            ValueError: If workers or max_queue is out of range
+        """
+        if workers < 1 or max_queue < 0:
+            raise ValueError("workers must be positive and max_queue non-negative")
+        self.store = store
+        self.workers = workers
+        self.max_queue = max_queue
+        self.purge_interval = purge_interval
+        self._run = run
+        self._describe_error = describe_error
+        # Created by start() on the running loop; jobs submitted before that are picked up from the store
+        self._queue: "Optional[asyncio.Queue[str]]" = None
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._last_purge = 0.0
+        # Smoothed seconds per job, for the Retry-After of a full queue
+        self._service_time = 1.0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        """Queue the jobs left over from a previous run and start the workers."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        # Recovered jobs were accepted before; they are not held to the queue bound
+        for pending in await asyncio.to_thread(self.store.recover):
+            self._queue.put_nowait(pending)
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def aclose(self) -> None:
+        """Stop the workers; a job cut short stays running in the store and is rerun on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        # Waiters belong to the stopping loop; wake them to report the job as it stands
+        for finished in self._finished.values():
+            finished.set()
+        self._finished.clear()
+
+    async def submit(
+        self, job_id: str, request: SummarizeRequest, tenant: Optional[str] = None
+    ) -> Tuple[SummarizeJob, bool]:
+        """
+        Accept a job, or return the identical one already known.
+
+        Returns:
+            The job and whether it was newly created
+
+        Raises:
+            OverloadedError: If the queue is full
+        """
+        await self._maybe_purge()
+        existing = self.store.get(job_id)
+        if existing is not None and existing.status != FAILED:
+            self.deduplicated += 1
+            return existing, False
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            retry_after = max(1.0, self.queue_depth * self._service_time / self.workers)
+            raise OverloadedError(429, "Job queue is full", retry_after)
+        job = await asyncio.to_thread(self.store.create, job_id, request, tenant)
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        self.submitted += 1
+        return job, True
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def get(self, job_id: str) -> Optional[SummarizeJob]:
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[SummarizeJob]:
+        """Return the job once it has finished, or as it stands after ``timeout`` seconds."""
+        job = self.store.get(job_id)
+        if job is None or job.status in FINISHED or timeout <= 0:
+            return job
+        finished = self._finished.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.store.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "stored": self.store.counts(),
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception:
+                # The store failed; keep the worker alive, the job is rerun after a restart
+                logger.exception("Job %s could not be recorded", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str) -> None:
+        submitted = self.store.request(job_id)
+        if submitted is None or not await asyncio.to_thread(self.store.claim, job_id):
+            return
+        started = time.monotonic()
+        try:
+            result = await self._run(*submitted)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status_code, detail = self._describe_error(e)
+            await asyncio.to_thread(self.store.finish, job_id, status_code=status_code, error=detail)
+            self.failed += 1
+        else:
+            await asyncio.to_thread(self.store.finish, job_id, result=result, status_code=200)
+            self.succeeded += 1
+        self._service_time += 0.2 * (time.monotonic() - started - self._service_time)
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            finished.set()
+
+    async def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            await asyncio.to_thread(self.store.purge)
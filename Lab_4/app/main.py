@@ -1,73 +1,820 @@
+import asyncio
+import json
+import math
 import os
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import requests
 
-from app.models import SummarizeRequest, SummarizeResponse
-from app.openrouter_client import OpenRouterClient
+from app.admission import AdmissionController, AdmissionMiddleware, OverloadedError
+from app.cache import CacheKey, PersistentSummaryCache, SummaryCache, make_key
+from app.compaction import Compactor
+from app.hedging import HedgePolicy
+from app.jobs import JobManager, JobStore, job_id
+from app.mapreduce import MapReduceSummarizer
+from app.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.models import (
+    BatchItemResult,
+    BatchSummarizeRequest,
+    BatchSummarizeResponse,
+    SummarizeJob,
+    SummarizeRequest,
+    SummarizeResponse,
+)
+from app.openrouter_client import OpenRouterClient, is_upstream_failure
+from app.similarity import SimilarityCache
+from app.tokens import ContextWindowExceeded, current_token_report, token_report
+from app.tracing import TraceHook, TracingMiddleware, current_trace, observe_validation, span, traced
+from common.breaker import OPEN, CircuitBreaker, CircuitOpenError
+from common.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from common.ratelimit import AdaptiveRateLimiter
+from common.router import LatencyRouter
+from common.scheduler import FairScheduler, current_priority, schedule_as
+from common.singleflight import SingleFlight
+from common.sqlite_cache import content_key
+
+# Failures a summarization call can raise; _to_http_exception maps each to a status
+SUMMARIZE_ERRORS = (ValueError, requests.RequestException, CircuitOpenError, DeadlineExceeded)
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI(title="Summarizer API Client")
-
 # Initialize OpenRouter client at startup
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL")
+# A pool of equivalent models is routed by latency; OPENROUTER_MODEL alone pins one
+OPENROUTER_MODELS = [m.strip() for m in os.getenv("OPENROUTER_MODELS", "").split(",") if m.strip()]
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL") or (OPENROUTER_MODELS[0] if OPENROUTER_MODELS else None)
 
 openrouter_client = None
 
+# Upstream calls are scheduled under one adaptive limit; it backs off on 429s
+_tokens_per_minute = os.getenv("OPENROUTER_TOKENS_PER_MINUTE")
+rate_limiter = AdaptiveRateLimiter(
+    max_rps=float(os.getenv("OPENROUTER_MAX_RPS", "20")),
+    tokens_per_minute=float(_tokens_per_minute) if _tokens_per_minute else None,
+)
+
+# Fail fast with 503 while the upstream is erroring or too slow
+circuit_breaker = CircuitBreaker(
+    min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "10")),
+    failure_rate_threshold=float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+    slow_call_seconds=float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "10")),
+    open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+    is_failure=is_upstream_failure,
+)
+
+# Hedging is opt-in: it trades a capped amount of extra upstream load for a shorter tail
+hedge_policy = None
+if os.getenv("OPENROUTER_HEDGE", "false").lower() in ("1", "true", "yes"):
+    hedge_policy = HedgePolicy(
+        percentile=float(os.getenv("OPENROUTER_HEDGE_PERCENTILE", "95")),
+        max_hedge_ratio=float(os.getenv("OPENROUTER_HEDGE_MAX_RATIO", "0.1")),
+    )
+
+model_router = None
+if len(OPENROUTER_MODELS) > 1:
+    model_router = LatencyRouter(
+        OPENROUTER_MODELS,
+        eject_seconds=float(os.getenv("ROUTER_EJECT_SECONDS", "30")),
+        probe_interval=float(os.getenv("ROUTER_PROBE_INTERVAL", "5")),
+        is_failure=is_upstream_failure,
+    )
+
+
+
+def _tenant(api_key: Optional[str]) -> Optional[str]:
+    """Tenant label of an X-API-Key: a digest, so the key itself is never stored or reported."""
+    return content_key("tenant", api_key).hex()[:16] if api_key else None
+
+
+# One upstream concurrency budget: interactive calls are dispatched before batch
+# work, and tenants (API keys) share each class by weight
+upstream_scheduler = FairScheduler(
+    concurrency=int(os.getenv("UPSTREAM_CONCURRENCY", "64")),
+    classes=("interactive", "batch"),
+    weights={
+        _tenant(tenant.strip()): float(weight)
+        for tenant, _, weight in (
+            pair.partition("=") for pair in os.getenv("SCHEDULER_TENANT_WEIGHTS", "").split(",") if "=" in pair
+        )
+    },
+)
+
 if OPENROUTER_API_KEY and OPENROUTER_MODEL:
     try:
-        openrouter_client = OpenRouterClient(OPENROUTER_API_KEY, OPENROUTER_MODEL)
+        openrouter_client = OpenRouterClient(
+            OPENROUTER_API_KEY,
+            OPENROUTER_MODEL,
+            # Opt-in: stopping a streamed reply early closes its connection instead of reusing it
+            early_stop=os.getenv("OPENROUTER_EARLY_STOP", "false").lower() in ("1", "true", "yes"),
+            rate_limiter=rate_limiter,
+            breaker=circuit_breaker,
+            fallback_models=[m.strip() for m in os.getenv("OPENROUTER_FALLBACK_MODELS", "").split(",") if m.strip()],
+            hedge_policy=hedge_policy,
+            router=model_router,
+            scheduler=upstream_scheduler,
+            base_url=os.getenv("OPENROUTER_BASE_URL") or None,
+            # Opt-in: whitespace, markup and (optionally) repeated lines are stripped before they are billed
+            compactor=Compactor(
+                dedupe_lines=os.getenv("PROMPT_COMPACTION_DEDUPE_LINES", "false").lower() in ("1", "true", "yes"),
+            )
+            if os.getenv("PROMPT_COMPACTION", "false").lower() in ("1", "true", "yes")
+            else None,
+        )
     except ValueError as e:
         print(f"Warning: Failed to initialize OpenRouter client: {e}")
 
+# Repeated documents are answered from the cache instead of a paid upstream call.
+# With SUMMARY_CACHE_PATH set, every worker on the host shares one SQLite file
+# (which also survives restarts); otherwise each process keeps its own in memory
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", "")
+summary_cache: Union[SummaryCache, PersistentSummaryCache]
+if SUMMARY_CACHE_PATH:
+    summary_cache = PersistentSummaryCache(
+        SUMMARY_CACHE_PATH,
+        max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "100000")),
+        max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "3600")),
+    )
+else:
+    summary_cache = SummaryCache(
+        max_entries=int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "3600")),
+    )
+
+# Optional near-duplicate lookup behind the exact cache: inputs whose word
+# shingles overlap a cached input's by at least the threshold (Jaccard) reuse
+# its summary, flagged with similarity_hit
+similarity_cache: Optional[SimilarityCache] = None
+if os.getenv("SIMILARITY_CACHE", "false").lower() in ("1", "true", "yes"):
+    similarity_cache = SimilarityCache(
+        threshold=float(os.getenv("SIMILARITY_CACHE_THRESHOLD", "0.9")),
+        max_entries=int(os.getenv("SIMILARITY_CACHE_MAX_ENTRIES", "4096")),
+        max_words=int(os.getenv("SIMILARITY_CACHE_MAX_WORDS", "1000")),
+        ttl_seconds=float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "3600")),
+    )
+
+# Identical requests that arrive while one is in flight share its upstream call
+summarize_flight = SingleFlight()
+
+# Upper bound on concurrent upstream calls made for a single batch request
+BATCH_CONCURRENCY = int(os.getenv("SUMMARIZE_BATCH_CONCURRENCY", "8"))
+
+# Documents too long for one prompt next to the reply are summarized chunk by
+# chunk, then reduced. Chunks are as large as the model's context allows unless
+# MAPREDUCE_CHUNK_TOKENS caps them, and with them the single-call input (e.g.
+# 3000, trading extra calls for shorter ones)
+MAPREDUCE_CHUNK_TOKENS: Optional[int] = int(os.getenv("MAPREDUCE_CHUNK_TOKENS") or 0) or None
+MAPREDUCE_CHUNK_SUMMARY_WORDS = int(os.getenv("MAPREDUCE_CHUNK_SUMMARY_WORDS", "120"))
+MAPREDUCE_CONCURRENCY = int(os.getenv("MAPREDUCE_CONCURRENCY", "4"))
+
+
+# Shed load at the door: bounded concurrency, a short queue, fast 429/503 rejections
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+)
+
+# Long documents can run as background jobs instead of holding a connection open.
+# Job state is kept in JOBS_DB_PATH, so jobs survive restarts (in memory when unset)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_MAX_QUEUE = int(os.getenv("JOBS_MAX_QUEUE", "256"))
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", str(24 * 3600)))
+# Budget of one job run, and the longest a GET may long-poll for its result
+JOBS_TIMEOUT = float(os.getenv("JOBS_TIMEOUT", "300"))
+JOBS_MAX_WAIT = float(os.getenv("JOBS_MAX_WAIT", "30"))
+
+# Every request is traced per phase and answered with its X-Request-ID;
+# SERVER_TIMING=true also reports the phase timings in a Server-Timing header.
+# Hooks appended to trace_hooks (e.g. a SlowRequestProfiler) see every trace
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+trace_hooks: List[TraceHook] = []
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the upstream connection pool and start the job workers on startup; stop both on shutdown."""
+    if openrouter_client is not None:
+        await openrouter_client.start()
+    await job_manager.start()
+    yield
+    await job_manager.aclose()
+    if openrouter_client is not None:
+        await openrouter_client.aclose()
+
+
+app = FastAPI(title="Summarizer API Client", lifespan=lifespan)
+# Jobs are bounded by their own queue, and a long-poll must not hold an admission slot
+app.add_middleware(AdmissionMiddleware, controller=admission, paths=("/summarize",), exclude=("/summarize/jobs",))
+# Outside admission, so requests shed by admission are counted too
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every response carries a request id and the trace spans everything
+app.add_middleware(TracingMiddleware, server_timing=SERVER_TIMING, hooks=trace_hooks)
+
+
+class CircuitBreakerStatus(BaseModel):
+    state: str
+    retry_after: float
+    recent_calls: int
+    rejected: int
+    times_opened: int
+
 
 class HealthResponse(BaseModel):
     status: str
     message: str
+    circuit_breaker: Optional[CircuitBreakerStatus] = None
+
+
+class RouterTargetStatus(BaseModel):
+    latency: float
+    error_rate: float
+    in_flight: int
+    calls: int
+    ejected: bool
+
+
+class SchedulerClassStats(BaseModel):
+    queued: int
+    dispatched: int
+    mean_wait: float
+    p95_wait: float
+    max_wait: float
+
+
+class SchedulerStatsResponse(BaseModel):
+    concurrency: int
+    in_flight: int
+    classes: Dict[str, SchedulerClassStats]
+
+
+class AdmissionStatsResponse(BaseModel):
+    in_flight: int
+    queue_depth: int
+    max_in_flight: int
+    max_queue: int
+    admitted: int
+    rejected_queue_full: int
+    rejected_deadline: int
+    timed_out: int
+
+
+class CacheStatsResponse(BaseModel):
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    errors: int = 0
+
+
+class JobStoreCounts(BaseModel):
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+
+
+class JobStatsResponse(BaseModel):
+    workers: int
+    queue_depth: int
+    max_queue: int
+    submitted: int
+    deduplicated: int
+    rejected: int
+    succeeded: int
+    failed: int
+    stored: JobStoreCounts
+
+
+class SimilarityCacheStatsResponse(BaseModel):
+    enabled: bool
+    entries: int = 0
+    threshold: Optional[float] = None
+    bands: int = 0
+    rows: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    skipped: int = 0
 
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint to verify the service is running."""
+    breaker = getattr(openrouter_client, "breaker", None)
+    if breaker is None:
+        return HealthResponse(
+            status="healthy",
+            message="Service is running"
+        )
+
+    snapshot = CircuitBreakerStatus(**breaker.snapshot())
+    if snapshot.state == OPEN:
+        return HealthResponse(
+            status="degraded",
+            message="Upstream circuit breaker is open",
+            circuit_breaker=snapshot,
+        )
     return HealthResponse(
         status="healthy",
-        message="Service is running"
+        message="Service is running",
+        circuit_breaker=snapshot,
     )
 
 
-@app.post("/summarize", response_model=SummarizeResponse)
-async def summarize(request: SummarizeRequest) -> SummarizeResponse:
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose request, phase, upstream and token metrics in the Prometheus text format."""
+    return PlainTextResponse(REGISTRY.expose(), media_type=CONTENT_TYPE)
+
+
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+async def cache_stats():
+    """Report summary cache size and hit/miss/eviction counters."""
+    return CacheStatsResponse(**summary_cache.stats())
+
+
+@app.get("/cache/similarity/stats", response_model=SimilarityCacheStatsResponse)
+async def similarity_cache_stats():
+    """Report near-duplicate cache size and hit/miss counters."""
+    if similarity_cache is None:
+        return SimilarityCacheStatsResponse(enabled=False)
+    return SimilarityCacheStatsResponse(enabled=True, **similarity_cache.stats())
+
+
+@app.get("/admission/stats", response_model=AdmissionStatsResponse)
+async def admission_stats():
+    """Report admitted and shed requests and the current queue depth."""
+    return AdmissionStatsResponse(**admission.stats())
+
+
+@app.get("/scheduler/stats", response_model=SchedulerStatsResponse)
+async def scheduler_stats():
+    """Report the upstream concurrency budget and queue waits per priority class."""
+    return SchedulerStatsResponse(**upstream_scheduler.stats())
+
+
+@app.get("/router/stats", response_model=Dict[str, RouterTargetStatus])
+async def router_stats():
+    """Report latency, error rate, load and ejection state per routed model."""
+    router = getattr(openrouter_client, "router", None)
+    return router.snapshot() if router is not None else {}
+
+
+def _map_reduce_summarizer(max_length: int) -> MapReduceSummarizer:
     """
-    Summarize the provided text using OpenRouter API.
-    
-    If OpenRouter is not configured, falls back to placeholder implementation.
+    Build a long-document summarizer sharing the client and summary cache.
+
+    Raises:
+        ContextWindowExceeded: If the prompt framing and the reply alone cannot fit the model's context window
     """
-    # Check if OpenRouter client is available
+    # Chunks and the reduce input must fit the model's context next to the reply
+    estimator = openrouter_client.estimator_for()
+    reply_words = max(max_length, MAPREDUCE_CHUNK_SUMMARY_WORDS)
+    budget = estimator.input_budget(reply_words)
+    if budget <= 0:
+        # Even a prompt with no input, only its framing, cannot fit next to the
+        # reply; no chunking can help
+        raise ContextWindowExceeded(
+            openrouter_client.model,
+            estimator.prompt_overhead(),
+            estimator.completion_tokens(reply_words),
+            estimator.context_window,
+        )
+    # A document that fits one max_length call is summarized directly
+    max_input_tokens = estimator.input_budget(max_length)
+    if MAPREDUCE_CHUNK_TOKENS is not None:
+        budget = min(MAPREDUCE_CHUNK_TOKENS, budget)
+        max_input_tokens = min(MAPREDUCE_CHUNK_TOKENS, max_input_tokens)
+    return MapReduceSummarizer(
+        openrouter_client,
+        cache=summary_cache,
+        chunk_tokens=budget,
+        max_input_tokens=max_input_tokens,
+        chunk_summary_words=MAPREDUCE_CHUNK_SUMMARY_WORDS,
+        concurrency=MAPREDUCE_CONCURRENCY,
+        estimate=estimator.count,
+    )
+
+
+async def _summarize_cached(request: SummarizeRequest, bypass_cache: bool = False) -> Tuple[SummarizeResponse, str]:
+    """
+    Summarize one request through the cache and the single-flight layer.
+
+    Returns:
+        The summary and its cache status (HIT, SIMILAR, MISS or BYPASS)
+
+    Raises:
+        ValueError: If the input or upstream response is invalid
+        requests.RequestException: If the upstream call fails
+        CircuitOpenError: If the circuit breaker is rejecting calls
+    """
+    key = make_key(openrouter_client.model, request.text, request.max_length)
+    if not bypass_cache:
+        with span("cache"):
+            cached = summary_cache.get(key)
+            match = None
+            if cached is None and similarity_cache is not None:
+                match = similarity_cache.get(openrouter_client.model, request.text, request.max_length)
+        if cached is not None:
+            return cached, "HIT"
+        if match is not None:
+            return match[0].model_copy(update={"similarity_hit": True}), "SIMILAR"
+
+    # The shared call carries no caller's deadline or tenant: each waiter's
+    # deadline bounds only its own wait. It is queued under the priority class
+    # all its waiters share and recorded in the first caller's trace and report
+    priority, trace, tokens = current_priority(), current_trace(), current_token_report()
+
+    async def fetch_summary() -> SummarizeResponse:
+        with schedule_as(priority), traced(trace), token_report(tokens):
+            # Call OpenRouter API for summarization
+            long_document = _map_reduce_summarizer(request.max_length)
+            if long_document.needs_map_reduce(request.text):
+                result = await long_document.summarize(request.text, request.max_length)
+            else:
+                result = await openrouter_client.asummarize(request.text, request.max_length)
+        summary = SummarizeResponse(**result)
+        await summary_cache.aset(key, summary)
+        if similarity_cache is not None:
+            similarity_cache.set(openrouter_client.model, request.text, request.max_length, summary)
+        return summary
+
+    summary = await summarize_flight.do((key, priority), fetch_summary)
+    return summary, "BYPASS" if bypass_cache else "MISS"
+
+
+def _to_http_exception(error: Exception) -> HTTPException:
+    """Map a summarization failure to the HTTP error /summarize returns for it."""
+    if isinstance(error, ContextWindowExceeded):
+        # Even compacted and chunked, the input cannot fit the model's context
+        return HTTPException(status_code=413, detail=str(error))
+
+    if isinstance(error, ValueError):
+        # Input validation errors
+        return HTTPException(status_code=400, detail=str(error))
+
+    if isinstance(error, DeadlineExceeded):
+        # The caller's time budget ran out before the upstream could answer
+        return HTTPException(status_code=504, detail=str(error))
+
+    if isinstance(error, CircuitOpenError):
+        # Upstream is known to be failing; tell the caller when to come back
+        return HTTPException(
+            status_code=503,
+            detail=str(error),
+            headers={"Retry-After": str(math.ceil(error.retry_after))},
+        )
+
+    # API request failures
+    return HTTPException(
+        status_code=502,
+        detail=f"Failed to call OpenRouter API: {str(error)}"
+    )
+
+
+async def _run_job(request: SummarizeRequest, tenant: Optional[str]) -> SummarizeResponse:
+    """Summarize a job's request as batch traffic of its tenant, within JOBS_TIMEOUT."""
+    _require_client()
+    with schedule_as("batch", tenant), deadline_scope(JOBS_TIMEOUT):
+        summary, _ = await _summarize_cached(request)
+    return summary
+
+
+def _describe_error(error: Exception) -> Tuple[int, str]:
+    """Status and detail a failed job or batch item reports: what /summarize would have answered."""
+    if isinstance(error, (HTTPException,) + SUMMARIZE_ERRORS):
+        error = error if isinstance(error, HTTPException) else _to_http_exception(error)
+        return error.status_code, str(error.detail)
+    return 500, "Internal error while summarizing"
+
+
+job_manager = JobManager(
+    JobStore(JOBS_DB_PATH or ":memory:", ttl_seconds=JOBS_TTL_SECONDS),
+    _run_job,
+    describe_error=_describe_error,
+    workers=JOBS_WORKERS,
+    max_queue=JOBS_MAX_QUEUE,
+)
+
+
+def _request_deadline(header: Optional[str], query: Optional[float]) -> Optional[Deadline]:
+    """
+    Deadline from the X-Request-Timeout header or ``timeout`` query parameter (seconds).
+
+    The admission middleware already started the clock when the request
+    arrived; whichever deadline is earlier wins.
+    """
+    value = query
+    if value is None and header is not None:
+        try:
+            value = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be a number of seconds")
+    outer = current_deadline()
+    if value is None:
+        return outer
+    if value <= 0:
+        raise HTTPException(status_code=400, detail="Request timeout must be positive")
+    deadline = Deadline.after(value)
+    return outer if outer is not None and outer.expires_at <= deadline.expires_at else deadline
+
+
+def _require_client() -> None:
+    """Raise 503 if the OpenRouter client is not configured."""
     if openrouter_client is None:
         raise HTTPException(
             status_code=503,
             detail="OpenRouter API client not configured. Set OPENROUTER_API_KEY and OPENROUTER_MODEL environment variables."
         )
+
+
+@app.post("/summarize", response_model=SummarizeResponse)
+async def summarize(
+    request: SummarizeRequest,
+    response: Response,
+    cache_control: Optional[str] = Header(default=None),
+    x_api_key: Optional[str] = Header(default=None),
+    x_request_timeout: Optional[str] = Header(default=None),
+    timeout: Optional[float] = Query(default=None),
+) -> SummarizeResponse:
+    """
+    Summarize the provided text using OpenRouter API.
     
+    If OpenRouter is not configured, falls back to placeholder implementation.
+    Identical requests are served from the summary cache (and, if enabled,
+    near-duplicates from the similarity cache, with ``X-Cache: SIMILAR``);
+    send ``Cache-Control: no-cache`` to force a fresh upstream call. Upstream
+    calls are scheduled as interactive traffic of the ``X-API-Key`` tenant.
+    An overall budget in seconds (``X-Request-Timeout`` header or ``timeout``
+    parameter) bounds retries and sub-calls; running out answers 504.
+    ``X-Prompt-Tokens-Saved`` reports the input tokens compaction removed.
+    """
+    # Check if OpenRouter client is available
+    observe_validation()
+    _require_client()
+
+    bypass_cache = cache_control is not None and "no-cache" in cache_control.lower()
+    deadline = _request_deadline(x_request_timeout, timeout)
     try:
-        # Call OpenRouter API for summarization
-        result = openrouter_client.summarize(request.text, request.max_length)
-        return SummarizeResponse(**result)
-    
-    except ValueError as e:
-        # Input validation errors
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    except requests.RequestException as e:
-        # API request failures
+        with schedule_as("interactive", _tenant(x_api_key)), deadline_scope(deadline), token_report() as tokens:
+            summary, cache_status = await _summarize_cached(request, bypass_cache)
+    except SUMMARIZE_ERRORS as e:
+        raise _to_http_exception(e)
+
+    response.headers["X-Cache"] = cache_status
+    response.headers["X-Prompt-Tokens-Saved"] = str(tokens.saved)
+    return summary
+
+
+async def _summarize_batch_item(
+    index: int, item: SummarizeRequest, limit: asyncio.Semaphore, tenant: Optional[str], deadline: Optional[Deadline]
+) -> BatchItemResult:
+    async with limit:
+        try:
+            with schedule_as("batch", tenant), deadline_scope(deadline):
+                summary, _ = await _summarize_cached(item)
+        except Exception as e:
+            # Unexpected errors (e.g. a malformed upstream reply) fail only this item, with 500
+            status_code, detail = _describe_error(e)
+            return BatchItemResult(index=index, status_code=status_code, error=detail)
+    return BatchItemResult(index=index, status_code=200, result=summary)
+
+
+async def _stream_batch(
+    items: List[SummarizeRequest], tenant: Optional[str], deadline: Optional[Deadline]
+) -> AsyncIterator[str]:
+    """Yield one NDJSON line per item in completion order."""
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_summarize_batch_item(i, item, limit, tenant, deadline))
+        for i, item in enumerate(items)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item_result = await next_done
+            yield item_result.model_dump_json() + "\n"
+    finally:
+        # The client went away mid-stream: stop the remaining items
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/summarize/batch", response_model=BatchSummarizeResponse)
+async def summarize_batch(
+    batch: BatchSummarizeRequest,
+    x_api_key: Optional[str] = Header(default=None),
+    x_request_timeout: Optional[str] = Header(default=None),
+    timeout: Optional[float] = Query(default=None),
+):
+    """
+    Summarize several documents concurrently.
+
+    At most ``SUMMARIZE_BATCH_CONCURRENCY`` items are in flight at once.
+    A failing item is reported in its own result and does not fail the
+    batch. With ``stream`` set, results are sent as NDJSON lines as each
+    item finishes, tagged with their ``index``; otherwise they are
+    returned together in input order. Items are scheduled as batch traffic,
+    behind interactive requests. A request timeout bounds the whole batch;
+    items it cuts short report 504.
+    """
+    observe_validation()
+    _require_client()
+    deadline = _request_deadline(x_request_timeout, timeout)
+    tenant = _tenant(x_api_key)
+
+    if batch.stream:
+        return StreamingResponse(_stream_batch(batch.items, tenant, deadline), media_type="application/x-ndjson")
+
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_summarize_batch_item(i, item, limit, tenant, deadline))
+        for i, item in enumerate(batch.items)
+    ]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        # The request was abandoned: stop the remaining items
+        for task in tasks:
+            task.cancel()
+    return BatchSummarizeResponse(results=results)
+
+
+async def _replay_summary(summary: SummarizeResponse) -> AsyncIterator[dict]:
+    """Emit a cached summary in the same event shape as a live stream."""
+    yield {"type": "token", "text": summary.summary}
+    yield {"type": "done", **summary.model_dump()}
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _next_event(events: AsyncIterator[dict], deadline: Optional[Deadline]) -> dict:
+    if deadline is None:
+        return await events.__anext__()
+    try:
+        timeout = deadline.timeout()
+        return await asyncio.wait_for(events.__anext__(), timeout)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded("Deadline exceeded while streaming") from e
+
+
+async def _relay_events(
+    first: dict, events: AsyncIterator[dict], key: CacheKey, deadline: Optional[Deadline] = None
+) -> AsyncIterator[str]:
+    """Forward stream events as SSE and cache the finished summary."""
+    event = first
+    try:
+        while True:
+            if event["type"] == "token":
+                yield _sse("token", {"text": event["text"]})
+            else:
+                summary = SummarizeResponse(
+                    summary=event["summary"], model=event["model"], truncated=event["truncated"]
+                )
+                await summary_cache.aset(key, summary)
+                yield _sse("done", {"model": summary.model, "truncated": summary.truncated})
+                return
+            event = await _next_event(events, deadline)
+    except SUMMARIZE_ERRORS as e:
+        error = _to_http_exception(e)
+        yield _sse("error", {"status_code": error.status_code, "detail": error.detail})
+    finally:
+        # Closes the upstream stream if the caller disconnected early
+        await events.aclose()
+
+
+class _EventStreamResponse(StreamingResponse):
+    """
+    StreamingResponse that closes its body and event source however it ends.
+
+    A client that disconnects before the body is read cancels the response
+    before the body generator ever starts, so the generator's own ``finally``
+    never runs. Without this, the upstream stream (and the scheduler slot it
+    holds) would stay open until garbage collection.
+    """
+
+    def __init__(self, content: AsyncIterator[str], events: AsyncIterator[dict], **kwargs):
+        super().__init__(content, **kwargs)
+        self._events = events
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            await self._events.aclose()
+
+
+@app.post("/summarize/stream")
+async def summarize_stream(
+    request: SummarizeRequest,
+    x_api_key: Optional[str] = Header(default=None),
+    x_request_timeout: Optional[str] = Header(default=None),
+    timeout: Optional[float] = Query(default=None),
+):
+    """
+    Summarize the provided text, relaying tokens as Server-Sent Events.
+
+    Emits a ``token`` event per generated chunk and a final ``done`` event
+    carrying ``model`` and ``truncated``. Long documents are condensed by
+    map-reduce first and only the final pass is streamed. Upstream failures before the first
+    token return the same HTTP errors as /summarize; later failures are
+    sent as an ``error`` event. A request timeout also bounds the stream:
+    when it runs out mid-stream, an ``error`` event with status 504 ends it.
+    Compaction happens before the first event, so ``X-Prompt-Tokens-Saved``
+    is sent with the response headers.
+    """
+    observe_validation()
+    _require_client()
+    deadline = _request_deadline(x_request_timeout, timeout)
+
+    key = make_key(openrouter_client.model, request.text, request.max_length)
+    cached = summary_cache.get(key)
+
+    try:
+        # The upstream stream takes its scheduler slot on the first event, under this label
+        with schedule_as("interactive", _tenant(x_api_key)), deadline_scope(deadline), token_report() as tokens:
+            if cached is not None:
+                events = _replay_summary(cached)
+            else:
+                # Long documents run their map levels first; only the reduce pass streams
+                text = await _map_reduce_summarizer(request.max_length).condense(request.text)
+                events = openrouter_client.astream_summarize(text, request.max_length)
+            first = await events.__anext__()
+    except SUMMARIZE_ERRORS as e:
+        raise _to_http_exception(e)
+
+    return _EventStreamResponse(
+        _relay_events(first, events, key, deadline),
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Prompt-Tokens-Saved": str(tokens.saved)},
+    )
+
+
+@app.post("/summarize/jobs", response_model=SummarizeJob, status_code=202)
+async def submit_summarize_job(
+    request: SummarizeRequest,
+    response: Response,
+    x_api_key: Optional[str] = Header(default=None),
+) -> SummarizeJob:
+    """
+    Queue a summarization job and return its id right away (202).
+
+    The job runs on the background workers as batch traffic of the
+    ``X-API-Key`` tenant; fetch it from ``Location``. Submitting a job
+    identical to one of the same tenant that is queued, running or finished
+    returns that job (200) instead of running it again; a failed job is run
+    again. Tenants never share jobs. A full
+    job queue answers 429 with ``Retry-After``.
+    """
+    _require_client()
+    try:
+        tenant = _tenant(x_api_key)
+        job, created = await job_manager.submit(job_id(openrouter_client.model, request, tenant), request, tenant)
+    except OverloadedError as e:
         raise HTTPException(
-            status_code=502,
-            detail=f"Failed to call OpenRouter API: {str(e)}"
+            status_code=e.status_code, detail=e.reason, headers={"Retry-After": str(math.ceil(e.retry_after))}
         )
+    if not created:
+        response.status_code = 200
+    response.headers["Location"] = f"/summarize/jobs/{job.id}"
+    return job
+
+
+@app.get("/summarize/jobs/stats", response_model=JobStatsResponse)
+async def summarize_job_stats():
+    """Report the job queue, worker outcomes and stored jobs by status."""
+    return JobStatsResponse(**job_manager.stats())
+
+
+@app.get("/summarize/jobs/{id}", response_model=SummarizeJob)
+async def get_summarize_job(id: str, wait: float = Query(default=0, ge=0)) -> SummarizeJob:
+    """
+    Report a job's status, and its result once it has succeeded.
+
+    With ``wait`` (seconds, capped at ``JOBS_MAX_WAIT``) an unfinished job
+    is long-polled: the answer comes as soon as the job finishes, or with
+    its current status when the wait is over.
+    """
+    job = await job_manager.wait(id, min(wait, JOBS_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 if __name__ == "__main__":
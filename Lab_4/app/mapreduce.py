@@ -0,0 +1,179 @@
+"""Map-reduce summarization for documents too long for a single prompt."""
+import asyncio
+import re
+import zlib
+from typing import Callable, List, Optional, Tuple, Union
+
+from app.cache import PersistentSummaryCache, SummaryCache, make_key
+from app.models import SummarizeResponse
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def _split_pieces(text: str, max_tokens: int, estimate: Callable[[str], int]) -> List[Tuple[str, bool]]:
+    """Split text into (piece, ends_paragraph) units that each fit in max_tokens."""
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate(paragraph) <= max_tokens:
+            pieces.append((paragraph, True))
+            continue
+
+        units = []
+        for sentence in _SENTENCE_END.split(paragraph):
+            if estimate(sentence) <= max_tokens:
+                units.append(sentence)
+                continue
+            # A single over-long sentence: fall back to word windows. The window
+            # is sized by a running sum of word estimates (an upper bound, as
+            # estimates are at most additive) and only re-estimated as a whole
+            # when the sum crosses the budget, keeping the split linear
+            space = estimate(" ")
+            window = []
+            size = 0
+            for word in sentence.split():
+                size += estimate(word) + (space if window else 0)
+                if window and size > max_tokens:
+                    size = estimate(" ".join(window + [word]))
+                    if size > max_tokens:
+                        units.append(" ".join(window))
+                        window, size = [], estimate(word)
+                window.append(word)
+            if window:
+                units.append(" ".join(window))
+        pieces.extend((unit, i == len(units) - 1) for i, unit in enumerate(units))
+    return pieces
+
+
+def split_text(text: str, max_tokens: int, estimate: Callable[[str], int] = approx_tokens) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens, on paragraph and sentence boundaries.
+
+    Chunk boundaries are content-defined: whether a chunk closes after a
+    paragraph depends only on that paragraph's hash and size (chunks average
+    about half the budget). An edit therefore moves at most the boundaries
+    next to the edited paragraph, and unchanged chunks keep their cache keys.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be > 0")
+
+    target = max(1, max_tokens // 2)
+    chunks = []
+    current: List[str] = []
+    size = 0
+    separator = ""
+    for piece, ends_paragraph in _split_pieces(text, max_tokens, estimate):
+        piece_tokens = estimate(piece)
+        if current and size + piece_tokens > max_tokens:
+            chunks.append("".join(current))
+            current, size, separator = [], 0, ""
+        current.append(separator + piece)
+        size += piece_tokens
+        separator = "\n\n" if ends_paragraph else " "
+        if ends_paragraph and zlib.crc32(piece.encode("utf-8")) % target < piece_tokens:
+            chunks.append("".join(current))
+            current, size, separator = [], 0, ""
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+class MapReduceSummarizer:
+    """
+    Summarize long documents by summarizing chunks in parallel and then
+    summarizing the joined chunk summaries.
+
+    Text that fits ``max_input_tokens`` is summarized in one call. If the
+    joined summaries still exceed it the map step is repeated on them, so latency grows with the number of levels rather
+    than with document length.
+    """
+
+    def __init__(
+        self,
+        client,
+        cache: Optional[Union[SummaryCache, PersistentSummaryCache]] = None,
+        chunk_tokens: int = 3000,
+        chunk_summary_words: int = 120,
+        concurrency: int = 4,
+        max_levels: int = 4,
+        estimate: Callable[[str], int] = approx_tokens,
+        max_input_tokens: Optional[int] = None,
+    ):
+        """
+        Args:
+            client: OpenRouterClient used for every chunk and reduce call
+            cache: Optional cache for per-chunk summaries
+            chunk_tokens: Token budget for a single chunk or reduce input
+            chunk_summary_words: max_length requested for each chunk summary
+            concurrency: Maximum concurrent chunk calls
+            max_levels: Maximum number of map levels before reducing
+            estimate: Token estimator for chunk sizing
+            max_input_tokens: Largest input summarized in a single call
+                (defaults to ``chunk_tokens``)
+        """
+        if concurrency <= 0:
+            raise ValueError("concurrency must be > 0")
+        self.client = client
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.chunk_summary_words = chunk_summary_words
+        self.concurrency = concurrency
+        self.max_levels = max_levels
+        self.estimate = estimate
+        self.max_input_tokens = max_input_tokens or chunk_tokens
+
+    def needs_map_reduce(self, text: str) -> bool:
+        return self.estimate(text) > self.max_input_tokens
+
+    async def _summarize_chunk(self, chunk: str, limit: asyncio.Semaphore) -> str:
+        key = make_key(self.client.model, chunk, self.chunk_summary_words)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached.summary
+
+        async with limit:
+            result = await self.client.asummarize(chunk, self.chunk_summary_words)
+        if self.cache is not None:
+            await self.cache.aset(key, SummarizeResponse(**result))
+        return result["summary"]
+
+    async def condense(self, text: str) -> str:
+        """Run map levels until text fits in one call; return the reduce input."""
+        # Compacted first: dropping markup and repeated lines may spare a map level
+        text = self.client.compact(text)
+        limit = asyncio.Semaphore(self.concurrency)
+        for _ in range(self.max_levels):
+            if not self.needs_map_reduce(text):
+                break
+            chunks = split_text(text, self.chunk_tokens, self.estimate)
+            tasks = [asyncio.ensure_future(self._summarize_chunk(c, limit)) for c in chunks]
+            try:
+                summaries = await asyncio.gather(*tasks)
+            finally:
+                # A chunk failed or the caller left: the other chunk summaries are of no use
+                for task in tasks:
+                    task.cancel()
+            condensed = "\n\n".join(summaries)
+            if len(condensed) >= len(text):
+                # Chunk summaries are not shrinking the text; reduce what we have
+                return condensed
+            text = condensed
+        return text
+
+    async def summarize(self, text: str, max_length: int = 100) -> dict:
+        """
+        Summarize text of any length.
+
+        Returns:
+            Dictionary with keys: summary, model, truncated
+        """
+        return await self.client.asummarize(await self.condense(text), max_length)
@@ -0,0 +1,101 @@
+"""Metrics of the summarizer API and the middleware that records HTTP traffic.
+
+They are defined on the shared registry of ``common.metrics``, which
+``GET /metrics`` renders.
+"""
+import time
+
+from common.metrics import CONTENT_TYPE, REGISTRY, Counter, Gauge, Histogram  # noqa: F401
+
+
+# --- Metrics of the summarizer API ---------------------------------------
+
+HTTP_REQUESTS = Counter(
+    "summarizer_http_requests_total", "HTTP requests by route, method and status code", ["route", "method", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram("summarizer_http_request_duration_seconds", "HTTP request latency by route", ["route"])
+HTTP_IN_FLIGHT = Gauge("summarizer_http_requests_in_flight", "HTTP requests being processed")
+PHASE_SECONDS = Histogram(
+    "summarizer_phase_seconds",
+    "Time spent per phase of a summarize request: validation, queueing (admission queue and "
+    "upstream scheduler, one observation per wait), upstream and parsing",
+    ["phase"],
+)
+UPSTREAM_RESPONSES = Counter(
+    "summarizer_upstream_responses_total",
+    "Upstream responses by model and status code ('error' when no response arrived)",
+    ["model", "status"],
+)
+UPSTREAM_RETRIES = Counter("summarizer_upstream_retries_total", "Upstream attempts that were retries", ["model"])
+UPSTREAM_IN_FLIGHT = Gauge("summarizer_upstream_in_flight", "Upstream attempts in progress")
+UPSTREAM_POOL_CAPACITY = Gauge(
+    "summarizer_upstream_pool_capacity", "Connection limit summed over the open upstream connection pools"
+)
+# A proxy for pool pressure, not the pool's own state: attempts still waiting
+# for a connection count too, so it exceeds 1.0 once requests queue on the pool
+UPSTREAM_INFLIGHT_RATIO = Gauge(
+    "summarizer_upstream_inflight_ratio",
+    "Upstream attempts in progress over the summed connection limit (a proxy; may exceed 1)",
+)
+UPSTREAM_INFLIGHT_RATIO.set_function(
+    lambda: UPSTREAM_IN_FLIGHT.value() / UPSTREAM_POOL_CAPACITY.value() if UPSTREAM_POOL_CAPACITY.value() else 0.0
+)
+UPSTREAM_TOKENS = Counter(
+    "summarizer_upstream_tokens_total", "Tokens reported in upstream usage, by model and kind", ["model", "kind"]
+)
+PROMPT_TOKENS_SAVED = Counter(
+    "summarizer_prompt_tokens_saved_total", "Estimated input tokens removed by prompt compaction", ["model"]
+)
+
+
+def record_usage(usage: object, model: str) -> None:
+    """Count prompt and completion tokens from an upstream ``usage`` object."""
+    if not isinstance(usage, dict):
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if isinstance(tokens, (int, float)):
+            UPSTREAM_TOKENS.labels(model, kind).inc(tokens)
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        # Requests answered by middleware (e.g. shed by admission) never reach the router
+        from starlette.routing import Match
+
+        for candidate in getattr(scope["app"], "routes", ()):
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = _route_name(scope)
+            HTTP_REQUESTS.labels(route, scope["method"], status).inc()
+            HTTP_REQUEST_SECONDS.labels(route).observe(time.perf_counter() - started)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_serializer
 
 
 class SummarizeRequest(BaseModel):
@@ -20,3 +22,44 @@ class SummarizeResponse(BaseModel):
     summary: str = Field(..., description="The generated summary")
     model: str = Field(..., description="The model used to generate the summary")
     truncated: bool = Field(..., description="Whether the summary was truncated")
+    similarity_hit: Optional[bool] = Field(
+        default=None, description="True when served from the cached summary of a near-duplicate input"
+    )
+
+    @model_serializer(mode="wrap")
+    def omit_unset_similarity_hit(self, handler):
+        """Leave similarity_hit out of the output unless it is set."""
+        data = handler(self)
+        if isinstance(data, dict) and data.get("similarity_hit") is None:
+            data.pop("similarity_hit", None)
+        return data
+
+
+class BatchSummarizeRequest(BaseModel):
+    """Request schema for the /summarize/batch endpoint."""
+    items: List[SummarizeRequest] = Field(..., description="Documents to summarize (1-100 items)", min_length=1, max_length=100)
+    stream: bool = Field(default=False, description="Stream each result as NDJSON as soon as it finishes")
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one item in a batch; exactly one of result or error is set."""
+    index: int = Field(..., description="Position of the item in the request")
+    status_code: int = Field(..., description="HTTP status the item would have returned on /summarize")
+    result: Optional[SummarizeResponse] = Field(default=None, description="The summary, if the item succeeded")
+    error: Optional[str] = Field(default=None, description="Error detail, if the item failed")
+
+
+class BatchSummarizeResponse(BaseModel):
+    """Response schema for the /summarize/batch endpoint."""
+    results: List[BatchItemResult] = Field(..., description="Per-item results in input order")
+
+
+class SummarizeJob(BaseModel):
+    """Status of an asynchronous /summarize/jobs job; result is set once it succeeded."""
+    id: str = Field(..., description="Job id; identical submissions share it")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="Where the job is")
+    created_at: float = Field(..., description="Submission time (Unix seconds)")
+    updated_at: float = Field(..., description="Time of the last status change (Unix seconds)")
+    result: Optional[SummarizeResponse] = Field(default=None, description="The summary, if the job succeeded")
+    status_code: Optional[int] = Field(default=None, description="HTTP status /summarize would have returned, once finished")
+    error: Optional[str] = Field(default=None, description="Error detail, if the job failed")
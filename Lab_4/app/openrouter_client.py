@@ -1,6 +1,135 @@
 """OpenRouter API client for text summarization."""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+import httpx
 import requests
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.compaction import Compactor
+from app.hedging import HedgePolicy, hedged
+from app.metrics import (
+    PROMPT_TOKENS_SAVED,
+    UPSTREAM_IN_FLIGHT,
+    UPSTREAM_POOL_CAPACITY,
+    UPSTREAM_RESPONSES,
+    UPSTREAM_RETRIES,
+    record_usage,
+)
+from app.tokens import ContextWindowExceeded, TokenEstimator, estimator_for, report_saved
+from app.tracing import (
+    phase,
+    propagation_headers,
+    record_phase,
+    span,
+    trace_requests_response,
+    trace_upstream_request,
+)
+from common.breaker import CircuitBreaker, CircuitOpenError
+from common.deadline import DeadlineExceeded, current_deadline
+from common.ratelimit import AdaptiveRateLimiter
+from common.retry import RetryBudget, RetryPolicy, acall_with_retry, call_with_retry, parse_retry_after
+from common.router import LatencyRouter
+from common.scheduler import FairScheduler
+
+
+class OpenRouterAPIError(requests.RequestException):
+    """Raised when a call to the OpenRouter API fails."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Retry transport failures, HTTP 429 and 5xx; never other 4xx or bad input."""
+    if not isinstance(exc, OpenRouterAPIError):
+        return False
+    return exc.status_code is None or exc.status_code == 429 or exc.status_code >= 500
+
+
+def _should_fall_back(exc: BaseException) -> bool:
+    """Try the next model on transient failures and while this model's breaker is open."""
+    return is_transient_error(exc) or isinstance(exc, CircuitOpenError)
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Count 5xx and transport errors against the upstream; 4xx (incl. 429) do not."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.HTTPError)
+
+
+def _status_error(e, status_code: int, headers) -> OpenRouterAPIError:
+    return OpenRouterAPIError(
+        f"OpenRouter API request failed: {str(e)}",
+        status_code,
+        parse_retry_after(headers.get("Retry-After")),
+    )
+
+
+class _WordLimiter:
+    """Count words across streamed deltas and cut the text after ``max_words``."""
+
+    def __init__(self, max_words: int):
+        self.max_words = max_words
+        self.words = 0
+        self._in_word = False
+
+    def feed(self, delta: str) -> Tuple[str, bool]:
+        """Return the part of delta within the limit and whether the limit was exceeded."""
+        for i, char in enumerate(delta):
+            if char.isspace():
+                self._in_word = False
+            elif not self._in_word:
+                self._in_word = True
+                self.words += 1
+                if self.words > self.max_words:
+                    return delta[:i].rstrip(), True
+        return delta, False
+
+
+@asynccontextmanager
+async def _no_slot() -> AsyncIterator[None]:
+    yield
+
+
+@contextmanager
+def _upstream_attempt(model: str) -> Iterator[None]:
+    """In-flight gauge and upstream phase timer around one attempt; failures without a response count as 'error'."""
+    UPSTREAM_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except (httpx.TransportError, requests.ConnectionError, requests.Timeout):
+        UPSTREAM_RESPONSES.labels(model, "error").inc()
+        raise
+    finally:
+        UPSTREAM_IN_FLIGHT.dec()
+        record_phase("upstream", started, model=model)
+
+
+def _counting_retries(fn: Callable[..., Any], model: str) -> Callable[..., Any]:
+    """Wrap a retried attempt function so every attempt after the first counts as a retry."""
+    attempts = 0
+
+    def count() -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            UPSTREAM_RETRIES.labels(model).inc()
+
+    if asyncio.iscoroutinefunction(fn):
+        async def attempt(*args):
+            count()
+            return await fn(*args)
+    else:
+        def attempt(*args):
+            count()
+            return fn(*args)
+    return attempt
 
 
 class OpenRouterClient:
@@ -8,14 +137,61 @@ class OpenRouterClient:
 
     BASE_URL = "https://openrouter.ai/api/v1"
 
-    def __init__(self, api_key: str, model: str):
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        timeout: float = 30.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        early_stop: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        fallback_models: Optional[List[str]] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        router: Optional[LatencyRouter] = None,
+        scheduler: Optional[FairScheduler] = None,
+        base_url: Optional[str] = None,
+        compactor: Optional[Compactor] = None,
+        estimator: Optional[TokenEstimator] = None,
+    ):
         """
         Initialize the OpenRouter client.
-        
+
         Args:
             api_key: OpenRouter API key
             model: Model identifier (e.g., "openai/gpt-3.5-turbo")
-        
+            timeout: Per-request timeout in seconds
+            max_connections: Upper bound on concurrent upstream connections
+            max_keepalive_connections: Idle connections kept open for reuse
+            transport: Optional httpx transport for the async path (used by tests)
+            early_stop: Make asummarize stream upstream and stop at max_length words;
+                an abandoned stream closes its connection rather than returning
+                it to the pool, so this trades connection reuse for latency
+            retry_policy: Retry policy for summarize/asummarize (defaults to
+                3 attempts with jittered backoff and a per-client retry budget)
+            rate_limiter: Optional shared limiter every async upstream call waits on
+            breaker: Optional circuit breaker guarding async upstream calls to
+                ``model``; fallback and routed models each get a clone of it
+                (build it with ``is_failure=is_upstream_failure``)
+            fallback_models: Models tried in order when ``model`` fails with a
+                transient error, and used as hedge targets
+            hedge_policy: Enables hedged requests in asummarize
+            router: Optional latency-aware router over a pool of equivalent
+                models; when set it chooses the model (and fallback order) per
+                call instead of ``model``/``fallback_models``. Build it with
+                ``is_failure=is_upstream_failure``
+            scheduler: Optional shared concurrency budget; each upstream attempt
+                queues by the priority class and tenant set with ``schedule_as``
+            base_url: API root to call instead of ``BASE_URL`` (e.g. a local
+                mock upstream for benchmarks)
+            compactor: Optional compaction applied to every input before it
+                is sent; the estimated tokens saved are counted
+            estimator: Token estimator for ``max_tokens`` and the context
+                window check (defaults to the one registered for each model's family)
+
         Raises:
             ValueError: If api_key is empty
         """
@@ -23,64 +199,136 @@ class OpenRouterClient:
             raise ValueError("OpenRouter API key cannot be empty")
         if not model or not model.strip():
             raise ValueError("Model name cannot be empty")
-        
+
         self.api_key = api_key
         self.model = model
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._transport = transport
+        self.early_stop = early_stop
+        self.retry_policy = retry_policy or RetryPolicy(
+            attempts=3,
+            base_delay=0.5,
+            max_delay=10.0,
+            retryable=is_transient_error,
+            budget=RetryBudget(),
+            min_attempt_time=0.1,
+        )
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+        # One breaker per model, so a dead primary does not cut off its fallbacks
+        self._breakers: Dict[str, CircuitBreaker] = {model: breaker} if breaker is not None else {}
+        self.fallback_models = [m for m in (fallback_models or []) if m and m.strip()]
+        self.hedge_policy = hedge_policy
+        self.router = router
+        if router is not None and router.probe is None:
+            router.probe = self.probe
+        self.scheduler = scheduler
+        self.compactor = compactor
+        self.estimator = estimator
+        self._async_client: Optional[httpx.AsyncClient] = None
 
-    def summarize(self, text: str, max_length: int = 100) -> dict:
-        """
-        Summarize text using OpenRouter API.
-        
-        Args:
-            text: Text to summarize
-            max_length: Maximum length of summary in words
-        
-        Returns:
-            Dictionary with keys: summary, model, truncated
-        
-        Raises:
-            ValueError: If text is empty
-            requests.RequestException: If API call fails
-        """
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def estimator_for(self, model: Optional[str] = None) -> TokenEstimator:
+        """Token estimator used for model (the client's own model by default)."""
+        return self.estimator or estimator_for(model or self.model)
+
+    def compact(self, text: str) -> str:
+        """Apply the configured compaction to text, counting the input tokens it saves."""
+        if self.compactor is None:
+            return text
+        with span("compaction"):
+            compacted = self.compactor.compact(text)
+            if compacted != text:
+                estimator = self.estimator_for()
+                saved = estimator.count(text) - estimator.count(compacted)
+                if saved > 0:
+                    PROMPT_TOKENS_SAVED.labels(self.model).inc(saved)
+                    report_saved(saved)
+        return compacted
+
+    def _build_payload(self, text: str, max_length: int, model: Optional[str] = None) -> dict:
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
 
         # Prepare the prompt
         prompt = f"Summarize the following text in approximately {max_length} words or less:\n\n{text}"
 
-        # Prepare request headers
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        # Size the completion for max_length words and refuse what cannot fit the model
+        model = model or self.model
+        estimator = self.estimator_for(model)
+        max_tokens = estimator.completion_tokens(max_length)
+        prompt_tokens = estimator.prompt_tokens(prompt)
+        if prompt_tokens + max_tokens > estimator.context_window:
+            raise ContextWindowExceeded(model, prompt_tokens, max_tokens, estimator.context_window)
 
-        # Prepare request body
-        payload = {
-            "model": self.model,
+        return {
+            "model": model,
             "messages": [
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            "max_tokens": max_length * 2,  # Approximate conversion: 1 token ~= 0.25 words
+            "max_tokens": max_tokens,
         }
 
-        # Make the API request
-        try:
-            response = requests.post(
-                f"{self.BASE_URL}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            raise requests.RequestException(f"OpenRouter API request failed: {str(e)}")
+    async def _acquire_rate_limit(self, payload: dict) -> int:
+        """Wait for the limiter; return the LLM tokens reserved for this call."""
+        if self.rate_limiter is None:
+            return 0
+        prompt_tokens = self.estimator_for(payload["model"]).prompt_tokens(payload["messages"][0]["content"])
+        reserved = prompt_tokens + payload["max_tokens"]
+        await self.rate_limiter.acquire(reserved)
+        return reserved
+
+    def _track(self, model: str):
+        """Router bookkeeping for one upstream attempt (no-op without a router)."""
+        return self.router.track(model) if self.router is not None else nullcontext()
+
+    def _attempt_timeout(self) -> float:
+        """Per-attempt timeout: the configured one, cut to the current deadline."""
+        deadline = current_deadline()
+        return self.timeout if deadline is None else deadline.timeout(self.timeout)
+
+    def _slot(self):
+        """Scheduler slot for one upstream attempt (no-op without a scheduler)."""
+        return self._scheduled_slot() if self.scheduler is not None else _no_slot()
 
-        # Parse the response
-        data = response.json()
+    @asynccontextmanager
+    async def _scheduled_slot(self) -> AsyncIterator[None]:
+        started = time.perf_counter()
+        async with self.scheduler.slot():
+            record_phase("queueing", started)
+            yield
 
+    def _guard(self, model: str):
+        """Circuit-breaker guard for one upstream attempt to model (no-op without a breaker)."""
+        if self.breaker is None:
+            return nullcontext()
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = self.breaker.clone()
+        return breaker.guard()
+
+    def _observe_response(self, response: httpx.Response, model: str) -> None:
+        """Count the response status and report a 429 or a success (with its rate-limit headers) to the limiter."""
+        UPSTREAM_RESPONSES.labels(model, response.status_code).inc()
+        if self.rate_limiter is None:
+            return
+        if response.status_code == 429:
+            self.rate_limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After")), response.headers)
+        elif response.is_success:
+            self.rate_limiter.on_success(response.headers)
+
+    def _parse_response(self, data: dict, max_length: int, model: Optional[str] = None) -> dict:
         # Extract the summary from the response
         if "choices" not in data or len(data["choices"]) == 0:
             raise ValueError("Invalid response from OpenRouter API: no choices returned")
@@ -93,6 +341,270 @@ class OpenRouterClient:
 
         return {
             "summary": summary,
-            "model": self.model,
+            "model": model or self.model,
             "truncated": truncated
         }
+
+    def summarize(self, text: str, max_length: int = 100) -> dict:
+        """
+        Summarize text using OpenRouter API.
+
+        Args:
+            text: Text to summarize
+            max_length: Maximum length of summary in words
+
+        Returns:
+            Dictionary with keys: summary, model, truncated
+
+        Raises:
+            ValueError: If text is empty
+            ContextWindowExceeded: If the text cannot fit the model's context window
+            requests.RequestException: If API call fails
+        """
+        text = self.compact(text)
+        payload = self._build_payload(text, max_length)
+        post = _counting_retries(self._post_summary, self.model)
+        return call_with_retry(post, payload, max_length, policy=self.retry_policy)
+
+    def _post_summary(self, payload: dict, max_length: int) -> dict:
+        # Make the API request
+        try:
+            with _upstream_attempt(self.model):
+                response = requests.post(
+                    f"{self.base_url}/chat/completions",
+                    headers={**self._headers(), **propagation_headers()},
+                    json=payload,
+                    timeout=self._attempt_timeout(),
+                    hooks={"response": trace_requests_response},
+                )
+            UPSTREAM_RESPONSES.labels(self.model, response.status_code).inc()
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if e.response is not None:
+                raise _status_error(e, e.response.status_code, e.response.headers)
+            raise OpenRouterAPIError(f"OpenRouter API request failed: {str(e)}")
+
+        with phase("parsing"):
+            data = response.json()
+            record_usage(data.get("usage"), self.model)
+            return self._parse_response(data, max_length)
+
+    async def start(self) -> None:
+        """Open the shared keep-alive connection pool used by the async path."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers(),
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                transport=self._transport,
+                # Sends the request id upstream and times connect/TLS/wait per request
+                event_hooks={"request": [trace_upstream_request]},
+            )
+            UPSTREAM_POOL_CAPACITY.inc(self.max_connections)
+        if self.router is not None:
+            self.router.start()
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool."""
+        if self.router is not None:
+            await self.router.aclose()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            UPSTREAM_POOL_CAPACITY.dec(self.max_connections)
+
+    async def asummarize(self, text: str, max_length: int = 100) -> dict:
+        """
+        Summarize text without blocking the event loop.
+
+        Requests share one pooled ``httpx.AsyncClient``; it is opened on
+        first use if ``start()`` has not been called. With ``early_stop``
+        the reply is streamed and generation is cut off at ``max_length``
+        words instead of being truncated after the fact. Transient failures
+        are retried according to ``retry_policy``; if the model still fails,
+        ``fallback_models`` are tried in order. With a ``hedge_policy`` a
+        slow call is raced against a second one and the first success wins.
+        The returned ``model`` is the one that actually answered. Inside a
+        ``deadline_scope`` every attempt, backoff and sub-call shares the
+        remaining budget, and the whole call is cut off when it runs out.
+
+        Raises:
+            ValueError: If text is empty
+            ContextWindowExceeded: If the text cannot fit the model's context window
+            requests.RequestException: If API call fails
+            DeadlineExceeded: If the current deadline runs out first
+        """
+        text = self.compact(text)
+        self._build_payload(text, max_length)
+        await self.start()
+        deadline = current_deadline()
+        if deadline is None:
+            return await self._asummarize_models(text, max_length)
+        try:
+            timeout = deadline.timeout()
+            return await asyncio.wait_for(self._asummarize_models(text, max_length), timeout)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("Deadline exceeded while summarizing") from e
+
+    async def _asummarize_models(self, text: str, max_length: int) -> dict:
+        models = self.router.order() if self.router is not None else [self.model] + self.fallback_models
+        if self.hedge_policy is None and len(models) == 1:
+            return await self._asummarize_with(models[0], text, max_length)
+        return await hedged(
+            lambda model: self._asummarize_with(model, text, max_length),
+            models,
+            self.hedge_policy,
+            should_fallback=_should_fall_back,
+        )
+
+    async def _asummarize_with(self, model: str, text: str, max_length: int) -> dict:
+        if self.early_stop:
+            collect = _counting_retries(self._collect_stream, model)
+            return await acall_with_retry(collect, text, max_length, model, policy=self.retry_policy)
+
+        with span("prompt"):
+            payload = self._build_payload(text, max_length, model)
+        post = _counting_retries(self._apost_summary, model)
+        return await acall_with_retry(post, payload, max_length, policy=self.retry_policy)
+
+    async def _apost_summary(self, payload: dict, max_length: int) -> dict:
+        async with self._slot():
+            reserved = await self._acquire_rate_limit(payload)
+            try:
+                # Guarded first: a call the breaker rejects never reached the target
+                with self._guard(payload["model"]), self._track(payload["model"]):
+                    with _upstream_attempt(payload["model"]):
+                        response = await self._async_client.post(
+                            "/chat/completions", json=payload, timeout=self._attempt_timeout()
+                        )
+                    self._observe_response(response, payload["model"])
+                    response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                raise _status_error(e, e.response.status_code, e.response.headers)
+            except httpx.HTTPError as e:
+                raise OpenRouterAPIError(f"OpenRouter API request failed: {str(e)}")
+
+        with phase("parsing"):
+            data = response.json()
+            record_usage(data.get("usage"), payload["model"])
+            if self.rate_limiter is not None and isinstance(data.get("usage"), dict):
+                self.rate_limiter.settle(reserved, data["usage"].get("total_tokens", reserved))
+            return self._parse_response(data, max_length, payload["model"])
+
+    async def _collect_stream(self, text: str, max_length: int, model: Optional[str] = None) -> dict:
+        # Nothing has been handed to a caller yet, so a failed stream can be restarted
+        async for event in self.astream_summarize(text, max_length, model):
+            pass
+        return {"summary": event["summary"], "model": event["model"], "truncated": event["truncated"]}
+
+    async def astream_summarize(
+        self, text: str, max_length: int = 100, model: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a summary from OpenRouter as it is generated.
+
+        Sends the request with ``stream: true`` and parses the Server-Sent
+        Events response incrementally. Words are counted as they arrive and
+        the upstream stream is closed as soon as the reply would exceed
+        ``max_length`` words, so no time or tokens are spent on text that
+        would be cut anyway. Tokens are relayed as they arrive, so this
+        method does not retry; ``asummarize`` retries whole streams.
+
+        Yields:
+            ``{"type": "token", "text": ...}`` for every content delta, then a
+            final ``{"type": "done", "summary", "model", "truncated"}``
+
+        Raises:
+            ValueError: If text is empty or a chunk cannot be parsed
+            ContextWindowExceeded: If the text cannot fit the model's context window
+            requests.RequestException: If API call fails
+        """
+        text = self.compact(text)
+        if model is None and self.router is not None:
+            model = self.router.pick()
+        with span("prompt"):
+            payload = self._build_payload(text, max_length, model)
+        payload["stream"] = True
+        await self.start()
+
+        parts = []
+        limiter = _WordLimiter(max_length)
+        truncated = False
+        # The slot is held until the stream is closed, not just until headers arrive
+        async with self._slot():
+            await self._acquire_rate_limit(payload)
+            try:
+                # The breaker judges the upstream on time to response headers, not stream length,
+                # and is checked before the router counts the call
+                with self._guard(payload["model"]), self._track(payload["model"]):
+                    request = self._async_client.build_request(
+                        "POST", "/chat/completions", json=payload, timeout=self._attempt_timeout()
+                    )
+                    with _upstream_attempt(payload["model"]):
+                        response = await self._async_client.send(request, stream=True)
+                    self._observe_response(response, payload["model"])
+                    if response.is_error:
+                        await response.aread()
+                        await response.aclose()
+                        response.raise_for_status()
+                try:
+                    async for delta in self._iter_stream_deltas(response, payload["model"]):
+                        delta, truncated = limiter.feed(delta)
+                        if delta:
+                            parts.append(delta)
+                            yield {"type": "token", "text": delta}
+                        if truncated:
+                            break
+                finally:
+                    # Closing the response drops the connection and stops generation
+                    await response.aclose()
+            except httpx.HTTPStatusError as e:
+                raise _status_error(e, e.response.status_code, e.response.headers)
+            except httpx.HTTPError as e:
+                raise OpenRouterAPIError(f"OpenRouter API request failed: {str(e)}")
+
+        summary = "".join(parts).strip()
+        yield {
+            "type": "done",
+            "summary": summary,
+            "model": payload["model"],
+            "truncated": truncated,
+        }
+
+    async def probe(self, model: str) -> None:
+        """Cheap health check for the router: a one-token completion from model."""
+        await self.start()
+        payload = self._build_payload("ping", 1, model)
+        payload["max_tokens"] = 1
+        response = await self._async_client.post("/chat/completions", json=payload)
+        response.raise_for_status()
+
+    @staticmethod
+    async def _iter_stream_deltas(response: httpx.Response, model: str = "") -> AsyncIterator[str]:
+        """Yield content deltas from an OpenAI-style SSE chat completion stream; usage chunks are counted."""
+        async for line in response.aiter_lines():
+            # Skip blank separators and keep-alive comments (": OPENROUTER PROCESSING")
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                return
+
+            chunk = json.loads(data)
+            if "error" in chunk:
+                error = chunk["error"]
+                message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                raise OpenRouterAPIError(f"OpenRouter API stream failed: {message}")
+            record_usage(chunk.get("usage"), model)
+
+            choices = chunk.get("choices") or []
+            if choices:
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
@@ -0,0 +1,250 @@
+"""Near-duplicate cache for summarize responses: MinHash signatures + LSH.
+
+Exact-hash caching misses inputs that differ only in a header, a few words
+or formatting. Here each text becomes a set of word shingles, summarized by
+a MinHash signature whose positions agree with probability equal to the
+Jaccard similarity of the two sets. Signatures are split into bands; texts
+sharing any whole band land in the same bucket, so a lookup only compares
+against a handful of likely matches instead of every cached entry.
+
+Signatures use one-permutation hashing: each shingle is hashed once and
+binned, the minimum per bin is kept, and empty bins borrow from their
+neighbour (rotation densification). That makes a signature one hash per
+shingle plus a sort, instead of one hash per shingle per position, which
+keeps lookups under a millisecond for inputs up to ``max_words`` (longer
+ones skip the index) without any native dependency. Python's string hash is salted per process, which is
+fine for an index that only lives in memory.
+"""
+import string
+import time
+from collections import OrderedDict, defaultdict
+from operator import eq
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.models import SummarizeResponse
+
+# Punctuation becomes whitespace, so "word," and "word" are the same token
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation})
+# Python hashes are signed 64-bit ints
+_HASH_MIN = -(1 << 63)
+_HASH_RANGE = 1 << 64
+# Values kept per bin when presorting long texts (an empty bin then has odds ~e**-8)
+_SAMPLE_PER_BIN = 8
+# Added per step of borrowing, so a densified bin never equals a real one by accident
+_BORROW_OFFSET = 0x9E3779B97F4A7C15
+
+Signature = Tuple[int, ...]
+
+
+def words(text: str) -> List[str]:
+    """Lowercased words with punctuation dropped."""
+    return text.lower().translate(_PUNCTUATION).split()
+
+
+def shingle_hashes(words: List[str], size: int = 3) -> Set[int]:
+    """Hashes of the word n-grams; texts shorter than ``size`` words give one."""
+    if len(words) <= size:
+        return {hash(tuple(words))} if words else set()
+    return set(map(hash, zip(*(words[i:] for i in range(size)))))
+
+
+def _bin_minima(hashes: Set[int], mask: int) -> Dict[int, int]:
+    # Long texts: each bin's minimum is almost surely among the smallest few
+    # per bin, so sort only those; if a bin comes up empty, redo it in full
+    expected = _SAMPLE_PER_BIN * (mask + 1)
+    if len(hashes) > 2 * expected:
+        cut = _HASH_MIN + (_HASH_RANGE * expected) // len(hashes)
+        ordered = sorted(filter(cut.__gt__, hashes), reverse=True)
+        bins = dict(zip([h & mask for h in ordered], ordered))
+        if len(bins) == mask + 1:
+            return bins
+    # Descending order, so the last value written to each bin is its minimum
+    ordered = sorted(hashes, reverse=True)
+    return dict(zip([h & mask for h in ordered], ordered))
+
+
+def minhash(hashes: Set[int], num_perm: int = 128) -> Signature:
+    """One-permutation MinHash signature of ``num_perm`` positions (a power of two)."""
+    if not hashes:
+        return (0,) * num_perm
+    mask = num_perm - 1
+    bins = _bin_minima(hashes, mask)
+    if len(bins) == num_perm:
+        return tuple(bins[i] for i in range(num_perm))
+    signature = []
+    for i in range(num_perm):
+        value = bins.get(i)
+        step = 0
+        while value is None:
+            step += 1
+            value = bins.get((i + step) & mask)
+        signature.append(value + step * _BORROW_OFFSET)
+    return tuple(signature)
+
+
+def estimated_jaccard(a: Signature, b: Signature) -> float:
+    return sum(map(eq, a, b)) / len(a)
+
+
+def choose_bands(threshold: float, num_perm: int, recall: float = 0.99) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows == num_perm.
+
+    Uses the most rows per band (the fewest false candidates) for which a
+    pair exactly at ``threshold`` still shares a band with probability at
+    least ``recall``.
+    """
+    best = (num_perm, 1)
+    rows = 1
+    while rows <= num_perm:
+        if num_perm % rows == 0:
+            bands = num_perm // rows
+            if 1 - (1 - threshold ** rows) ** bands >= recall:
+                best = (bands, rows)
+        rows *= 2
+    return best
+
+
+class SimilarityCache:
+    """
+    In-memory LRU + TTL cache that answers near-duplicate inputs.
+
+    Entries are scoped by model and ``max_length``, like the exact cache;
+    a lookup returns the most similar cached response whose estimated
+    Jaccard similarity reaches ``threshold``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 3,
+        max_entries: int = 4096,
+        max_words: int = 1000,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            threshold: Least Jaccard similarity of word shingles that counts as a match
+            num_perm: Signature length (a power of two); more is more accurate
+            shingle_size: Words per shingle
+            max_entries: Maximum number of indexed responses
+            max_words: Longer texts are neither looked up nor indexed, which
+                bounds the cost of a lookup
+            ttl_seconds: How long an entry stays valid after it is stored
+            clock: Monotonic time source (overridable in tests)
+
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        if num_perm < 1 or num_perm & (num_perm - 1):
+            raise ValueError("num_perm must be a power of two")
+        if shingle_size < 1 or max_entries <= 0 or max_words <= 0 or ttl_seconds <= 0:
+            raise ValueError("Cache limits must be positive")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.max_words = max_words
+        self.ttl_seconds = ttl_seconds
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self._clock = clock
+        self._ids = 0
+        # id -> (expires_at, scope, signature, response), oldest first
+        self._entries: "OrderedDict[int, Tuple[float, tuple, Signature, SummarizeResponse]]" = OrderedDict()
+        self._buckets: Dict[int, Set[int]] = defaultdict(set)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, text: str) -> Optional[Signature]:
+        """MinHash signature of text, or None when it is too long to index."""
+        tokens = words(text)
+        if len(tokens) > self.max_words:
+            self.skipped += 1
+            return None
+        return minhash(shingle_hashes(tokens, self.shingle_size), self.num_perm)
+
+    def _band_keys(self, scope: tuple, signature: Signature) -> List[int]:
+        r = self.rows
+        return [hash((scope, band, signature[band * r:(band + 1) * r])) for band in range(self.bands)]
+
+    def get(self, model: str, text: str, max_length: int) -> Optional[Tuple[SummarizeResponse, float]]:
+        """Return the closest cached response and its similarity, or None below the threshold."""
+        scope = (model, max_length)
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        candidates: Set[int] = set()
+        for key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(key)
+            if bucket:
+                candidates |= bucket
+
+        now = self._clock()
+        best: Optional[Tuple[float, int]] = None
+        for entry_id in candidates:
+            expires_at, entry_scope, entry_signature, _ = self._entries[entry_id]
+            if expires_at <= now:
+                self._remove(entry_id)
+                continue
+            if entry_scope != scope:
+                continue
+            similarity = estimated_jaccard(signature, entry_signature)
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, entry_id)
+
+        if best is None:
+            self.misses += 1
+            return None
+        similarity, entry_id = best
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return self._entries[entry_id][3], similarity
+
+    def set(self, model: str, text: str, max_length: int, response: SummarizeResponse) -> None:
+        """Index response under the signature of text, evicting least recently used entries."""
+        scope = (model, max_length)
+        signature = self.signature(text)
+        if signature is None:
+            return
+        self._ids += 1
+        self._entries[self._ids] = (self._clock() + self.ttl_seconds, scope, signature, response)
+        for key in self._band_keys(scope, signature):
+            self._buckets[key].add(self._ids)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry; counters are kept."""
+        self._entries.clear()
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "skipped": self.skipped,
+        }
+
+    def _remove(self, entry_id: int) -> None:
+        _, scope, signature, _ = self._entries.pop(entry_id)
+        for key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
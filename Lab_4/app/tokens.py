@@ -0,0 +1,196 @@
+"""Token budgeting: local token estimates per model family.
+
+Prompts are sized before they are sent: the estimate decides ``max_tokens``
+for a summary of ``max_length`` words, whether a prompt fits the model's
+context window, and how long documents are chunked. Estimators are looked
+up by the longest registered prefix of the model id (``openai/``,
+``openai/gpt-3.5-turbo``, ...); ``register_estimator`` adds or replaces one,
+e.g. with a tokenizer-backed estimator.
+
+The built-in estimate needs no tokenizer. It walks the text once, counting
+a token per short word (long words cost one more per few letters), per
+group of digits and per symbol, in the way BPE vocabularies split English
+text, with letters outside ASCII costing more. It lands within ~10% of
+real counts for English prose and errs high for other scripts. When the
+optional ``tiktoken`` package is installed, OpenAI models are counted
+exactly with it instead.
+"""
+import math
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional
+    tiktoken = None
+
+# Runs of letters, runs of digits, or one other non-space character
+_PIECES = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+# Tokens of the summarization instruction wrapped around the input
+_PROMPT_FRAMING_TOKENS = 32
+
+
+class ContextWindowExceeded(ValueError):
+    """Raised when a prompt plus its completion budget cannot fit the model's context window."""
+
+    def __init__(self, model: str, prompt_tokens: int, completion_tokens: int, context_window: int):
+        super().__init__(
+            f"Input too long for {model}: ~{prompt_tokens} prompt tokens + {completion_tokens} "
+            f"completion tokens exceed its {context_window}-token context window"
+        )
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.context_window = context_window
+
+
+class TokenEstimator:
+    """Tokenizer-free token counts for one model family."""
+
+    def __init__(
+        self,
+        context_window: int = 8192,
+        tokens_per_word: float = 1.35,
+        letters_per_token: int = 7,
+        digits_per_token: int = 3,
+        non_ascii_letters_per_token: float = 1.0,
+        message_overhead: int = 8,
+        completion_headroom: int = 8,
+    ):
+        """
+        Args:
+            context_window: Tokens the model accepts, prompt and completion together
+            tokens_per_word: Average tokens per generated word, for ``max_tokens``
+            letters_per_token: Letters an ASCII word gets per token before it costs another
+            digits_per_token: Digits grouped into one token
+            non_ascii_letters_per_token: Letters per token in other scripts
+            message_overhead: Tokens the chat format adds around a message
+            completion_headroom: Extra completion tokens, so a reply of the
+                requested length is not cut off mid-sentence
+
+        Raises:
+            ValueError: If a parameter is not positive
+        """
+        if min(context_window, tokens_per_word, letters_per_token, digits_per_token, non_ascii_letters_per_token) <= 0:
+            raise ValueError("Estimator parameters must be positive")
+        self.context_window = context_window
+        self.tokens_per_word = tokens_per_word
+        self.letters_per_token = letters_per_token
+        self.digits_per_token = digits_per_token
+        self.non_ascii_letters_per_token = non_ascii_letters_per_token
+        self.message_overhead = message_overhead
+        self.completion_headroom = completion_headroom
+
+    def count(self, text: str) -> int:
+        """Estimated tokens in text."""
+        letters, digits, non_ascii = self.letters_per_token, self.digits_per_token, self.non_ascii_letters_per_token
+        tokens = 0
+        for piece in _PIECES.findall(text):
+            n = len(piece)
+            if n == 1:
+                tokens += 1
+            elif piece.isdigit():
+                tokens += -(-n // digits)
+            elif piece.isascii():
+                tokens += 1 + (n - 1) // letters
+            else:
+                tokens += math.ceil(n / non_ascii)
+        return tokens
+
+    def prompt_tokens(self, prompt: str) -> int:
+        """Estimated tokens of a one-message chat prompt, format overhead included."""
+        return self.count(prompt) + self.message_overhead
+
+    def completion_tokens(self, max_words: int) -> int:
+        """``max_tokens`` for a reply of at most ``max_words`` words."""
+        return math.ceil(max_words * self.tokens_per_word) + self.completion_headroom
+
+    def prompt_overhead(self) -> int:
+        """Tokens a summarization prompt costs besides its input: the instruction and the chat format."""
+        return self.message_overhead + _PROMPT_FRAMING_TOKENS
+
+    def input_budget(self, max_words: int) -> int:
+        """Tokens of input that fit next to a ``max_words`` reply and the prompt framing."""
+        return self.context_window - self.completion_tokens(max_words) - self.prompt_overhead()
+
+
+class TiktokenEstimator(TokenEstimator):
+    """Exact counts with a ``tiktoken`` encoding (requires the optional package)."""
+
+    def __init__(self, encoding: str = "o200k_base", **kwargs):
+        if tiktoken is None:
+            raise ImportError("TiktokenEstimator requires the tiktoken package")
+        super().__init__(**kwargs)
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+DEFAULT_ESTIMATOR = TokenEstimator()
+
+# Model id prefix -> estimator; the longest matching prefix wins
+_ESTIMATORS: Dict[str, TokenEstimator] = {
+    "openai/": TokenEstimator(context_window=128_000),
+    "openai/gpt-3.5-turbo": TokenEstimator(context_window=16_385),
+    "openai/gpt-4.1": TokenEstimator(context_window=1_000_000),
+    # Claude's vocabulary splits English a little finer
+    "anthropic/": TokenEstimator(context_window=200_000, tokens_per_word=1.45, letters_per_token=6),
+    "google/gemini": TokenEstimator(context_window=1_000_000),
+    "meta-llama/": TokenEstimator(context_window=128_000),
+    "meta-llama/llama-3-": TokenEstimator(context_window=8_192),
+    # Smaller 32k vocabulary: more tokens per word
+    "mistralai/": TokenEstimator(context_window=32_768, tokens_per_word=1.5, letters_per_token=5),
+}
+if tiktoken is not None:
+    _ESTIMATORS["openai/"] = TiktokenEstimator("o200k_base", context_window=128_000)
+    _ESTIMATORS["openai/gpt-3.5-turbo"] = TiktokenEstimator("cl100k_base", context_window=16_385)
+
+
+def register_estimator(prefix: str, estimator: TokenEstimator) -> None:
+    """Use estimator for every model id starting with prefix (longer prefixes take precedence)."""
+    _ESTIMATORS[prefix] = estimator
+
+
+def estimator_for(model: str) -> TokenEstimator:
+    """Estimator registered under the longest prefix of model, or the default."""
+    best = ""
+    for prefix in _ESTIMATORS:
+        if len(prefix) > len(best) and model.startswith(prefix):
+            best = prefix
+    return _ESTIMATORS[best] if best else DEFAULT_ESTIMATOR
+
+
+class TokenReport:
+    """Prompt tokens saved by compaction during one request (summed over its upstream calls)."""
+
+    __slots__ = ("saved",)
+
+    def __init__(self):
+        self.saved = 0
+
+
+_report: "ContextVar[Optional[TokenReport]]" = ContextVar("token_report", default=None)
+
+
+def current_token_report() -> Optional[TokenReport]:
+    return _report.get()
+
+
+@contextmanager
+def token_report(report: Optional[TokenReport] = None) -> Iterator[TokenReport]:
+    """Collect the tokens saved by calls made inside the block (and tasks it spawns) into report."""
+    report = report if report is not None else TokenReport()
+    token = _report.set(report)
+    try:
+        yield report
+    finally:
+        _report.reset(token)
+
+
+def report_saved(tokens: int) -> None:
+    report = _report.get()
+    if report is not None:
+        report.saved += tokens
@@ -0,0 +1,391 @@
+"""Per-request tracing: phase spans, request ids and profiling hooks.
+
+``TracingMiddleware`` opens a ``Trace`` for every HTTP request and makes it
+current for everything the request runs (a context variable, so tasks and
+thread-pool calls started from the request inherit it). Code marks its
+phases with ``phase`` (a span plus an observation in the phase histogram)
+or ``span`` (trace only). Upstream calls add connection-level spans from
+httpx's ``trace`` extension, attached per request by an event hook:
+
+- ``http.connect``: DNS resolution and TCP connect (httpcore reports them
+  as one step); absent when a pooled connection is reused
+- ``http.tls``: TLS handshake
+- ``http.send``: writing the request
+- ``http.wait``: waiting for response headers, i.e. upstream queueing and,
+  for non-streamed replies, generation
+- ``http.receive``: reading the body, i.e. generation for streamed replies
+
+The request id comes from the caller's ``X-Request-ID`` (when it is a sane
+token) or is generated, is echoed on the response and sent upstream.
+Outside a request no trace is current and spans cost one context lookup.
+"""
+import logging
+import math
+import random
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence
+
+from app.metrics import PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Spans kept per trace; a runaway loop must not grow a trace without bound
+MAX_SPANS = 256
+
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+# httpcore trace event prefixes -> span names
+_CONNECTION_SPANS = {
+    "connection.connect_tcp": "http.connect",
+    "connection.start_tls": "http.tls",
+    "http11.send_request_headers": "http.send",
+    "http11.send_request_body": "http.send",
+    "http11.receive_response_headers": "http.wait",
+    "http11.receive_response_body": "http.receive",
+    "http2.send_request_headers": "http.send",
+    "http2.send_request_body": "http.send",
+    "http2.receive_response_headers": "http.wait",
+    "http2.receive_response_body": "http.receive",
+}
+
+
+class Span:
+    """One timed step of a request (``time.perf_counter`` seconds)."""
+
+    __slots__ = ("name", "start", "end", "attributes")
+
+    def __init__(self, name: str, start: float, end: float, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attributes = attributes or {}
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, {self.duration * 1000:.2f}ms, {self.attributes!r})"
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.spans: List[Span] = []
+        self.dropped = 0
+        # Request-level facts (method, path, status); hooks may add their own
+        self.attributes: Dict[str, Any] = {}
+
+    @property
+    def duration(self) -> float:
+        return (self.ended if self.ended is not None else time.perf_counter()) - self.started
+
+    def add(self, name: str, start: float, end: float, attributes: Optional[Dict[str, Any]] = None) -> None:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append(Span(name, start, end, attributes))
+
+    def finish(self) -> None:
+        if self.ended is None:
+            self.ended = time.perf_counter()
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per span name, summed over repeats (e.g. retries), in first-seen order."""
+        totals: Dict[str, float] = {}
+        for s in self.spans:
+            totals[s.name] = totals.get(s.name, 0.0) + s.duration
+        return totals
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value for the spans so far, plus the total."""
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.totals().items()]
+        metrics.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+_current: "ContextVar[Optional[Trace]]" = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def traced(trace: Optional[Trace]) -> Iterator[None]:
+    """Record the block's spans into trace (e.g. for work shared with other requests)."""
+    token = _current.set(trace)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Record the block as a span of the current trace (no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter(), attributes)
+
+
+def record_phase(name: str, started: float, **attributes: Any) -> None:
+    """Close a phase that began at ``started``: observe its histogram and add its span."""
+    ended = time.perf_counter()
+    PHASE_SECONDS.labels(name).observe(ended - started)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started, ended, attributes)
+
+
+@contextmanager
+def phase(name: str, **attributes: Any) -> Iterator[None]:
+    """Time the block as a phase: histogram observation plus span."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, started, **attributes)
+
+
+# When the current request was admitted, for the validation phase
+_admitted_at: "ContextVar[Optional[float]]" = ContextVar("admitted_at", default=None)
+
+
+@contextmanager
+def admitted() -> Iterator[None]:
+    """Mark the request handled inside the block as admitted now."""
+    token = _admitted_at.set(time.perf_counter())
+    try:
+        yield
+    finally:
+        _admitted_at.reset(token)
+
+
+def observe_validation() -> None:
+    """Record the time from admission to the endpoint (body parsing and validation)."""
+    started = _admitted_at.get()
+    if started is not None:
+        record_phase("validation", started)
+
+
+def propagation_headers() -> Dict[str, str]:
+    """Headers carrying the current request id to the upstream."""
+    trace = _current.get()
+    return {REQUEST_ID_HEADER: trace.request_id} if trace is not None else {}
+
+
+def _connection_tracer(trace: Trace) -> Callable:
+    started: Dict[str, float] = {}
+
+    async def on_event(event: str, info: dict) -> None:
+        prefix, _, stage = event.rpartition(".")
+        name = _CONNECTION_SPANS.get(prefix)
+        if name is None:
+            return
+        if stage == "started":
+            started[prefix] = time.perf_counter()
+        elif prefix in started:
+            attributes = {"failed": True} if stage == "failed" else None
+            trace.add(name, started.pop(prefix), time.perf_counter(), attributes)
+
+    return on_event
+
+
+async def trace_upstream_request(request) -> None:
+    """httpx ``request`` event hook: send the request id and time the connection phases."""
+    trace = _current.get()
+    if trace is None:
+        return
+    request.headers.setdefault(REQUEST_ID_HEADER, trace.request_id)
+    request.extensions["trace"] = _connection_tracer(trace)
+
+
+def trace_requests_response(response, *args, **kwargs) -> None:
+    """requests ``response`` hook: the sync client only exposes time to response headers."""
+    trace = _current.get()
+    if trace is not None:
+        ended = time.perf_counter()
+        trace.add("http.wait", ended - response.elapsed.total_seconds(), ended)
+
+
+class TraceHook:
+    """Observer of every traced request; override what you need."""
+
+    def on_start(self, trace: Trace) -> None:
+        """Called before the request is handled, inside its context."""
+
+    def on_end(self, trace: Trace) -> None:
+        """Called once the response has been sent (or the request failed)."""
+
+
+class SlowRequestProfiler(TraceHook):
+    """
+    Runs a profiler on requests and hands over only those of the slowest ones.
+
+    A request's duration is unknown until it ends, so profiling starts on a
+    ``sample_rate`` share of requests; when one finishes at or above the
+    running ``100 - slowest_percent`` latency percentile (over the last
+    ``window`` requests), its profiler is passed to ``on_profile``. The
+    profiler comes from ``profiler_factory`` and needs ``start()`` and
+    ``stop()``; since requests overlap on one event loop it must support
+    concurrent sessions, e.g. ``pyinstrument.Profiler(async_mode="enabled")``.
+
+        trace_hooks.append(SlowRequestProfiler(
+            lambda: Profiler(async_mode="enabled"),
+            lambda trace, profiler: save(trace.request_id, profiler.output_html()),
+            slowest_percent=1.0,
+            sample_rate=0.1,
+        ))
+    """
+
+    def __init__(
+        self,
+        profiler_factory: Callable[[], Any],
+        on_profile: Callable[[Trace, Any], None],
+        slowest_percent: float = 1.0,
+        sample_rate: float = 1.0,
+        window: int = 1000,
+        min_samples: int = 100,
+        rng: Callable[[], float] = random.random,
+    ):
+        """
+        Args:
+            profiler_factory: Returns a fresh profiler with start() and stop()
+            on_profile: Receives the trace and the stopped profiler of a slow request
+            slowest_percent: Share of requests (by latency) whose profiles are kept
+            sample_rate: Share of requests profiled at all, to bound the overhead
+            window: Recent request durations the percentile is taken over
+            min_samples: Durations needed before any profile is kept
+            rng: Source of uniform [0, 1) numbers (overridable in tests)
+
+        Raises:
+            ValueError: If a parameter is out of range
+        """
+        if not 0 < slowest_percent <= 100:
+            raise ValueError("slowest_percent must be in (0, 100]")
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be in [0, 1]")
+        if window <= 0 or min_samples <= 0:
+            raise ValueError("window and min_samples must be positive")
+        self.profiler_factory = profiler_factory
+        self.on_profile = on_profile
+        self.slowest_percent = slowest_percent
+        self.sample_rate = sample_rate
+        self.min_samples = min(min_samples, window)
+        self._rng = rng
+        self._durations: Deque[float] = deque(maxlen=window)
+        # The percentile is refreshed every few requests, not sorted per request
+        self._refresh_every = max(1, window // 20)
+        self._until_refresh = 0
+        self._threshold = math.inf
+        self._active: Dict[Trace, Any] = {}
+        self.profiled = 0
+        self.reported = 0
+
+    @property
+    def threshold(self) -> float:
+        """Current cut-off in seconds (infinite until ``min_samples`` are in)."""
+        return self._threshold
+
+    def on_start(self, trace: Trace) -> None:
+        if self.sample_rate and self._rng() < self.sample_rate:
+            profiler = self.profiler_factory()
+            profiler.start()
+            self._active[trace] = profiler
+
+    def on_end(self, trace: Trace) -> None:
+        profiler = self._active.pop(trace, None)
+        if profiler is not None:
+            profiler.stop()
+            self.profiled += 1
+        self._observe(trace.duration)
+        if profiler is not None and trace.duration >= self._threshold:
+            self.reported += 1
+            self.on_profile(trace, profiler)
+
+    def _observe(self, duration: float) -> None:
+        self._durations.append(duration)
+        self._until_refresh -= 1
+        if self._until_refresh > 0 or len(self._durations) < self.min_samples:
+            return
+        self._until_refresh = self._refresh_every
+        ordered = sorted(self._durations)
+        rank = math.ceil(len(ordered) * (1 - self.slowest_percent / 100))
+        self._threshold = ordered[min(len(ordered) - 1, rank)]
+
+
+def _incoming_request_id(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-id":
+            candidate = value.decode("latin-1")
+            return candidate if _VALID_REQUEST_ID.fullmatch(candidate) else None
+    return None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that traces each HTTP request.
+
+    Adds ``X-Request-ID`` to every response and, with ``server_timing``,
+    a ``Server-Timing`` header with the time per span name recorded before
+    the response started (for streamed responses, the part up to the first
+    byte). ``hooks`` is read on every request, so hooks may be added to
+    the same list after the app has started; a failing hook is logged and
+    never fails the request.
+    """
+
+    def __init__(self, app, server_timing: bool = False, hooks: Sequence[TraceHook] = ()):
+        self.app = app
+        self.server_timing = server_timing
+        self.hooks = hooks
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(_incoming_request_id(scope) or uuid.uuid4().hex)
+        trace.attributes.update(method=scope["method"], path=scope["path"])
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                trace.attributes["status"] = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", trace.request_id.encode()))
+                if self.server_timing:
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(trace)
+        try:
+            self._notify("on_start", trace)
+            await self.app(scope, receive, send_traced)
+        finally:
+            trace.finish()
+            self._notify("on_end", trace)
+            _current.reset(token)
+
+    def _notify(self, event: str, trace: Trace) -> None:
+        for hook in self.hooks:
+            try:
+                getattr(hook, event)(trace)
+            except Exception:
+                logger.exception("Trace hook %r failed in %s", hook, event)
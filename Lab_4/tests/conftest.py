@@ -0,0 +1,54 @@
+import httpx
+import pytest
+
+import app.main as main
+from app.cache import SummaryCache
+from app.openrouter_client import OpenRouterClient
+from common.retry import RetryPolicy
+
+
+def completion(content: str) -> dict:
+    """Build the smallest chat completion body the client accepts."""
+    return {"choices": [{"message": {"content": content}}]}
+
+
+class FakeClock:
+    """Clock that only moves when a test sets or advances ``now``."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_summary_cache(monkeypatch):
+    """Give every test an empty summary cache so results don't leak between tests."""
+    cache = SummaryCache()
+    monkeypatch.setattr(main, "summary_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def no_retry_backoff(monkeypatch):
+    """Retry immediately in tests instead of sleeping through jittered backoff."""
+    monkeypatch.setattr(RetryPolicy, "backoff", lambda self, retry_number: 0.0)
+
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at zero."""
+    return FakeClock()
+
+
+@pytest.fixture
+def install_client(monkeypatch):
+    """Make the app talk to a mock upstream: call with a request handler, get the client back."""
+
+    def install(handler, model: str = "test/model", **client_kwargs) -> OpenRouterClient:
+        client = OpenRouterClient("key", model, transport=httpx.MockTransport(handler), **client_kwargs)
+        monkeypatch.setattr(main, "openrouter_client", client)
+        return client
+
+    return install
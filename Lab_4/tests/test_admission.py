@@ -0,0 +1,101 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.admission import AdmissionController, OverloadedError
+from app.openrouter_client import OpenRouterClient
+
+
+class TestAdmissionController:
+    """Test suite for the in-flight bound and the deadline-aware wait queue."""
+
+    @pytest.mark.asyncio
+    async def test_waiter_gets_slot_when_one_frees(self):
+        """Test that a queued request is admitted as soon as a slot is released."""
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1.0)
+        started = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 1
+
+        controller.release(started)
+        await waiter
+        assert controller.in_flight == 1
+        assert controller.queue_depth == 0
+        assert controller.admitted == 2
+
+    @pytest.mark.asyncio
+    async def test_full_queue_is_rejected_with_429(self):
+        """Test that requests beyond the queue bound are shed immediately."""
+        controller = AdmissionController(max_in_flight=1, max_queue=0)
+        await controller.acquire()
+        with pytest.raises(OverloadedError) as exc_info:
+            await controller.acquire()
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after >= 1
+        assert controller.rejected_queue_full == 1
+
+    @pytest.mark.asyncio
+    async def test_unmeetable_deadline_is_rejected_with_503(self, clock):
+        """Test that a request is shed up front when the estimated wait exceeds its deadline."""
+        controller = AdmissionController(max_in_flight=1, max_queue=10, clock=clock)
+        started = await controller.acquire()
+        clock.now = 4.0
+        controller.release(started)  # learns a 4s service time
+        await controller.acquire()
+
+        with pytest.raises(OverloadedError) as exc_info:
+            await controller.acquire(deadline=clock.now + 1.0)
+        assert exc_info.value.status_code == 503
+        assert controller.rejected_deadline == 1
+        assert controller.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_times_out_with_503(self):
+        """Test that a request that waits out its budget is rejected, not left hanging."""
+        controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(OverloadedError) as exc_info:
+            await controller.acquire()
+        assert exc_info.value.status_code == 503
+        assert controller.timed_out == 1
+        assert controller.queue_depth == 0
+
+
+class TestAdmissionEndpoints:
+    """Test suite for load shedding on the API."""
+
+    def test_overloaded_summarize_gets_429_with_retry_after(self, monkeypatch):
+        """Test that /summarize is shed while /health and the stats stay reachable."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+        monkeypatch.setattr(main.admission, "max_in_flight", 1)
+        monkeypatch.setattr(main.admission, "max_queue", 0)
+        monkeypatch.setattr(main.admission, "_in_flight", 1)  # one request already running
+
+        with TestClient(main.app) as test_client:
+            rejected = test_client.post("/summarize", json={"text": "Some text"})
+            health = test_client.get("/health")
+            stats = test_client.get("/admission/stats").json()
+
+        assert rejected.status_code == 429
+        assert rejected.headers["Retry-After"] == "1"
+        assert health.status_code == 200
+        assert stats["in_flight"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["rejected_queue_full"] >= 1
+
+    def test_admitted_request_releases_its_slot(self, monkeypatch):
+        """Test that a completed request leaves nothing in flight."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "Some text"})
+            stats = test_client.get("/admission/stats").json()
+
+        assert response.status_code == 200
+        assert stats["in_flight"] == 0
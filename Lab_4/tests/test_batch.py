@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+def prompt_text(request: httpx.Request) -> str:
+    return json.loads(request.content)["messages"][0]["content"].split("\n\n", 1)[1]
+
+
+class TestSummarizeBatch:
+    """Test suite for the POST /summarize/batch endpoint."""
+
+    def test_results_in_input_order_with_per_item_errors(self, install_client):
+        """Test that one failing item is reported without failing the batch."""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            text = prompt_text(request)
+            if text == "bad":
+                return httpx.Response(500)
+            # Later items finish first to check ordering
+            await asyncio.sleep(0.03 if text == "first" else 0)
+            return httpx.Response(200, json={"choices": [{"message": {"content": text.upper()}}]})
+
+        install_client(handler)
+        with TestClient(main.app) as test_client:
+            response = test_client.post(
+                "/summarize/batch",
+                json={"items": [{"text": "first"}, {"text": "bad"}, {"text": "third"}]},
+            )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["index"] for r in results] == [0, 1, 2]
+        assert results[0]["result"]["summary"] == "FIRST"
+        assert results[1]["status_code"] == 502 and results[1]["result"] is None
+        assert results[2]["result"]["summary"] == "THIRD"
+
+    def test_malformed_reply_fails_only_its_item(self, install_client):
+        """Test that an unexpected error on one item is reported as that item's 500."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            text = prompt_text(request)
+            if text == "broken":
+                return httpx.Response(200, json={"choices": [{"finish_reason": "error"}]})
+            return httpx.Response(200, json={"choices": [{"message": {"content": text.upper()}}]})
+
+        install_client(handler)
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize/batch", json={"items": [{"text": "broken"}, {"text": "fine"}]})
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results[0]["status_code"] == 500 and results[0]["result"] is None
+        assert results[1]["status_code"] == 200 and results[1]["result"]["summary"] == "FINE"
+
+    def test_concurrency_is_capped(self, monkeypatch, install_client):
+        """Test that no more than SUMMARIZE_BATCH_CONCURRENCY items run at once."""
+        in_flight = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+        install_client(handler)
+        monkeypatch.setattr(main, "BATCH_CONCURRENCY", 2)
+        with TestClient(main.app) as test_client:
+            response = test_client.post(
+                "/summarize/batch",
+                json={"items": [{"text": f"doc {i}"} for i in range(6)]},
+            )
+
+        assert response.status_code == 200
+        assert len(response.json()["results"]) == 6
+        assert peak == 2
+
+    def test_stream_yields_ndjson_in_completion_order(self, install_client):
+        """Test that streamed results arrive as each item finishes."""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            text = prompt_text(request)
+            await asyncio.sleep(0.05 if text == "slow" else 0)
+            return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+        install_client(handler)
+        with TestClient(main.app) as test_client:
+            response = test_client.post(
+                "/summarize/batch",
+                json={"items": [{"text": "slow"}, {"text": "fast"}], "stream": True},
+            )
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["index"] for line in lines] == [1, 0]
+        assert lines[0]["result"]["summary"] == "fast"
+
+    def test_empty_batch_is_rejected(self):
+        """Test that a batch must contain at least one item."""
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize/batch", json={"items": []})
+        assert response.status_code == 422
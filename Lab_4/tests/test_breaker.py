@@ -0,0 +1,102 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.openrouter_client import is_upstream_failure
+from common.breaker import CircuitBreaker
+from common.retry import RetryPolicy
+
+
+@pytest.fixture
+def install_breaker(install_client):
+    """Install a single-attempt client guarded by a breaker built from the given settings."""
+
+    def install(handler, **breaker_kwargs) -> CircuitBreaker:
+        breaker = CircuitBreaker(is_failure=is_upstream_failure, **breaker_kwargs)
+        install_client(handler, retry_policy=RetryPolicy(attempts=1), breaker=breaker)
+        return breaker
+
+    return install
+
+
+class TestCircuitBreakerEndpoints:
+    """Test suite for circuit breaker behaviour on the API."""
+
+    def test_open_breaker_fails_fast_with_retry_after(self, install_breaker):
+        """Test that once open, requests get 503 without reaching the upstream."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(500)
+
+        install_breaker(handler, min_calls=2, open_seconds=30)
+        with TestClient(main.app) as test_client:
+            first = [test_client.post("/summarize", json={"text": f"doc {i}"}) for i in range(2)]
+            rejected = test_client.post("/summarize", json={"text": "doc 3"})
+
+        assert [r.status_code for r in first] == [502, 502]
+        assert rejected.status_code == 503
+        assert 0 < int(rejected.headers["Retry-After"]) <= 30
+        assert len(calls) == 2
+
+    def test_health_reports_breaker_state(self, install_breaker):
+        """Test that /health exposes the breaker and degrades while it is open."""
+        breaker = install_breaker(lambda request: httpx.Response(500), min_calls=1)
+        with TestClient(main.app) as test_client:
+            healthy = test_client.get("/health").json()
+            test_client.post("/summarize", json={"text": "doc"})
+            degraded = test_client.get("/health").json()
+
+        assert healthy["status"] == "healthy"
+        assert healthy["circuit_breaker"]["state"] == "closed"
+        assert degraded["status"] == "degraded"
+        assert degraded["circuit_breaker"]["state"] == "open"
+        assert breaker.times_opened == 1
+
+    def test_cached_summaries_are_served_while_open(self, install_breaker):
+        """Test that cache hits keep working when the upstream is cut off."""
+        responses = [httpx.Response(200, json={"choices": [{"message": {"content": "cached"}}]}), httpx.Response(500)]
+        install_breaker(lambda request: responses.pop(0), min_calls=2)
+        with TestClient(main.app) as test_client:
+            test_client.post("/summarize", json={"text": "known doc"})
+            test_client.post("/summarize", json={"text": "new doc"})
+            cached = test_client.post("/summarize", json={"text": "known doc"})
+            rejected = test_client.post("/summarize", json={"text": "another doc"})
+
+        assert cached.status_code == 200 and cached.json()["summary"] == "cached"
+        assert rejected.status_code == 503
+
+    def test_client_errors_do_not_open_breaker(self, install_breaker):
+        """Test that 4xx responses are not counted as upstream failures."""
+        breaker = install_breaker(lambda request: httpx.Response(401), min_calls=1)
+        with TestClient(main.app) as test_client:
+            for i in range(3):
+                assert test_client.post("/summarize", json={"text": f"doc {i}"}).status_code == 502
+
+        assert breaker.state == "closed"
+
+    def test_dead_primary_does_not_cut_off_healthy_fallback(self, install_client):
+        """Test that the primary's open breaker sends traffic to the fallback instead of failing with 503."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = json.loads(request.content)["model"]
+            calls.append(model)
+            if model == "test/model":
+                return httpx.Response(500)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "from fallback"}}]})
+
+        breaker = CircuitBreaker(is_failure=is_upstream_failure, min_calls=5, open_seconds=30)
+        install_client(handler, retry_policy=RetryPolicy(attempts=1), breaker=breaker, fallback_models=["test/fallback"])
+        with TestClient(main.app) as test_client:
+            responses = [test_client.post("/summarize", json={"text": f"doc {i}"}) for i in range(8)]
+
+        assert [r.status_code for r in responses] == [200] * 8
+        assert all(r.json()["model"] == "test/fallback" for r in responses)
+        assert breaker.state == "open"
+        assert calls.count("test/model") == 5
+        assert calls.count("test/fallback") == 8
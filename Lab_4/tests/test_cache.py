@@ -0,0 +1,155 @@
+import httpx
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.cache import PersistentSummaryCache, SummaryCache, make_key
+from app.models import SummarizeResponse
+from app.openrouter_client import OpenRouterClient
+
+
+def summary(text: str) -> SummarizeResponse:
+    return SummarizeResponse(summary=text, model="test/model", truncated=False)
+
+
+class TestSummaryCache:
+    """Test suite for the LRU + TTL summary cache."""
+
+    def test_key_ignores_whitespace_differences(self):
+        """Test that re-wrapped text maps to the same key."""
+        assert make_key("m", "a  b\nc", 10) == make_key("m", "a b c", 10)
+        assert make_key("m", "a b c", 10) != make_key("m", "a b c", 20)
+        assert make_key("m", "a b c", 10) != make_key("other", "a b c", 10)
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups update hit and miss counters."""
+        cache = SummaryCache()
+        key = make_key("m", "text", 10)
+        assert cache.get(key) is None
+        cache.set(key, summary("s"))
+        assert cache.get(key) == summary("s")
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction_by_entry_count(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = SummaryCache(max_entries=2)
+        cache.set("a", summary("a"))
+        cache.set("b", summary("b"))
+        cache.get("a")
+        cache.set("c", summary("c"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.evictions == 1
+
+    def test_eviction_by_byte_size(self):
+        """Test that the byte budget bounds total stored size."""
+        entry_size = len(summary("x" * 100).model_dump_json())
+        cache = SummaryCache(max_bytes=entry_size * 2)
+        for name in ("a", "b", "c"):
+            cache.set(name, summary(name * 100))
+
+        assert len(cache) == 2
+        assert cache.current_bytes <= entry_size * 2
+
+    def test_entries_expire_after_ttl(self, clock):
+        """Test that entries past their TTL are treated as misses."""
+        cache = SummaryCache(ttl_seconds=10, clock=clock)
+        cache.set("a", summary("a"))
+        clock.now = 9.9
+        assert cache.get("a") is not None
+        clock.now = 10.0
+        assert cache.get("a") is None
+        assert cache.expirations == 1
+        assert len(cache) == 0
+
+
+class TestPersistentSummaryCache:
+    """Test suite for the SQLite-backed cache shared by workers."""
+
+    def test_workers_share_entries_through_the_file(self, tmp_path):
+        """Test that a response stored by one worker is a hit for another."""
+        path = str(tmp_path / "summaries.db")
+        worker_a = PersistentSummaryCache(path)
+        worker_b = PersistentSummaryCache(path)
+        key = make_key("m", "text", 10)
+
+        assert worker_b.get(key) is None
+        worker_a.set(key, summary("shared"))
+        assert worker_b.get(key) == summary("shared")
+        assert worker_b.stats()["hits"] == 1
+        assert worker_b.stats()["entries"] == 1
+
+    def test_entries_survive_a_restart_until_ttl(self, tmp_path, clock):
+        """Test that a reopened cache still serves entries, and expires them on the wall clock."""
+        path = str(tmp_path / "summaries.db")
+        PersistentSummaryCache(path, ttl_seconds=10, clock=clock).set("a", summary("a"))
+
+        reopened = PersistentSummaryCache(path, ttl_seconds=10, clock=clock)
+        assert reopened.get("a") == summary("a")
+        clock.now = 10.0
+        assert reopened.get("a") is None
+        assert len(reopened) == 0
+
+    def test_endpoint_hits_a_cache_filled_by_another_worker(self, monkeypatch, tmp_path):
+        """Test that /summarize answers from the shared file without an upstream call."""
+        path = str(tmp_path / "summaries.db")
+        PersistentSummaryCache(path).set(make_key("test/model", "Same document", 100), summary("from disk"))
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "live"}}]})
+
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(main, "summary_cache", PersistentSummaryCache(path))
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "Same document"})
+
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.json()["summary"] == "from disk"
+        assert calls == []
+
+
+class TestSummarizeCaching:
+    """Test suite for caching on the /summarize endpoint."""
+
+    def make_client(self, monkeypatch):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": f"summary {len(calls)}"}}]})
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "openrouter_client", client)
+        return calls
+
+    def test_repeated_request_is_served_from_cache(self, monkeypatch):
+        """Test that an identical request does not reach the upstream twice."""
+        calls = self.make_client(monkeypatch)
+        with TestClient(main.app) as test_client:
+            first = test_client.post("/summarize", json={"text": "Same document"})
+            second = test_client.post("/summarize", json={"text": "Same   document"})
+            stats = test_client.get("/cache/stats").json()
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+        assert len(calls) == 1
+        assert stats["hits"] == 1 and stats["entries"] == 1
+
+    def test_no_cache_header_bypasses_cache(self, monkeypatch):
+        """Test that Cache-Control: no-cache forces a fresh upstream call."""
+        calls = self.make_client(monkeypatch)
+        with TestClient(main.app) as test_client:
+            test_client.post("/summarize", json={"text": "Same document"})
+            fresh = test_client.post(
+                "/summarize",
+                json={"text": "Same document"},
+                headers={"Cache-Control": "no-cache"},
+            )
+
+        assert fresh.headers["X-Cache"] == "BYPASS"
+        assert fresh.json()["summary"] == "summary 2"
+        assert len(calls) == 2
@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.openrouter_client import OpenRouterAPIError, OpenRouterClient
+from common.deadline import Deadline, DeadlineExceeded, deadline_scope
+from conftest import completion
+
+
+class TestDeadlinePropagation:
+    """Test suite for request deadlines flowing through the client."""
+
+    @pytest.mark.asyncio
+    async def test_slow_upstream_is_cut_off_at_the_deadline(self):
+        """Test that an upstream call is abandoned when the caller's budget runs out."""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1.0)
+            return httpx.Response(200, json=completion("late"))
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with deadline_scope(0.05):
+            with pytest.raises(DeadlineExceeded):
+                await client.asummarize("Some text")
+        await client.aclose()
+        assert loop.time() - started < 0.5
+
+    @pytest.mark.asyncio
+    async def test_retry_that_cannot_finish_in_time_is_not_started(self):
+        """Test that a Retry-After longer than the remaining budget ends the retries."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(503, headers={"Retry-After": "5"}, json={"error": "busy"})
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        with deadline_scope(1.0):
+            with pytest.raises(OpenRouterAPIError):
+                await client.asummarize("Some text")
+        await client.aclose()
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_spent_deadline_makes_no_upstream_call(self):
+        """Test that nothing is sent once the budget is already gone."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json=completion("ok"))
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        with deadline_scope(Deadline(0.0)):
+            with pytest.raises(DeadlineExceeded):
+                await client.asummarize("Some text")
+        await client.aclose()
+        assert calls == []
+
+
+class TestDeadlineEndpoints:
+    """Test suite for the X-Request-Timeout header and timeout parameter."""
+
+    def test_request_timeout_header_answers_504(self, monkeypatch):
+        """Test that a slow upstream under a short budget returns 504 promptly."""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1.0)
+            return httpx.Response(200, json=completion("late"))
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "openrouter_client", client)
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "Some text"}, headers={"X-Request-Timeout": "0.05"})
+
+        assert response.status_code == 504
+
+    def test_timeout_query_parameter_is_accepted(self, monkeypatch):
+        """Test that a generous budget passed as ?timeout= does not get in the way."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=completion("ok")))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize?timeout=10", json={"text": "Some text"})
+
+        assert response.status_code == 200
+        assert response.json()["summary"] == "ok"
+
+    @pytest.mark.parametrize("value", ["soon", "0", "-1"])
+    def test_invalid_request_timeout_is_rejected(self, value, monkeypatch):
+        """Test that a malformed or non-positive budget answers 400."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=completion("ok")))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "Some text"}, headers={"X-Request-Timeout": value})
+
+        assert response.status_code == 400
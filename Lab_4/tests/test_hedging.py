@@ -0,0 +1,209 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import requests
+
+from app.hedging import HedgePolicy, hedged
+from app.openrouter_client import OpenRouterClient
+from conftest import completion
+
+
+def warmed_policy(delay: float, **kwargs) -> HedgePolicy:
+    """A policy that already has enough samples to hedge after ``delay`` seconds."""
+    policy = HedgePolicy(min_delay=0.0, min_samples=1, **kwargs)
+    policy.observe(delay)
+    return policy
+
+
+class TestHedgePolicy:
+    """Test suite for the hedge delay and rate cap."""
+
+    def test_no_delay_until_enough_samples(self):
+        """Test that hedging stays off until the latency window has data."""
+        policy = HedgePolicy(min_samples=3)
+        policy.observe(0.1)
+        policy.observe(0.2)
+        assert policy.delay() is None
+        policy.observe(0.3)
+        assert policy.delay() is not None
+
+    def test_delay_tracks_percentile(self):
+        """Test that the delay is the configured latency percentile, clamped."""
+        policy = HedgePolicy(percentile=90, min_delay=0.0, max_delay=5.0, min_samples=1)
+        for i in range(1, 101):
+            policy.observe(i / 100)
+        assert policy.delay() == pytest.approx(0.91)
+
+        policy.observe(60.0)
+        policy.max_delay = 0.5
+        assert policy.delay() == 0.5
+
+    def test_hedge_rate_is_capped(self):
+        """Test that hedges never exceed max_hedge_ratio of requests."""
+        policy = HedgePolicy(max_hedge_ratio=0.1)
+        policy.requests = 20
+        assert policy.try_hedge()
+        assert policy.try_hedge()
+        assert not policy.try_hedge()
+        assert policy.hedges == 2
+
+
+class TestHedged:
+    """Test suite for racing and falling back across candidate models."""
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_loses_to_hedge_and_is_cancelled(self):
+        """Test that the hedge wins against a stalled primary, which is then cancelled."""
+        cancelled = []
+
+        async def call(model: str) -> str:
+            if model == "primary":
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(model)
+                    raise
+            return model
+
+        policy = warmed_policy(0.01, max_hedge_ratio=1.0)
+        result = await hedged(call, ["primary", "backup"], policy)
+        await asyncio.sleep(0)
+
+        assert result == "backup"
+        assert cancelled == ["primary"]
+        assert policy.hedges == 1
+        assert policy.hedge_wins == 1
+
+    @pytest.mark.asyncio
+    async def test_single_model_hedges_against_itself(self):
+        """Test that with one model the hedge goes to the same model."""
+        calls = []
+
+        async def call(model: str) -> int:
+            calls.append(model)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return len(calls)
+
+        result = await hedged(call, ["only"], warmed_policy(0.01, max_hedge_ratio=1.0))
+        assert result == 2
+        assert calls == ["only", "only"]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_budget_is_spent(self):
+        """Test that a slow call is simply awaited once the hedge cap is reached."""
+        calls = []
+
+        async def call(model: str) -> str:
+            calls.append(model)
+            await asyncio.sleep(0.05)
+            return model
+
+        policy = warmed_policy(0.01, max_hedge_ratio=0.0)
+        assert await hedged(call, ["primary", "backup"], policy) == "primary"
+        assert calls == ["primary"]
+        assert policy.hedges == 0
+
+    @pytest.mark.asyncio
+    async def test_falls_back_in_order_on_failure(self):
+        """Test that failing models hand over to the next candidate."""
+        calls = []
+
+        async def call(model: str) -> str:
+            calls.append(model)
+            if model != "third":
+                raise RuntimeError(model)
+            return model
+
+        assert await hedged(call, ["first", "second", "third"]) == "third"
+        assert calls == ["first", "second", "third"]
+
+    @pytest.mark.asyncio
+    async def test_non_fallback_error_is_raised(self):
+        """Test that errors rejected by should_fallback are not retried elsewhere."""
+        calls = []
+
+        async def call(model: str) -> str:
+            calls.append(model)
+            raise ValueError("bad input")
+
+        with pytest.raises(ValueError):
+            await hedged(call, ["first", "second"], should_fallback=lambda exc: not isinstance(exc, ValueError))
+        assert calls == ["first"]
+
+    @pytest.mark.asyncio
+    async def test_last_error_is_raised_when_all_fail(self):
+        """Test that the final failure propagates once every model has failed."""
+        async def call(model: str) -> str:
+            raise RuntimeError(model)
+
+        with pytest.raises(RuntimeError, match="second"):
+            await hedged(call, ["first", "second"])
+
+
+class TestClientFallback:
+    """Test suite for fallback models on the OpenRouter client."""
+
+    @pytest.mark.asyncio
+    async def test_fallback_model_is_reported(self):
+        """Test that a 5xx on the primary falls back and reports the model that answered."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = json.loads(request.content)["model"]
+            seen.append(model)
+            if model == "primary/model":
+                return httpx.Response(503)
+            return httpx.Response(200, json=completion("fallback summary"))
+
+        client = OpenRouterClient(
+            "key", "primary/model", transport=httpx.MockTransport(handler), fallback_models=["backup/model"]
+        )
+        result = await client.asummarize("text")
+        await client.aclose()
+
+        assert result == {"summary": "fallback summary", "model": "backup/model", "truncated": False}
+        assert seen[-1] == "backup/model"
+        assert set(seen) == {"primary/model", "backup/model"}
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_fall_back(self):
+        """Test that a 4xx caused by the request is not retried on another model."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(json.loads(request.content)["model"])
+            return httpx.Response(400)
+
+        client = OpenRouterClient(
+            "key", "primary/model", transport=httpx.MockTransport(handler), fallback_models=["backup/model"]
+        )
+        with pytest.raises(requests.RequestException):
+            await client.asummarize("text")
+        await client.aclose()
+
+        assert seen == ["primary/model"]
+
+    @pytest.mark.asyncio
+    async def test_hedged_client_reports_winning_model(self):
+        """Test that a hedge to the fallback model wins against a slow primary."""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            model = json.loads(request.content)["model"]
+            if model == "primary/model":
+                await asyncio.sleep(10)
+            return httpx.Response(200, json=completion(f"from {model}"))
+
+        client = OpenRouterClient(
+            "key",
+            "primary/model",
+            transport=httpx.MockTransport(handler),
+            fallback_models=["backup/model"],
+            hedge_policy=warmed_policy(0.01, max_hedge_ratio=1.0),
+        )
+        result = await client.asummarize("text")
+        await client.aclose()
+
+        assert result["model"] == "backup/model"
+        assert result["summary"] == "from backup/model"
@@ -0,0 +1,221 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.admission import OverloadedError
+from app.jobs import JobManager, JobStore, job_id
+from app.models import SummarizeRequest, SummarizeResponse
+from app.openrouter_client import OpenRouterClient
+from conftest import completion
+
+
+def summary(text: str) -> SummarizeResponse:
+    return SummarizeResponse(summary=text, model="test/model", truncated=False)
+
+
+async def echo(request: SummarizeRequest, tenant):
+    return summary("summary of " + request.text)
+
+
+class TestJobStore:
+    """Test suite for persisted job state."""
+
+    def test_jobs_survive_a_restart_and_running_ones_are_requeued(self, tmp_path):
+        """Test that a new store on the same file sees the jobs and requeues interrupted ones."""
+        path = str(tmp_path / "jobs.db")
+        store = JobStore(path)
+        store.create("a", SummarizeRequest(text="first"), "tenant")
+        store.create("b", SummarizeRequest(text="second"), None)
+        store.create("c", SummarizeRequest(text="third"), None)
+        assert store.claim("a") and not store.claim("a")
+        store.claim("c")
+        store.finish("c", result=summary("done"), status_code=200)
+        store.close()
+
+        reopened = JobStore(path)
+        assert reopened.recover() == ["a", "b"]
+        assert reopened.request("a") == (SummarizeRequest(text="first"), "tenant")
+        assert reopened.get("c").result == summary("done")
+        assert reopened.counts() == {"queued": 2, "running": 0, "succeeded": 1, "failed": 0}
+
+    def test_finished_jobs_expire_after_ttl(self, clock):
+        """Test that finished jobs disappear after the TTL while queued ones do not."""
+        store = JobStore(ttl_seconds=10, clock=clock)
+        store.create("done", SummarizeRequest(text="x"), None)
+        store.finish("done", status_code=502, error="upstream failed")
+        store.create("waiting", SummarizeRequest(text="y"), None)
+        clock.now += 10
+        assert store.get("done") is None
+        assert store.get("waiting").status == "queued"
+        assert store.purge() == 1
+
+
+class TestJobManager:
+    """Test suite for the worker pool, deduplication and long-polling."""
+
+    @pytest.mark.asyncio
+    async def test_identical_jobs_run_once(self):
+        """Test that resubmitting a queued or finished job returns it instead of running it again."""
+        runs = []
+
+        async def run(request, tenant):
+            runs.append(request.text)
+            return summary("s")
+
+        manager = JobManager(JobStore(), run, workers=2)
+        await manager.start()
+        request = SummarizeRequest(text="same  text")
+        first, created = await manager.submit(job_id("m", request), request)
+        again, created_again = await manager.submit(job_id("m", SummarizeRequest(text="same text")), request)
+        finished = await manager.wait(first.id, 1.0)
+        after, _ = await manager.submit(first.id, request)
+        await manager.aclose()
+
+        assert created and not created_again and again.id == first.id
+        assert finished.status == "succeeded" and finished.result == summary("s")
+        assert after.status == "succeeded"
+        assert runs == ["same  text"]
+        assert manager.stats()["deduplicated"] == 2
+
+    @pytest.mark.asyncio
+    async def test_full_queue_is_shed_with_429(self):
+        """Test that submissions beyond max_queue raise OverloadedError."""
+        manager = JobManager(JobStore(), echo, workers=1, max_queue=1)
+        manager._queue = asyncio.Queue()  # started, but no worker is taking jobs
+        await manager.submit("a", SummarizeRequest(text="a"))
+        with pytest.raises(OverloadedError) as exc_info:
+            await manager.submit("b", SummarizeRequest(text="b"))
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.retry_after >= 1
+
+    @pytest.mark.asyncio
+    async def test_failures_are_recorded_and_can_be_resubmitted(self):
+        """Test that a failed job reports its status and is run again when resubmitted."""
+        attempts = []
+
+        async def run(request, tenant):
+            attempts.append(tenant)
+            if len(attempts) == 1:
+                raise ValueError("bad input")
+            return summary("ok")
+
+        manager = JobManager(JobStore(), run, describe_error=lambda e: (400, str(e)))
+        await manager.start()
+        job, _ = await manager.submit("j", SummarizeRequest(text="t"), "tenant")
+        failed = await manager.wait(job.id, 1.0)
+        await manager.submit("j", SummarizeRequest(text="t"), "tenant")
+        succeeded = await manager.wait(job.id, 1.0)
+        await manager.aclose()
+
+        assert (failed.status, failed.status_code, failed.error) == ("failed", 400, "bad input")
+        assert succeeded.status == "succeeded"
+        assert attempts == ["tenant", "tenant"]
+
+    @pytest.mark.asyncio
+    async def test_long_poll_times_out_with_current_status(self):
+        """Test that waiting on an unfinished job returns it as it stands after the timeout."""
+        release = asyncio.Event()
+
+        async def run(request, tenant):
+            await release.wait()
+            return summary("late")
+
+        manager = JobManager(JobStore(), run)
+        await manager.start()
+        job, _ = await manager.submit("slow", SummarizeRequest(text="t"))
+        pending = await manager.wait(job.id, 0.05)
+        release.set()
+        done = await manager.wait(job.id, 1.0)
+        await manager.aclose()
+
+        assert pending.status == "running"
+        assert done.status == "succeeded"
+
+    @pytest.mark.asyncio
+    async def test_jobs_left_over_from_a_previous_run_are_resumed(self, tmp_path):
+        """Test that queued and interrupted jobs in the store run after a restart."""
+        path = str(tmp_path / "jobs.db")
+        store = JobStore(path)
+        store.create("queued", SummarizeRequest(text="one"), None)
+        store.create("interrupted", SummarizeRequest(text="two"), None)
+        store.claim("interrupted")
+        store.close()
+
+        manager = JobManager(JobStore(path), echo)
+        await manager.start()
+        results = [await manager.wait(i, 1.0) for i in ("queued", "interrupted")]
+        await manager.aclose()
+        assert [r.result.summary for r in results] == ["summary of one", "summary of two"]
+
+
+class TestJobEndpoints:
+    """Test suite for /summarize/jobs."""
+
+    def test_submit_then_long_poll_for_the_result(self, monkeypatch):
+        """Test that a job is accepted with 202, deduplicated, and its result long-polled."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json=completion("a job summary"))
+
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(main, "job_manager", JobManager(JobStore(), main._run_job, describe_error=main._describe_error))
+
+        with TestClient(main.app) as test_client:
+            accepted = test_client.post("/summarize/jobs", json={"text": "a long document"})
+            location = accepted.headers["Location"]
+            result = test_client.get(location, params={"wait": 5})
+            duplicate = test_client.post("/summarize/jobs", json={"text": "a long document"})
+            stats = test_client.get("/summarize/jobs/stats").json()
+            missing = test_client.get("/summarize/jobs/unknown")
+
+        assert accepted.status_code == 202
+        assert accepted.json()["status"] == "queued"
+        assert location == f"/summarize/jobs/{accepted.json()['id']}"
+        assert result.json()["status"] == "succeeded"
+        assert result.json()["result"] == {"summary": "a job summary", "model": "test/model", "truncated": False}
+        assert duplicate.status_code == 200 and duplicate.json()["id"] == accepted.json()["id"]
+        assert len(calls) == 1
+        assert stats["deduplicated"] == 1 and stats["stored"]["succeeded"] == 1
+        assert missing.status_code == 404
+
+    def test_failed_job_reports_the_summarize_status(self, monkeypatch):
+        """Test that an upstream failure is recorded with the status /summarize would answer."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(400, json={"error": "bad"}))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+        monkeypatch.setattr(main, "job_manager", JobManager(JobStore(), main._run_job, describe_error=main._describe_error))
+
+        with TestClient(main.app) as test_client:
+            job = test_client.post("/summarize/jobs", json={"text": "some text"}).json()
+            result = test_client.get(f"/summarize/jobs/{job['id']}", params={"wait": 5}).json()
+
+        assert result["status"] == "failed"
+        assert result["status_code"] == 502
+        assert result["result"] is None
+
+    def test_tenants_do_not_share_jobs_or_store_their_keys(self, monkeypatch, tmp_path):
+        """Test that two tenants submitting the same text get separate jobs, stored without their API keys."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=completion("a job summary")))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+        path = tmp_path / "jobs.db"
+        store = JobStore(str(path))
+        monkeypatch.setattr(main, "job_manager", JobManager(store, main._run_job, describe_error=main._describe_error))
+
+        with TestClient(main.app) as test_client:
+            first = test_client.post("/summarize/jobs", json={"text": "shared text"}, headers={"X-API-Key": "sk-alice"})
+            second = test_client.post("/summarize/jobs", json={"text": "shared text"}, headers={"X-API-Key": "sk-bob"})
+            again = test_client.post("/summarize/jobs", json={"text": "shared text"}, headers={"X-API-Key": "sk-alice"})
+            test_client.get(first.headers["Location"], params={"wait": 5})
+            test_client.get(second.headers["Location"], params={"wait": 5})
+
+        assert first.status_code == 202 and second.status_code == 202
+        assert first.json()["id"] != second.json()["id"]
+        assert again.status_code == 200 and again.json()["id"] == first.json()["id"]
+        tenants = {store.request(job.json()["id"])[1] for job in (first, second)}
+        assert len(tenants) == 2 and not tenants & {"sk-alice", "sk-bob"}
+        store.close()
+        assert b"sk-alice" not in path.read_bytes() and b"sk-bob" not in path.read_bytes()
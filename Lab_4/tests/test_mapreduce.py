@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.cache import SummaryCache
+from app.mapreduce import MapReduceSummarizer, approx_tokens, split_text
+from app.openrouter_client import OpenRouterClient
+from app.tokens import ContextWindowExceeded, TokenEstimator
+
+
+def paragraph(tag: str, sentences: int = 4) -> str:
+    return " ".join(f"{tag} sentence number {i} has some words." for i in range(sentences))
+
+
+class RecordingUpstream:
+    """Mock upstream that summarizes a prompt to its first few words."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.prompts = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        text = json.loads(request.content)["messages"][0]["content"].split("\n\n", 1)[1]
+        self.prompts.append(text)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": " ".join(text.split()[:3])}}]})
+
+
+class TestSplitText:
+    """Test suite for chunking on paragraph and sentence boundaries."""
+
+    def test_chunks_fit_budget_and_keep_all_text(self):
+        """Test that every chunk fits the budget and no words are lost."""
+        text = "\n\n".join(paragraph(f"p{i}") for i in range(6))
+        chunks = split_text(text, max_tokens=60)
+
+        assert len(chunks) > 1
+        assert all(approx_tokens(chunk) <= 60 for chunk in chunks)
+        assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+
+    def test_long_paragraph_splits_on_sentences(self):
+        """Test that an over-budget paragraph is split between sentences."""
+        chunks = split_text(paragraph("long", sentences=10), max_tokens=40)
+        assert all(chunk.endswith(".") for chunk in chunks)
+
+    def test_edit_keeps_other_chunks_stable(self):
+        """Test that editing one paragraph only changes the chunks around it."""
+        paragraphs = [paragraph(f"p{i}", sentences=2) for i in range(20)]
+        before = split_text("\n\n".join(paragraphs), max_tokens=120)
+        paragraphs[10] = paragraphs[10].replace("some words", "a few more words")
+        after = split_text("\n\n".join(paragraphs), max_tokens=120)
+
+        assert len(before) > 4
+        assert len(set(after) - set(before)) <= 2
+
+
+    def test_unpunctuated_text_splits_in_linear_time(self):
+        """Test that word windows are not re-estimated word by word (the split runs on the event loop)."""
+        text = " ".join(f"word{i % 97}" for i in range(40_000))
+        estimator = TokenEstimator()
+        estimated = 0
+
+        def estimate(piece: str) -> int:
+            nonlocal estimated
+            estimated += len(piece)
+            return estimator.count(piece)
+
+        started = time.perf_counter()
+        chunks = split_text(text, max_tokens=3000, estimate=estimate)
+
+        assert time.perf_counter() - started < 1.0
+        assert estimated < 5 * len(text)
+        assert all(estimator.count(chunk) <= 3000 for chunk in chunks)
+        assert " ".join(chunks).split() == text.split()
+
+class TestMapReduceSummarizer:
+    """Test suite for parallel chunk summarization and reduction."""
+
+    @pytest.mark.asyncio
+    async def test_chunks_run_concurrently_under_cap(self):
+        """Test that chunk calls overlap but never exceed the concurrency cap."""
+        upstream = RecordingUpstream(delay=0.01)
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(upstream))
+        summarizer = MapReduceSummarizer(client, chunk_tokens=60, concurrency=2)
+
+        text = "\n\n".join(paragraph(f"p{i}") for i in range(8))
+        result = await summarizer.summarize(text, max_length=20)
+        await client.aclose()
+
+        assert upstream.peak == 2
+        # One call per chunk plus the reduce call
+        assert len(upstream.prompts) == len(split_text(text, 60)) + 1
+        assert result["model"] == "test/model"
+
+    @pytest.mark.asyncio
+    async def test_edited_document_reuses_unchanged_chunks(self):
+        """Test that only changed chunks are re-summarized when a cache is given."""
+        upstream = RecordingUpstream()
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(upstream))
+        summarizer = MapReduceSummarizer(client, cache=SummaryCache(), chunk_tokens=120)
+
+        paragraphs = [paragraph(f"p{i}", sentences=2) for i in range(20)]
+        await summarizer.summarize("\n\n".join(paragraphs))
+        first_run = len(upstream.prompts)
+
+        paragraphs[10] = paragraphs[10].replace("some words", "a few more words")
+        await summarizer.summarize("\n\n".join(paragraphs))
+        await client.aclose()
+
+        # At most two re-chunked pieces plus the reduce call
+        assert first_run > 4
+        assert len(upstream.prompts) - first_run <= 3
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_cancels_the_others(self):
+        """Test that chunk calls still running are cancelled once one chunk fails."""
+        finished = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            text = json.loads(request.content)["messages"][0]["content"].split("\n\n", 1)[1]
+            if text.startswith("p0 "):
+                return httpx.Response(400)
+            await asyncio.sleep(0.1)
+            finished.append(text)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "summary"}}]})
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        summarizer = MapReduceSummarizer(client, chunk_tokens=60, concurrency=8)
+        text = "\n\n".join(paragraph(f"p{i}") for i in range(6))
+
+        with pytest.raises(Exception):
+            await summarizer.summarize(text)
+        await asyncio.sleep(0.15)
+        await client.aclose()
+
+        assert finished == []
+
+    @pytest.mark.asyncio
+    async def test_short_text_skips_map_step(self):
+        """Test that text within the budget goes straight to a single call."""
+        upstream = RecordingUpstream()
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(upstream))
+        summarizer = MapReduceSummarizer(client, chunk_tokens=1000)
+
+        await summarizer.summarize("A short document.")
+        await client.aclose()
+        assert upstream.prompts == ["A short document."]
+
+
+class TestSummarizeLongDocument:
+    """Test suite for long-document mode on /summarize."""
+
+    def test_long_document_uses_map_reduce(self, monkeypatch):
+        """Test that text over the chunk budget is summarized in chunks."""
+        upstream = RecordingUpstream()
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(upstream))
+        monkeypatch.setattr(main, "openrouter_client", client)
+        monkeypatch.setattr(main, "MAPREDUCE_CHUNK_TOKENS", 60)
+
+        text = "\n\n".join(paragraph(f"p{i}") for i in range(4))
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": text, "max_length": 10})
+
+        assert response.status_code == 200
+        assert len(upstream.prompts) > 2
+        assert upstream.prompts[-1].startswith("p0 sentence number")
+
+    def test_documents_that_fit_the_context_are_summarized_in_one_call(self, monkeypatch):
+        """Test that map-reduce starts at the model's input budget unless MAPREDUCE_CHUNK_TOKENS caps it."""
+        estimator = TokenEstimator(context_window=8192)
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", estimator=estimator))
+        monkeypatch.setattr(main, "MAPREDUCE_CHUNK_TOKENS", None)
+        text = "\n\n".join(paragraph(f"p{i}") for i in range(100))
+        assert 3000 < estimator.count(text) < estimator.input_budget(100)
+
+        assert not main._map_reduce_summarizer(100).needs_map_reduce(text)
+        monkeypatch.setattr(main, "MAPREDUCE_CHUNK_TOKENS", 3000)
+        assert main._map_reduce_summarizer(100).needs_map_reduce(text)
+
+    def test_reply_too_long_for_the_context_reports_the_prompt_that_did_not_fit(self, monkeypatch):
+        """Test that the error reports the framing-only prompt and the reply it could not fit next to."""
+        estimator = TokenEstimator(context_window=200)
+        client = OpenRouterClient("key", "test/model", estimator=estimator)
+        monkeypatch.setattr(main, "openrouter_client", client)
+
+        with pytest.raises(ContextWindowExceeded) as exc_info:
+            main._map_reduce_summarizer(10)
+
+        error = exc_info.value
+        assert error.prompt_tokens == estimator.prompt_overhead()
+        assert error.completion_tokens == estimator.completion_tokens(main.MAPREDUCE_CHUNK_SUMMARY_WORDS)
+        assert error.prompt_tokens + error.completion_tokens > estimator.context_window
@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import metrics
+from app.openrouter_client import OpenRouterClient
+
+
+def completion(content: str, prompt_tokens: int = 0, completion_tokens: int = 0) -> dict:
+    return {
+        "choices": [{"message": {"content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+    }
+
+
+def sample(name: str, text: str) -> float:
+    """Value of the exposition line for name (with labels), or 0 when absent."""
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestMetricsEndpoint:
+    """Test suite for /metrics and the request instrumentation."""
+
+    def test_summarize_is_counted_by_route_phase_and_upstream(self, monkeypatch):
+        """Test that a retried summarize shows up in requests, phases, statuses, retries and tokens."""
+        responses = [httpx.Response(500), httpx.Response(200, json=completion("a summary", 12, 3))]
+        transport = httpx.MockTransport(lambda request: responses.pop(0))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "metrics/model", transport=transport))
+
+        with TestClient(main.app) as test_client:
+            before = test_client.get("/metrics").text
+            assert test_client.post("/summarize", json={"text": "some text"}).status_code == 200
+            response = test_client.get("/metrics")
+
+        after = response.text
+        assert response.headers["content-type"] == metrics.CONTENT_TYPE
+        requests = 'summarizer_http_requests_total{route="/summarize",method="POST",status="200"}'
+        assert sample(requests, after) == sample(requests, before) + 1
+        assert sample('summarizer_upstream_responses_total{model="metrics/model",status="500"}', after) == 1
+        assert sample('summarizer_upstream_responses_total{model="metrics/model",status="200"}', after) == 1
+        assert sample('summarizer_upstream_retries_total{model="metrics/model"}', after) == 1
+        assert sample('summarizer_upstream_tokens_total{model="metrics/model",kind="prompt"}', after) == 12
+        assert sample('summarizer_upstream_tokens_total{model="metrics/model",kind="completion"}', after) == 3
+        for phase in ("validation", "upstream", "parsing"):
+            count = f'summarizer_phase_seconds_count{{phase="{phase}"}}'
+            assert sample(count, after) > sample(count, before)
+        assert sample("summarizer_upstream_in_flight", after) == 0
+
+    def test_shed_requests_keep_their_route_label(self, monkeypatch):
+        """Test that a 429 from admission is counted under /summarize, not as unmatched."""
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model"))
+        monkeypatch.setattr(main.admission, "max_in_flight", 1)
+        monkeypatch.setattr(main.admission, "max_queue", 0)
+        monkeypatch.setattr(main.admission, "_in_flight", 1)
+        shed = 'summarizer_http_requests_total{route="/summarize",method="POST",status="429"}'
+
+        with TestClient(main.app) as test_client:
+            before = sample(shed, test_client.get("/metrics").text)
+            assert test_client.post("/summarize", json={"text": "some text"}).status_code == 429
+            after = sample(shed, test_client.get("/metrics").text)
+
+        assert after == before + 1
+
+    def test_pool_capacity_follows_the_client_lifecycle(self):
+        """Test that the pool capacity gauge rises on start and falls on close."""
+        async def scenario():
+            client = OpenRouterClient("key", "test/model", max_connections=7)
+            before = metrics.UPSTREAM_POOL_CAPACITY.value()
+            await client.start()
+            during = metrics.UPSTREAM_POOL_CAPACITY.value()
+            ratio = metrics.UPSTREAM_INFLIGHT_RATIO.value()
+            await client.aclose()
+            return before, during, ratio, metrics.UPSTREAM_POOL_CAPACITY.value()
+
+        before, during, ratio, after = asyncio.run(scenario())
+        assert during == before + 7
+        assert ratio == metrics.UPSTREAM_IN_FLIGHT.value() / during
+        assert after == before
@@ -0,0 +1,153 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.openrouter_client import OpenRouterClient
+from conftest import completion
+
+
+def make_transport(handler):
+    """Wrap a (possibly async) handler in an httpx mock transport."""
+    return httpx.MockTransport(handler)
+
+
+class TestAsyncSummarize:
+    """Test suite for the pooled async client path."""
+
+    @pytest.mark.asyncio
+    async def test_asummarize_parses_completion(self):
+        """Test that the async path returns the same shape as the sync path."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.path.endswith("/chat/completions")
+            assert request.headers["Authorization"] == "Bearer key"
+            return httpx.Response(200, json=completion("one two three"))
+
+        client = OpenRouterClient("key", "test/model", transport=make_transport(handler))
+        result = await client.asummarize("some text", max_length=2)
+        await client.aclose()
+
+        assert result == {"summary": "one two three", "model": "test/model", "truncated": True}
+
+    @pytest.mark.asyncio
+    async def test_base_url_overrides_the_api_root(self):
+        """Test that base_url points the client at another upstream, e.g. a local mock."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(str(request.url))
+            return httpx.Response(200, json=completion("ok"))
+
+        client = OpenRouterClient("key", "test/model", transport=make_transport(handler), base_url="http://mock:8080/v1/")
+        await client.asummarize("some text")
+        await client.aclose()
+
+        assert seen == ["http://mock:8080/v1/chat/completions"]
+
+    @pytest.mark.asyncio
+    async def test_asummarize_reuses_one_pool(self):
+        """Test that repeated calls share a single AsyncClient."""
+        transport = make_transport(lambda request: httpx.Response(200, json=completion("ok")))
+        client = OpenRouterClient("key", "test/model", transport=transport)
+        await client.start()
+        pool = client._async_client
+
+        await client.asummarize("a")
+        await client.asummarize("b")
+        assert client._async_client is pool
+
+        await client.aclose()
+        assert client._async_client is None
+
+    @pytest.mark.asyncio
+    async def test_asummarize_runs_calls_concurrently(self):
+        """Test that slow upstream calls overlap instead of serializing."""
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, json=completion("ok"))
+
+        client = OpenRouterClient("key", "test/model", transport=make_transport(handler))
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(client.asummarize(f"text {i}") for i in range(5)))
+        elapsed = loop.time() - started
+        await client.aclose()
+
+        assert elapsed < 0.3
+
+    @pytest.mark.asyncio
+    async def test_asummarize_http_error_is_request_exception(self):
+        """Test that upstream failures surface as requests.RequestException."""
+        transport = make_transport(lambda request: httpx.Response(500))
+        client = OpenRouterClient("key", "test/model", transport=transport)
+
+        with pytest.raises(requests.RequestException) as exc_info:
+            await client.asummarize("text")
+        await client.aclose()
+
+        assert exc_info.value.status_code == 500
+
+    @pytest.mark.asyncio
+    async def test_asummarize_retries_transient_errors(self):
+        """Test that 429 and 5xx responses are retried and Retry-After is honoured."""
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(502),
+            httpx.Response(200, json=completion("ok")),
+        ]
+        transport = make_transport(lambda request: responses.pop(0))
+        client = OpenRouterClient("key", "test/model", transport=transport)
+
+        result = await client.asummarize("text")
+        await client.aclose()
+
+        assert result["summary"] == "ok"
+        assert responses == []
+        assert client.retry_policy.budget.retries == 2
+
+    @pytest.mark.asyncio
+    async def test_asummarize_does_not_retry_client_errors(self):
+        """Test that 4xx responses other than 429 fail on the first attempt."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(401)
+
+        client = OpenRouterClient("key", "test/model", transport=make_transport(handler))
+        with pytest.raises(requests.RequestException):
+            await client.asummarize("text")
+        await client.aclose()
+
+        assert len(calls) == 1
+
+
+class TestSummarizeWithClient:
+    """Test suite for /summarize backed by a configured client."""
+
+    def test_summarize_uses_async_client(self, monkeypatch):
+        """Test that the endpoint awaits the pooled client opened in the lifespan."""
+        transport = make_transport(lambda request: httpx.Response(200, json=completion("short summary")))
+        client = OpenRouterClient("key", "test/model", transport=transport)
+        monkeypatch.setattr(main, "openrouter_client", client)
+
+        with TestClient(main.app) as test_client:
+            assert client._async_client is not None
+            response = test_client.post("/summarize", json={"text": "Some long text"})
+
+        assert response.status_code == 200
+        assert response.json() == {"summary": "short summary", "model": "test/model", "truncated": False}
+        assert client._async_client is None
+
+    def test_summarize_upstream_failure_returns_502(self, monkeypatch):
+        """Test that upstream errors on the async path map to 502."""
+        transport = make_transport(lambda request: httpx.Response(503))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "Some long text"})
+
+        assert response.status_code == 502
@@ -0,0 +1,44 @@
+import time
+
+import httpx
+import pytest
+
+from app.openrouter_client import OpenRouterClient
+from common.ratelimit import AdaptiveRateLimiter
+
+
+class TestRateLimitedClient:
+    """Test suite for the adaptive limiter on the async client path."""
+
+    @pytest.mark.asyncio
+    async def test_429_cuts_rate_and_success_settles_tokens(self):
+        """Test that a 429 lowers the rate and reported usage refunds the token bucket."""
+        responses = [
+            httpx.Response(429, headers={"Retry-After": "0"}),
+            httpx.Response(200, json={
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"total_tokens": 10},
+            }),
+        ]
+        limiter = AdaptiveRateLimiter(max_rps=40, tokens_per_minute=6000)
+        client = OpenRouterClient(
+            "key", "test/model",
+            transport=httpx.MockTransport(lambda request: responses.pop(0)),
+            rate_limiter=limiter,
+        )
+
+        result = await client.asummarize("text", max_length=50)
+        await client.aclose()
+
+        assert result["summary"] == "ok"
+        assert limiter.rate_limited == 1
+        assert limiter.rps < 40
+
+    @pytest.mark.asyncio
+    async def test_exhausted_rate_limit_headers_pause_requests(self):
+        """Test that X-RateLimit-Remaining: 0 delays the next reservation."""
+        limiter = AdaptiveRateLimiter(max_rps=100)
+        reset_ms = str(int((time.time() + 2) * 1000))
+        limiter.on_success({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset_ms})
+
+        assert 1.0 < limiter.reserve() <= 2.0
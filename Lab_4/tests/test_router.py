@@ -0,0 +1,124 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.openrouter_client import OpenRouterClient, is_upstream_failure
+from common.breaker import CircuitBreaker
+from common.retry import RetryPolicy
+from common.router import LatencyRouter
+from conftest import completion
+
+
+@pytest.fixture
+def install_router(install_client):
+    """Install a single-attempt client routing across models, the first being the default."""
+
+    def install(handler, models, **router_kwargs) -> LatencyRouter:
+        router = LatencyRouter(models, is_failure=is_upstream_failure, **router_kwargs)
+        install_client(handler, models[0], retry_policy=RetryPolicy(attempts=1), router=router)
+        return router
+
+    return install
+
+
+class TestRoutedSummarize:
+    """Test suite for latency-aware routing across a model pool."""
+
+    def test_failing_model_is_ejected_and_traffic_moves(self, install_router):
+        """Test that a model returning 5xx is skipped once ejected and answers come from the pool."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = json.loads(request.content)["model"]
+            seen.append(model)
+            if model == "down/model":
+                return httpx.Response(503)
+            return httpx.Response(200, json=completion("ok"))
+
+        router = install_router(handler, ["down/model", "up/model"], eject_consecutive_failures=1)
+        router.record("up/model", True, 5.0)  # make the failing model look attractive at first
+        with TestClient(main.app) as test_client:
+            responses = [test_client.post("/summarize", json={"text": f"doc {i}"}) for i in range(5)]
+            stats = test_client.get("/router/stats").json()
+
+        assert [r.status_code for r in responses] == [200] * 5
+        assert {r.json()["model"] for r in responses} == {"up/model"}
+        assert seen.count("down/model") == 1
+        assert stats["down/model"]["ejected"] is True
+        assert stats["up/model"]["calls"] == 6
+        assert router.snapshot()["up/model"]["in_flight"] == 0
+
+    def test_breaker_rejections_are_not_counted_as_calls(self, install_client):
+        """Test that calls the breaker rejects do not make a tripped model look fast and healthy."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(500)
+
+        router = LatencyRouter(["down/model"], is_failure=is_upstream_failure)
+        install_client(
+            handler, "down/model",
+            retry_policy=RetryPolicy(attempts=1),
+            router=router,
+            breaker=CircuitBreaker(is_failure=is_upstream_failure, min_calls=2),
+        )
+        with TestClient(main.app) as test_client:
+            statuses = [test_client.post("/summarize", json={"text": f"doc {i}"}).status_code for i in range(6)]
+
+        assert statuses == [502, 502, 503, 503, 503, 503]
+        assert len(calls) == 2
+        assert router.snapshot()["down/model"]["calls"] == 2
+        assert router.snapshot()["down/model"]["error_rate"] > 0.5
+
+    def test_stream_reports_routed_model(self, install_router):
+        """Test that streamed summaries name the model the router picked."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            model = json.loads(request.content)["model"]
+            body = f'data: {json.dumps({"choices": [{"delta": {"content": model}}]})}\n\ndata: [DONE]\n\n'
+            return httpx.Response(200, content=body.encode(), headers={"Content-Type": "text/event-stream"})
+
+        install_router(handler, ["a/model", "b/model"])
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize/stream", json={"text": "Some text"})
+
+        data = [json.loads(line[len("data:"):]) for line in response.text.splitlines() if line.startswith("data:")]
+        token, done = data
+        assert done["model"] in ("a/model", "b/model")
+        assert token["text"] == done["model"]
+
+    def test_single_routed_model_is_used_instead_of_the_default(self, install_client):
+        """Test that a pool of one model is called even when it differs from the client's model."""
+        models = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            models.append(json.loads(request.content)["model"])
+            return httpx.Response(200, json=completion("routed"))
+
+        install_client(handler, "default/model", router=LatencyRouter(["routed/model"], is_failure=is_upstream_failure))
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "Some text"})
+
+        assert response.status_code == 200
+        assert models == ["routed/model"]
+
+    @pytest.mark.asyncio
+    async def test_probe_reinstates_recovered_model(self):
+        """Test that the client's probe call brings an ejected model back."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            assert payload["max_tokens"] == 1
+            return httpx.Response(200, json=completion("pong"))
+
+        router = LatencyRouter(["a/model", "b/model"], eject_consecutive_failures=1, eject_seconds=0)
+        client = OpenRouterClient("key", "a/model", transport=httpx.MockTransport(handler), router=router)
+        router.record("a/model", False, 0.1)
+        assert router.snapshot()["a/model"]["ejected"]
+
+        await router.probe_ejected()
+        await client.aclose()
+
+        assert not router.snapshot()["a/model"]["ejected"]
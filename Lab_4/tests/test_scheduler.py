@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.models import SummarizeRequest
+from app.openrouter_client import OpenRouterClient
+from common.scheduler import FairScheduler, schedule_as
+from common.singleflight import SingleFlight
+from conftest import completion
+
+
+class TestScheduledClient:
+    """Test suite for priority scheduling of upstream calls."""
+
+    @pytest.mark.asyncio
+    async def test_interactive_call_overtakes_queued_batch_work(self):
+        """Test that a freed slot goes to interactive traffic before older batch calls."""
+        order = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            text = json.loads(request.content)["messages"][0]["content"].rsplit("\n", 1)[-1]
+            order.append(text)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json=completion(text))
+
+        scheduler = FairScheduler(concurrency=1)
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler), scheduler=scheduler)
+
+        async def run(text: str, priority: str) -> None:
+            with schedule_as(priority, "tenant"):
+                await client.asummarize(text)
+
+        tasks = [asyncio.create_task(run(f"batch {i}", "batch")) for i in range(3)]
+        await asyncio.sleep(0.001)
+        tasks.append(asyncio.create_task(run("interactive", "interactive")))
+        await asyncio.gather(*tasks)
+        await client.aclose()
+
+        assert order[:2] == ["batch 0", "interactive"]
+        stats = scheduler.stats()["classes"]
+        assert stats["batch"]["dispatched"] == 3
+        assert stats["batch"]["max_wait"] > stats["interactive"]["max_wait"]
+
+    @pytest.mark.asyncio
+    async def test_coalesced_tenants_are_not_charged_to_the_first(self, monkeypatch):
+        """Test that tenants sharing a call queue it under their common class and no one's tenant."""
+        labels = []
+        calls = 0
+
+        class RecordingScheduler(FairScheduler):
+            async def acquire(self, priority=None, tenant=None, cost=1.0):
+                labels.append(self._resolve(priority, tenant))
+                await super().acquire(priority, tenant, cost)
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=completion("shared"))
+
+        client = OpenRouterClient(
+            "key", "test/model", transport=httpx.MockTransport(handler), scheduler=RecordingScheduler(concurrency=4)
+        )
+        monkeypatch.setattr(main, "openrouter_client", client)
+        monkeypatch.setattr(main, "summarize_flight", SingleFlight())
+
+        async def summarize(priority: str, tenant: str) -> str:
+            with schedule_as(priority, tenant):
+                summary, _ = await main._summarize_cached(SummarizeRequest(text="same document"))
+            return summary.summary
+
+        results = await asyncio.gather(
+            summarize("batch", "alice"), summarize("batch", "bob"), summarize("interactive", "bob")
+        )
+        await client.aclose()
+
+        assert results == ["shared"] * 3
+        # Batch callers share one call; the interactive caller does not wait behind it
+        assert calls == 2
+        assert sorted(labels) == [("batch", "default"), ("interactive", "default")]
+
+    def test_endpoints_label_traffic_and_report_waits(self, monkeypatch):
+        """Test that /summarize is interactive, /summarize/batch is batch, and stats expose both."""
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=completion("ok")))
+        scheduler = FairScheduler(concurrency=4)
+        client = OpenRouterClient("key", "test/model", transport=transport, scheduler=scheduler)
+        monkeypatch.setattr(main, "openrouter_client", client)
+        monkeypatch.setattr(main, "upstream_scheduler", scheduler)
+
+        with TestClient(main.app) as test_client:
+            test_client.post("/summarize", json={"text": "one"}, headers={"X-API-Key": "alice"})
+            test_client.post("/summarize/batch", json={"items": [{"text": "two"}, {"text": "three"}]})
+            stats = test_client.get("/scheduler/stats").json()
+
+        assert stats["concurrency"] == 4
+        assert stats["in_flight"] == 0
+        assert stats["classes"]["interactive"]["dispatched"] == 1
+        assert stats["classes"]["batch"]["dispatched"] == 2
@@ -0,0 +1,137 @@
+import random
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.models import SummarizeResponse
+from app.openrouter_client import OpenRouterClient
+from app.similarity import SimilarityCache, choose_bands, estimated_jaccard, minhash, shingle_hashes, words
+
+
+def summary(text: str) -> SummarizeResponse:
+    return SummarizeResponse(summary=text, model="test/model", truncated=False)
+
+
+def document(rng: random.Random, length: int = 200) -> str:
+    return " ".join(f"word{rng.randrange(5000)}" for _ in range(length))
+
+
+class TestMinHash:
+    """Test suite for shingling and MinHash signatures."""
+
+    def test_signature_estimates_jaccard(self):
+        """Test that the share of equal positions tracks the true shingle overlap."""
+        rng = random.Random(1)
+        base = words(document(rng, 400))
+        edited = list(base)
+        for i in range(0, 400, 20):
+            edited[i] = "changed"
+        a, b = shingle_hashes(base), shingle_hashes(edited)
+        true_jaccard = len(a & b) / len(a | b)
+
+        estimate = estimated_jaccard(minhash(a, 256), minhash(b, 256))
+        assert abs(estimate - true_jaccard) < 0.1
+
+    def test_formatting_and_case_do_not_matter(self):
+        """Test that whitespace, punctuation and case changes leave the signature unchanged."""
+        a = minhash(shingle_hashes(words("The quick brown fox, jumps over the lazy dog.")))
+        b = minhash(shingle_hashes(words("the  quick\nbrown fox jumps over THE lazy dog")))
+        assert a == b
+
+    def test_bands_keep_recall_at_the_threshold(self):
+        """Test that stricter thresholds get longer bands."""
+        assert choose_bands(0.9, 128) == (16, 8)
+        assert choose_bands(0.5, 128)[1] < choose_bands(0.9, 128)[1]
+
+
+class TestSimilarityCache:
+    """Test suite for the near-duplicate LSH cache."""
+
+    def test_near_duplicate_is_a_hit_and_unrelated_text_is_not(self):
+        """Test that a lightly edited input matches and a different one does not."""
+        rng = random.Random(2)
+        original = document(rng)
+        cache = SimilarityCache(threshold=0.8)
+        cache.set("m", original, 100, summary("cached"))
+
+        edited = "Subject: weekly report\n\n" + original.replace("word", "Word", 1)
+        match = cache.get("m", edited, 100)
+        assert match is not None
+        assert match[0] == summary("cached")
+        assert match[1] >= 0.8
+        assert cache.get("m", document(rng), 100) is None
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    def test_entries_are_scoped_by_model_and_max_length(self):
+        """Test that a match for another model or length is not returned."""
+        text = document(random.Random(3))
+        cache = SimilarityCache()
+        cache.set("m", text, 100, summary("cached"))
+        assert cache.get("other", text, 100) is None
+        assert cache.get("m", text, 50) is None
+
+    def test_ttl_and_entry_bound(self):
+        """Test that expired and evicted entries stop matching."""
+        rng = random.Random(4)
+        now = [0.0]
+        cache = SimilarityCache(max_entries=1, ttl_seconds=10, clock=lambda: now[0])
+        first, second = document(rng), document(rng)
+        cache.set("m", first, 100, summary("first"))
+        cache.set("m", second, 100, summary("second"))
+        assert cache.get("m", first, 100) is None
+        assert cache.evictions == 1
+        now[0] = 10.0
+        assert cache.get("m", second, 100) is None
+        assert len(cache) == 0
+
+    def test_long_inputs_skip_the_index(self):
+        """Test that texts over max_words are neither indexed nor looked up."""
+        text = document(random.Random(5), 50)
+        cache = SimilarityCache(max_words=10)
+        cache.set("m", text, 100, summary("cached"))
+        assert cache.get("m", text, 100) is None
+        assert len(cache) == 0
+        assert cache.stats()["skipped"] == 2
+
+    def test_lookup_is_under_a_millisecond(self):
+        """Test that a lookup against a populated index stays under 1 ms on average."""
+        rng = random.Random(6)
+        cache = SimilarityCache()
+        for _ in range(1000):
+            cache.set("m", document(rng, 300), 100, summary("s"))
+        query = document(rng, 300)
+
+        started = time.perf_counter()
+        for _ in range(50):
+            cache.get("m", query, 100)
+        assert (time.perf_counter() - started) / 50 < 0.001
+
+
+class TestSimilarityEndpoint:
+    """Test suite for near-duplicate hits on /summarize."""
+
+    def test_near_duplicate_request_is_flagged(self, monkeypatch):
+        """Test that a near-duplicate is answered from cache with similarity_hit set."""
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": f"summary {len(calls)}"}}]})
+
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(main, "similarity_cache", SimilarityCache(threshold=0.8))
+        original = document(random.Random(7))
+
+        with TestClient(main.app) as test_client:
+            first = test_client.post("/summarize", json={"text": original})
+            similar = test_client.post("/summarize", json={"text": "Forwarded message:\n" + original})
+            stats = test_client.get("/cache/similarity/stats").json()
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert "similarity_hit" not in first.json()
+        assert similar.headers["X-Cache"] == "SIMILAR"
+        assert similar.json() == {"summary": "summary 1", "model": "test/model", "truncated": False, "similarity_hit": True}
+        assert len(calls) == 1
+        assert stats["enabled"] is True and stats["hits"] == 1
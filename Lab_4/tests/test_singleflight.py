@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app.main as main
+from app.openrouter_client import OpenRouterClient
+from common.singleflight import SingleFlight
+
+
+class TestCoalescedSummarize:
+    """Test suite for request coalescing on the summarizer."""
+
+    @pytest.mark.asyncio
+    async def test_joined_request_keeps_its_own_timeout(self, monkeypatch):
+        """Test that a request joining one with a short timeout is not cut off by it."""
+        calls = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "shared"}}]})
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "openrouter_client", client)
+        monkeypatch.setattr(main, "summarize_flight", SingleFlight())
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            hurried, patient = await asyncio.gather(
+                http.post("/summarize", params={"timeout": 0.05}, json={"text": "burst"}),
+                http.post("/summarize", json={"text": "burst"}),
+            )
+        await client.aclose()
+
+        assert hurried.status_code == 504
+        assert patient.status_code == 200
+        assert patient.json()["summary"] == "shared"
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_identical_summarize_requests_coalesce(self, monkeypatch):
+        """Test that concurrent identical /summarize calls hit the upstream once."""
+        calls = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "shared"}}]})
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "openrouter_client", client)
+        monkeypatch.setattr(main, "summarize_flight", SingleFlight())
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            responses = await asyncio.gather(
+                *(http.post("/summarize", json={"text": "burst"}) for _ in range(4))
+            )
+        await client.aclose()
+
+        assert [r.json()["summary"] for r in responses] == ["shared"] * 4
+        assert calls == 1
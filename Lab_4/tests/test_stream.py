@@ -0,0 +1,173 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.openrouter_client import OpenRouterClient
+from common.scheduler import FairScheduler
+
+
+def sse_body(*deltas: str) -> bytes:
+    lines = [": OPENROUTER PROCESSING", ""]
+    for delta in deltas:
+        chunk = {"choices": [{"delta": {"content": delta}}]}
+        lines += [f"data: {json.dumps(chunk)}", ""]
+    lines += ["data: [DONE]", ""]
+    return "\n".join(lines).encode()
+
+
+def parse_sse(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestStreamingClient:
+    """Test suite for OpenRouterClient.astream_summarize."""
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_tokens_then_done(self):
+        """Test that deltas are relayed in order and a final event closes the stream."""
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert json.loads(request.content)["stream"] is True
+            return httpx.Response(200, content=sse_body("Hello", " brave", " new world"))
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler))
+        events = [event async for event in client.astream_summarize("text", max_length=3)]
+        await client.aclose()
+
+        assert [e["text"] for e in events[:-1]] == ["Hello", " brave", " new"]
+        assert events[-1] == {
+            "type": "done",
+            "summary": "Hello brave new",
+            "model": "test/model",
+            "truncated": True,
+        }
+
+    @pytest.mark.asyncio
+    async def test_stream_stops_reading_after_max_length_words(self):
+        """Test that the upstream stream is closed once the word budget is spent."""
+        sent = []
+
+        async def body():
+            for word in ["one", " two", " three", " four", " five"]:
+                sent.append(word)
+                chunk = {"choices": [{"delta": {"content": word}}]}
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(lambda r: httpx.Response(200, content=body())))
+        events = [event async for event in client.astream_summarize("text", max_length=2)]
+        await client.aclose()
+
+        assert events[-1]["summary"] == "one two"
+        assert events[-1]["truncated"] is True
+        assert len(sent) == 3
+
+    @pytest.mark.asyncio
+    async def test_short_reply_is_not_truncated(self):
+        """Test that a reply within the budget is passed through whole."""
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(lambda r: httpx.Response(200, content=sse_body("one", " two"))))
+        events = [event async for event in client.astream_summarize("text", max_length=2)]
+        await client.aclose()
+
+        assert events[-1]["summary"] == "one two"
+        assert events[-1]["truncated"] is False
+
+    @pytest.mark.asyncio
+    async def test_asummarize_early_stop_uses_stream(self):
+        """Test that early_stop makes asummarize return a correctly truncated summary."""
+        client = OpenRouterClient(
+            "key", "test/model", early_stop=True,
+            transport=httpx.MockTransport(lambda r: httpx.Response(200, content=sse_body("a b", " c d e"))),
+        )
+        result = await client.asummarize("text", max_length=3)
+        await client.aclose()
+
+        assert result == {"summary": "a b c", "model": "test/model", "truncated": True}
+
+    @pytest.mark.asyncio
+    async def test_stream_error_chunk_raises(self):
+        """Test that an in-band error chunk surfaces as a request exception."""
+        body = b'data: {"error": {"message": "overloaded"}}\n\n'
+        client = OpenRouterClient("key", "test/model", transport=httpx.MockTransport(lambda r: httpx.Response(200, content=body)))
+
+        with pytest.raises(Exception, match="overloaded"):
+            async for _ in client.astream_summarize("text"):
+                pass
+        await client.aclose()
+
+
+class TestSummarizeStreamEndpoint:
+    """Test suite for the POST /summarize/stream endpoint."""
+
+    def test_stream_relays_sse_events(self, install_client):
+        """Test that tokens are sent as SSE followed by a done event."""
+        install_client(lambda request: httpx.Response(200, content=sse_body("Short", " summary")))
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize/stream", json={"text": "Some text", "max_length": 10})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert parse_sse(response.text) == [
+            ("token", {"text": "Short"}),
+            ("token", {"text": " summary"}),
+            ("done", {"model": "test/model", "truncated": False}),
+        ]
+
+    def test_streamed_summary_is_cached(self, install_client):
+        """Test that a finished stream fills the cache used by /summarize."""
+        install_client(lambda request: httpx.Response(200, content=sse_body("Cached", " reply")))
+
+        with TestClient(main.app) as test_client:
+            test_client.post("/summarize/stream", json={"text": "Some text"})
+            response = test_client.post("/summarize", json={"text": "Some text"})
+
+        assert response.headers["X-Cache"] == "HIT"
+        assert response.json()["summary"] == "Cached reply"
+
+    def test_upstream_failure_before_first_token_returns_502(self, install_client):
+        """Test that an upstream error status is returned as an HTTP error."""
+        install_client(lambda request: httpx.Response(500))
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize/stream", json={"text": "Some text"})
+
+        assert response.status_code == 502
+
+    @pytest.mark.asyncio
+    async def test_disconnect_before_body_releases_slots(self, install_client):
+        """Test that a client leaving before reading the body frees its admission and scheduler slots."""
+        scheduler = FairScheduler(concurrency=4)
+        client = install_client(lambda request: httpx.Response(200, content=sse_body("one", " two")), scheduler=scheduler)
+        body = json.dumps({"text": "Some text"}).encode()
+        messages = [{"type": "http.request", "body": body, "more_body": False}, {"type": "http.disconnect"}]
+        response_started = asyncio.Event()
+
+        async def receive():
+            if len(messages) == 1:
+                # Hang up only once the response has started, before any body is read
+                await response_started.wait()
+            return messages.pop(0)
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response_started.set()
+                await asyncio.sleep(1)
+
+        scope = {
+            "type": "http", "method": "POST", "path": "/summarize/stream", "raw_path": b"/summarize/stream",
+            "query_string": b"", "headers": [(b"content-type", b"application/json")], "scheme": "http",
+            "server": ("test", 80), "client": ("test", 1234), "root_path": "", "http_version": "1.1",
+        }
+        await asyncio.wait_for(main.app(scope, receive, send), timeout=2)
+
+        # Checked right away: nothing is left for the garbage collector to release
+        assert scheduler.in_flight == 0
+        assert main.admission.in_flight == 0
+        await client.aclose()
@@ -0,0 +1,227 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.compaction import Compactor
+from app.metrics import PROMPT_TOKENS_SAVED
+from app.openrouter_client import OpenRouterClient
+from app.tokens import (
+    DEFAULT_ESTIMATOR,
+    ContextWindowExceeded,
+    TokenEstimator,
+    estimator_for,
+    register_estimator,
+    token_report,
+)
+from conftest import completion
+
+
+class RecordingUpstream:
+    """Mock upstream recording every payload it receives."""
+
+    def __init__(self):
+        self.payloads = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.payloads.append(json.loads(request.content))
+        return httpx.Response(200, json=completion("A short summary."))
+
+
+class TestTokenEstimator:
+    """Test suite for local token estimates."""
+
+    def test_counts_words_digits_and_symbols(self):
+        """Test that short words, digit groups and punctuation are counted like BPE pieces."""
+        estimator = TokenEstimator()
+        assert estimator.count("") == 0
+        assert estimator.count("The cat sat.") == 4
+        assert estimator.count("2024") == 2
+        assert estimator.count("internationalization") == 3
+
+    def test_other_scripts_cost_more_per_letter(self):
+        """Test that letters outside ASCII are counted higher than English words."""
+        estimator = TokenEstimator()
+        assert estimator.count("日本語のテキスト") == 8
+        assert estimator.count("Japanese") < estimator.count("日本語のテキスト")
+
+    def test_completion_tokens_follow_max_length(self):
+        """Test that max_tokens scales with the requested words plus headroom."""
+        estimator = TokenEstimator(tokens_per_word=1.5, completion_headroom=10)
+        assert estimator.completion_tokens(100) == 160
+        assert estimator.input_budget(100) < estimator.context_window - 160
+
+    def test_rejects_non_positive_parameters(self):
+        """Test that a zero context window is refused."""
+        with pytest.raises(ValueError):
+            TokenEstimator(context_window=0)
+
+    def test_longest_prefix_wins(self):
+        """Test that estimators are looked up per model family, most specific first."""
+        assert estimator_for("openai/gpt-3.5-turbo").context_window == 16_385
+        assert estimator_for("openai/gpt-4o").context_window == 128_000
+        assert estimator_for("unknown/model") is DEFAULT_ESTIMATOR
+
+        custom = TokenEstimator(context_window=4096)
+        register_estimator("test/small-", custom)
+        assert estimator_for("test/small-1") is custom
+
+
+class TestCompactor:
+    """Test suite for prompt compaction."""
+
+    def test_collapses_whitespace_but_keeps_paragraphs(self):
+        """Test that runs of spaces and blank lines shrink to one."""
+        text = "  First   line\t here.  \n\n\n\n  Second paragraph.  "
+        assert Compactor().compact(text) == "First line here.\n\nSecond paragraph."
+
+    def test_strips_html_and_markdown(self):
+        """Test that tags, scripts, entities and Markdown syntax leave only the text."""
+        text = (
+            "<html><head><style>p {color: red}</style></head><body>"
+            "<h1>Title</h1><p>Fish &amp; chips are <b>great</b>.</p><!-- note -->"
+            "<script>alert(1)</script></body></html>\n"
+            "## Section\n> A **bold** claim with [a link](https://example.com)."
+        )
+        compacted = Compactor().compact(text)
+        assert compacted == "Title\n\nFish & chips are great.\n\nSection\nA bold claim with a link."
+
+    def test_removes_repeated_boilerplate_lines(self):
+        """Test that lines repeating an earlier one are dropped, short ones kept."""
+        page = "Confidential - Example Corp\nPage body {}.\nYes.\n"
+        text = "".join(page.format(i) for i in range(3))
+        compacted = Compactor(dedupe_lines=True).compact(text)
+        assert compacted.count("Confidential") == 1
+        assert compacted.count("Yes.") == 3
+        assert "Page body 2." in compacted
+
+    def test_stages_can_be_disabled(self):
+        """Test that each stage only runs when enabled."""
+        text = "<b>bold</b>  text\nline repeated\nline repeated"
+        assert Compactor(strip_markup=False, dedupe_lines=False, collapse_whitespace=False).compact(text) == text
+        assert Compactor(strip_markup=False).compact(text) == "<b>bold</b> text\nline repeated\nline repeated"
+        assert Compactor(strip_markup=False, dedupe_lines=True).compact(text) == "<b>bold</b> text\nline repeated"
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "x<y and y>z",
+            "List<String> and Map<K, V>",
+            "Override __init__ and __repr__.",
+            "2**10**3 is a large number",
+            "arr[0](x) calls the first handler",
+        ],
+    )
+    def test_leaves_code_and_comparisons_alone(self, text):
+        """Test that text merely resembling markup is not changed."""
+        assert Compactor().compact(text) == text
+
+    def test_keeps_repeated_lines_by_default(self):
+        """Test that repeats in poems and logs survive unless deduplication is enabled."""
+        text = "Row, row, row your boat\nRow, row, row your boat\nERROR disk full\nERROR disk full"
+        assert Compactor().compact(text) == text
+
+    def test_compaction_is_idempotent(self):
+        """Test that compacting twice changes nothing more."""
+        compactor = Compactor()
+        once = compactor.compact("<p>A  &lt;b&gt;tag&lt;/b&gt;</p>\n\n\n<p>A  tag</p>")
+        assert compactor.compact(once) == once
+
+
+class TestClientBudgets:
+    """Test suite for token budgeting in OpenRouterClient."""
+
+    @pytest.mark.asyncio
+    async def test_max_tokens_comes_from_the_model_estimator(self):
+        """Test that max_tokens is sized by the model family's estimator."""
+        upstream = RecordingUpstream()
+        client = OpenRouterClient("key", "mistralai/mistral-small", transport=httpx.MockTransport(upstream))
+
+        await client.asummarize("Some text to summarize.", max_length=100)
+
+        assert upstream.payloads[0]["max_tokens"] == estimator_for("mistralai/").completion_tokens(100)
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_input_over_the_context_window_is_rejected_before_sending(self):
+        """Test that an input too long for the model never reaches the upstream."""
+        upstream = RecordingUpstream()
+        estimator = TokenEstimator(context_window=256)
+        client = OpenRouterClient("key", "test/model", estimator=estimator, transport=httpx.MockTransport(upstream))
+
+        with pytest.raises(ContextWindowExceeded) as exc_info:
+            await client.asummarize("word " * 300, max_length=50)
+
+        assert exc_info.value.context_window == 256
+        assert upstream.payloads == []
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_compacted_input_is_sent_and_savings_reported(self):
+        """Test that the compacted text goes upstream and the tokens saved are counted."""
+        upstream = RecordingUpstream()
+        client = OpenRouterClient(
+            "key", "test/compact", compactor=Compactor(dedupe_lines=True), transport=httpx.MockTransport(upstream)
+        )
+        text = "<div>Quarterly   report.</div>\n" + "Footer: all rights reserved.\n" * 5
+
+        with token_report() as report:
+            await client.asummarize(text, max_length=20)
+
+        prompt = upstream.payloads[0]["messages"][0]["content"]
+        assert prompt.endswith("Quarterly report.\n\nFooter: all rights reserved.")
+        assert report.saved > 0
+        assert PROMPT_TOKENS_SAVED.value("test/compact") == report.saved
+        await client.aclose()
+
+
+class TestSummarizeEndpointBudgets:
+    """Test suite for compaction and context limits on /summarize."""
+
+    def test_reports_tokens_saved_per_request(self, monkeypatch):
+        """Test that /summarize returns the tokens compaction removed in a header."""
+        upstream = RecordingUpstream()
+        client = OpenRouterClient("key", "test/model", compactor=Compactor(), transport=httpx.MockTransport(upstream))
+        monkeypatch.setattr(main, "openrouter_client", client)
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post(
+                "/summarize", json={"text": "<p>Hello   there,   reader.</p>\n\n\n\n<p>Hello there, reader.</p>"}
+            )
+
+        assert response.status_code == 200
+        assert int(response.headers["X-Prompt-Tokens-Saved"]) > 0
+        assert upstream.payloads[0]["messages"][0]["content"].endswith("\n\nHello there, reader.")
+
+    def test_long_input_is_chunked_to_fit_the_context_window(self, monkeypatch):
+        """Test that an input over the model's context is map-reduced, every call fitting it."""
+        upstream = RecordingUpstream()
+        estimator = TokenEstimator(context_window=1024)
+        client = OpenRouterClient("key", "test/model", estimator=estimator, transport=httpx.MockTransport(upstream))
+        monkeypatch.setattr(main, "openrouter_client", client)
+
+        text = " ".join(f"Sentence {i} is here." for i in range(300))
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": text, "max_length": 50})
+
+        assert response.status_code == 200
+        assert len(upstream.payloads) > 2
+        for payload in upstream.payloads:
+            prompt_tokens = estimator.prompt_tokens(payload["messages"][0]["content"])
+            assert prompt_tokens + payload["max_tokens"] <= estimator.context_window
+
+    def test_reply_that_cannot_fit_answers_413(self, monkeypatch):
+        """Test that a max_length the context window cannot hold is refused with 413, not sent."""
+        upstream = RecordingUpstream()
+        estimator = TokenEstimator(context_window=512)
+        client = OpenRouterClient("key", "test/model", estimator=estimator, transport=httpx.MockTransport(upstream))
+        monkeypatch.setattr(main, "openrouter_client", client)
+
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "A short text.", "max_length": 500})
+
+        assert response.status_code == 413
+        assert "context window" in response.json()["detail"]
+        assert upstream.payloads == []
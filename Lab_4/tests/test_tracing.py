@@ -0,0 +1,184 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app import tracing
+from app.openrouter_client import OpenRouterClient
+from app.tracing import SlowRequestProfiler, Trace, TraceHook, TracingMiddleware, span
+from conftest import completion
+
+
+class Recorder(TraceHook):
+    def __init__(self):
+        self.traces = []
+
+    def on_end(self, trace):
+        self.traces.append(trace)
+
+
+class FakeProfiler:
+    def __init__(self):
+        self.running = False
+        self.stopped = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        self.stopped = True
+
+
+def finished_trace(duration: float) -> Trace:
+    trace = Trace("id")
+    trace.ended = trace.started + duration
+    return trace
+
+
+class TestTrace:
+    """Test suite for spans and the Server-Timing summary."""
+
+    def test_server_timing_sums_repeated_spans(self):
+        """Test that spans of the same name (e.g. retries) are summed, in first-seen order."""
+        trace = Trace("id")
+        trace.add("upstream", 0.0, 0.010)
+        trace.add("parsing", 0.010, 0.011)
+        trace.add("upstream", 0.011, 0.031)
+        trace.finish()
+
+        value = trace.server_timing()
+        assert value.startswith("upstream;dur=30.0, parsing;dur=1.0, total;dur=")
+
+    def test_span_is_a_no_op_outside_a_request(self):
+        """Test that span() works without a current trace."""
+        assert tracing.current_trace() is None
+        with span("anything"):
+            pass
+
+    def test_spans_per_trace_are_bounded(self, monkeypatch):
+        """Test that spans beyond the cap are counted as dropped."""
+        monkeypatch.setattr(tracing, "MAX_SPANS", 2)
+        trace = Trace("id")
+        for _ in range(3):
+            trace.add("s", 0.0, 1.0)
+        assert len(trace.spans) == 2
+        assert trace.dropped == 1
+
+
+class TestSlowRequestProfiler:
+    """Test suite for profiling only the slowest requests."""
+
+    def test_only_the_slowest_percent_is_reported(self):
+        """Test that profiles are handed over only above the running percentile."""
+        reported = []
+        hook = SlowRequestProfiler(
+            FakeProfiler, lambda trace, profiler: reported.append(trace), slowest_percent=10, window=100, min_samples=100
+        )
+        for i in range(100):
+            trace = finished_trace(0.001 * (i + 1))
+            hook.on_start(trace)
+            hook.on_end(trace)
+        # No threshold until min_samples are in; then the slowest of them is kept
+        assert [trace.duration for trace in reported] == [pytest.approx(0.100)]
+        assert hook.threshold == pytest.approx(0.091)
+        reported.clear()
+
+        fast, slow = finished_trace(0.010), finished_trace(0.500)
+        for trace in (fast, slow):
+            hook.on_start(trace)
+            hook.on_end(trace)
+        assert reported == [slow]
+        assert hook.profiled == 102 and hook.reported == 2
+
+    def test_unsampled_requests_are_not_profiled(self):
+        """Test that sample_rate decides which requests run a profiler."""
+        profilers = []
+
+        def factory():
+            profilers.append(FakeProfiler())
+            return profilers[-1]
+
+        rolls = iter([0.9, 0.1])
+        hook = SlowRequestProfiler(factory, lambda trace, profiler: None, sample_rate=0.5, rng=lambda: next(rolls))
+        for _ in range(2):
+            trace = finished_trace(0.1)
+            hook.on_start(trace)
+            hook.on_end(trace)
+        assert len(profilers) == 1 and profilers[0].stopped
+
+    def test_parameters_are_validated(self):
+        """Test that out-of-range settings are rejected."""
+        with pytest.raises(ValueError):
+            SlowRequestProfiler(FakeProfiler, print, slowest_percent=0)
+        with pytest.raises(ValueError):
+            SlowRequestProfiler(FakeProfiler, print, sample_rate=2)
+
+
+class TestTracingMiddleware:
+    """Test suite for request ids, Server-Timing and hooks on the API."""
+
+    def test_request_id_is_echoed_and_sent_upstream(self, monkeypatch):
+        """Test that a caller's X-Request-ID reaches the upstream and comes back on the response."""
+        upstream_ids = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            upstream_ids.append(request.headers.get("X-Request-ID"))
+            return httpx.Response(200, json=completion("a summary"))
+
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=httpx.MockTransport(handler)))
+        with TestClient(main.app) as test_client:
+            response = test_client.post("/summarize", json={"text": "some text"}, headers={"X-Request-ID": "req-42"})
+            generated = test_client.get("/health")
+
+        assert response.headers["X-Request-ID"] == "req-42"
+        assert upstream_ids == ["req-42"]
+        assert len(generated.headers["X-Request-ID"]) == 32
+
+    def test_malformed_request_id_is_replaced(self):
+        """Test that an unsafe X-Request-ID is not echoed back."""
+        with TestClient(main.app) as test_client:
+            response = test_client.get("/health", headers={"X-Request-ID": "bad id\twith spaces"})
+        assert response.headers["X-Request-ID"] != "bad id\twith spaces"
+
+    def test_summarize_trace_has_a_span_per_phase(self, monkeypatch):
+        """Test that a hook sees validation, cache, prompt, upstream and parsing spans."""
+        recorder = Recorder()
+        main.trace_hooks.append(recorder)
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=completion("a summary")))
+        monkeypatch.setattr(main, "openrouter_client", OpenRouterClient("key", "test/model", transport=transport))
+        try:
+            with TestClient(main.app) as test_client:
+                test_client.post("/summarize", json={"text": "some text"})
+        finally:
+            main.trace_hooks.remove(recorder)
+
+        (trace,) = recorder.traces
+        names = [s.name for s in trace.spans]
+        for name in ("queueing", "validation", "cache", "prompt", "upstream", "parsing"):
+            assert name in names
+        assert trace.attributes["status"] == 200
+
+    def test_server_timing_header_and_failing_hooks(self):
+        """Test that Server-Timing lists the spans and a broken hook does not fail the request."""
+
+        class Broken(TraceHook):
+            def on_start(self, trace):
+                raise RuntimeError("boom")
+
+        app = FastAPI()
+
+        @app.get("/work")
+        async def work():
+            with span("db"):
+                pass
+            return {"ok": True}
+
+        app.add_middleware(TracingMiddleware, server_timing=True, hooks=[Broken()])
+        with TestClient(app) as test_client:
+            response = test_client.get("/work")
+
+        assert response.status_code == 200
+        assert response.headers["Server-Timing"].startswith("db;dur=")
+        assert "total;dur=" in response.headers["Server-Timing"]
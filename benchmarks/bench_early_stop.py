@@ -0,0 +1,63 @@
+"""Benchmark: latency saved by stopping generation at max_length words.
+
+Compares Lab_4 ``OpenRouterClient.asummarize`` against a local mock
+upstream with and without ``early_stop``. Run from the repository root:
+
+    python benchmarks/bench_early_stop.py --max-length 50 --reply-words 300
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Lab_4"))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.openrouter_client import OpenRouterClient  # noqa: E402
+from mock_openrouter import MockOpenRouter  # noqa: E402
+
+
+async def measure(early_stop: bool, args) -> dict:
+    upstream = MockOpenRouter(args.reply_words, args.token_delay_ms / 1000, args.first_token_ms / 1000)
+    client = OpenRouterClient("bench-key", "mock/model", transport=upstream.transport(), early_stop=early_stop)
+    latencies = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        result = await client.asummarize("benchmark document", args.max_length)
+        latencies.append((time.perf_counter() - started) * 1000)
+    await client.aclose()
+
+    return {
+        "mode": "early_stop" if early_stop else "full_reply",
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": statistics.median(latencies),
+        "tokens_per_call": upstream.tokens_sent / args.iterations,
+        "summary_words": len(result["summary"].split()),
+        "truncated": result["truncated"],
+    }
+
+
+async def main(args) -> None:
+    rows = [await measure(False, args), await measure(True, args)]
+    print(f"{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'tokens':>10}{'words':>8}  truncated")
+    for row in rows:
+        print(
+            f"{row['mode']:<12}{row['mean_ms']:>10.1f}{row['p50_ms']:>10.1f}"
+            f"{row['tokens_per_call']:>10.0f}{row['summary_words']:>8}  {row['truncated']}"
+        )
+    saved = rows[0]["mean_ms"] - rows[1]["mean_ms"]
+    print(f"\nearly stop saved {saved:.1f} ms per call ({saved / rows[0]['mean_ms']:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--max-length", type=int, default=50)
+    parser.add_argument("--reply-words", type=int, default=300)
+    parser.add_argument("--token-delay-ms", type=float, default=1.0)
+    parser.add_argument("--first-token-ms", type=float, default=20.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,244 @@
+"""Benchmark: throughput and tail latency at fixed concurrency levels.
+
+Drives Lab_4 ``POST /summarize`` (in-process, through the full ASGI app)
+and Lab_3 ``run_many_with_limit`` + ``OpenRouterClient.generate`` against
+a local mock upstream served over real HTTP, and reports throughput,
+p50/p95/p99 latency, errors and the upstream connections each run opened.
+Results are written as JSON so runs can be compared over time. Run from
+the repository root:
+
+    python benchmarks/bench_load.py --concurrency 1,8,32 --requests 200 \\
+        --latency lognormal:40:0.5 --error-rate 0.02 --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Lab_4"))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import app.main as lab4  # noqa: E402
+from app.cache import SummaryCache  # noqa: E402
+from app.openrouter_client import OpenRouterClient  # noqa: E402
+from Lab_3.apps import openrouter_client as lab3  # noqa: E402
+from Lab_3.apps.runner import run_many_with_limit  # noqa: E402
+from mock_openrouter import LatencyDistribution, MockOpenRouter, MockServer  # noqa: E402
+
+TARGETS = ("lab4", "lab3")
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class Recorder:
+    """Latency and outcome of every request in one run."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.statuses = {}
+
+    async def time(self, call: Callable[[], Awaitable[int]]) -> None:
+        started = time.perf_counter()
+        try:
+            status = await call()
+        except Exception as e:
+            status = type(e).__name__
+        self.latencies.append(time.perf_counter() - started)
+        if status != 200:
+            self.errors += 1
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+
+def make_upstream(args) -> MockOpenRouter:
+    return MockOpenRouter(
+        reply_words=args.reply_words,
+        token_delay_s=args.token_delay_ms / 1000,
+        latency=LatencyDistribution(args.latency),
+        error_rate=args.error_rate,
+        burst_every=args.burst_every,
+        burst_length=args.burst_length,
+        retry_after_s=args.retry_after,
+        seed=args.seed,
+    )
+
+
+async def run_lab4(server: MockServer, concurrency: int, args, recorder: Recorder) -> None:
+    client = OpenRouterClient(
+        "bench-key",
+        "mock/model",
+        base_url=server.url + "/api/v1",
+        early_stop=args.stream,
+        max_connections=max(concurrency, 1),
+        max_keepalive_connections=max(concurrency, 1),
+    )
+    lab4.openrouter_client = client
+    lab4.summary_cache = SummaryCache()
+    lab4.similarity_cache = None
+    await client.start()
+    pending = iter(range(args.requests))
+
+    async def worker(api: httpx.AsyncClient) -> None:
+        for i in pending:
+            # Distinct documents, so the caches and single-flight never short-circuit a call
+            body = {"text": f"benchmark document {i} " + "lorem ipsum " * 50, "max_length": args.max_length}
+
+            async def call() -> int:
+                return (await api.post("/summarize", json=body)).status_code
+
+            await recorder.time(call)
+
+    transport = httpx.ASGITransport(app=lab4.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://lab4", timeout=None) as api:
+        await asyncio.gather(*(worker(api) for _ in range(concurrency)))
+    await client.aclose()
+
+
+async def run_lab3(server: MockServer, concurrency: int, args, recorder: Recorder) -> None:
+    client = lab3.OpenRouterClient(
+        model="mock/model",
+        url=server.url + "/api/v1/chat/completions",
+        max_connections=max(concurrency, 1),
+        max_keepalive_connections=max(concurrency, 1),
+    )
+
+    async def generate(prompt: str) -> str:
+        async def call() -> int:
+            await client.generate(prompt)
+            return 200
+
+        # Failures are recorded, not raised, so one error doesn't cancel the run
+        await recorder.time(call)
+        return prompt
+
+    async with client:
+        prompts = [f"benchmark prompt {i}" for i in range(args.requests)]
+        await run_many_with_limit(generate, prompts, limit=concurrency)
+
+
+async def measure(target: str, concurrency: int, args) -> dict:
+    upstream = make_upstream(args)
+    recorder = Recorder()
+    async with MockServer(upstream) as server:
+        started = time.perf_counter()
+        if target == "lab4":
+            await run_lab4(server, concurrency, args, recorder)
+        else:
+            await run_lab3(server, concurrency, args, recorder)
+        duration = time.perf_counter() - started
+
+    ordered = sorted(recorder.latencies)
+    ok = len(ordered) - recorder.errors
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": len(ordered),
+        "ok": ok,
+        "errors": recorder.errors,
+        "statuses": recorder.statuses,
+        "duration_s": duration,
+        "throughput_rps": ok / duration if duration else 0.0,
+        "latency_ms": {
+            "mean": statistics.mean(ordered) * 1000 if ordered else 0.0,
+            "p50": percentile(ordered, 50) * 1000,
+            "p95": percentile(ordered, 95) * 1000,
+            "p99": percentile(ordered, 99) * 1000,
+            "max": ordered[-1] * 1000 if ordered else 0.0,
+        },
+        "upstream_requests": upstream.requests,
+        "upstream_statuses": {str(k): v for k, v in sorted(upstream.status_counts.items())},
+        "connections_opened": server.connections_opened,
+        "max_open_connections": server.max_open_connections,
+    }
+
+
+def print_table(rows: List[dict]) -> None:
+    print(
+        f"{'target':<7}{'conc':>5}{'ok':>6}{'err':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'upstream':>10}{'conns':>7}"
+    )
+    for row in rows:
+        latency = row["latency_ms"]
+        print(
+            f"{row['target']:<7}{row['concurrency']:>5}{row['ok']:>6}{row['errors']:>5}{row['throughput_rps']:>9.1f}"
+            f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+            f"{row['upstream_requests']:>10}{row['connections_opened']:>7}"
+        )
+
+
+async def main(args) -> None:
+    rows = []
+    for target in args.targets:
+        for concurrency in args.concurrency:
+            rows.append(await measure(target, concurrency, args))
+    print_table(rows)
+
+    if args.output:
+        report = {
+            "benchmark": "bench_load",
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "results": rows,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}")
+
+
+def _csv(kind: Callable[[str], object]) -> Callable[[str], list]:
+    return lambda value: [kind(v) for v in value.split(",") if v.strip()]
+
+
+def _targets(value: str) -> List[str]:
+    names = _csv(str)(value)
+    unknown = [n for n in names if n not in TARGETS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown target(s) {', '.join(unknown)}; choose from {', '.join(TARGETS)}")
+    return names
+
+
+def _latency(value: str) -> str:
+    try:
+        LatencyDistribution(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", type=_targets, default=list(TARGETS), help="comma-separated: lab4,lab3")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 8, 32], help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per target and level")
+    parser.add_argument("--latency", type=_latency, default="lognormal:40:0.5", help="time to first token, in ms")
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--token-delay-ms", type=float, default=0.1)
+    parser.add_argument("--max-length", type=int, default=50)
+    parser.add_argument("--stream", action="store_true", help="Lab_4 streams upstream replies (early_stop)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests failing with 500")
+    parser.add_argument("--burst-every", type=int, default=0, help="start a burst of 429s every N upstream requests")
+    parser.add_argument("--burst-length", type=int, default=0, help="upstream requests rejected per 429 burst")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Retry-After sent with 429s, in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json", help="JSON report path ('' to skip)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,241 @@
+"""Local mock of the OpenRouter chat-completions API for benchmarks.
+
+The mock "generates" a fixed number of words at a configurable per-token
+delay, so a full reply takes ``first_token_s + reply_words * token_delay_s``.
+Streaming requests get one SSE chunk per word; non-streaming requests get
+the whole completion once generation would have finished.
+
+Faults can be injected: the time to first token can follow a latency
+distribution, a share of requests can fail with a 5xx, and 429 responses
+can come in bursts. The mock is usable in-process as an httpx transport,
+or as a real HTTP/1.1 server on localhost (``MockServer``), which also
+counts the TCP connections clients open, so connection reuse can be
+measured.
+"""
+import asyncio
+import http
+import json
+import random
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+import httpx
+
+Body = Union[bytes, AsyncIterator[bytes]]
+
+
+class LatencyDistribution:
+    """
+    Samples a delay in seconds from a spec given in milliseconds.
+
+    Specs: ``fixed:MS``, ``uniform:LOW:HIGH``, ``normal:MEAN:STDDEV`` and
+    ``lognormal:MEDIAN:SIGMA`` (heavy-tailed, like real model latency).
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec: str):
+        kind, _, rest = spec.partition(":")
+        try:
+            params = [float(p) for p in rest.split(":")] if rest else []
+        except ValueError:
+            raise ValueError(f"invalid latency spec {spec!r}")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}.get(kind)
+        if expected is None or len(params) != expected:
+            raise ValueError(f"invalid latency spec {spec!r}; use one of {', '.join(self.KINDS)}")
+        self.spec = spec
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            ms = p[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            ms = rng.gauss(p[0], p[1])
+        else:
+            ms = p[0] * rng.lognormvariate(0.0, p[1])
+        return max(0.0, ms / 1000)
+
+
+class MockOpenRouter:
+    """In-process mock upstream exposed as an httpx transport."""
+
+    def __init__(
+        self,
+        reply_words: int = 300,
+        token_delay_s: float = 0.002,
+        first_token_s: float = 0.05,
+        latency: Optional[LatencyDistribution] = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        burst_every: int = 0,
+        burst_length: int = 0,
+        retry_after_s: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            reply_words: Words in every completion
+            token_delay_s: Delay per generated word
+            first_token_s: Time to first token (when no ``latency`` is given)
+            latency: Distribution of the time to first token
+            error_rate: Share of requests answered with ``error_status``
+            error_status: Status code of injected failures
+            burst_every: Start a burst of 429s every this many requests (0 disables)
+            burst_length: Requests rejected with 429 in each burst
+            retry_after_s: Retry-After sent with each 429
+            seed: Seed for latency and error sampling
+        """
+        self.reply_words = reply_words
+        self.token_delay_s = token_delay_s
+        self.first_token_s = first_token_s
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after_s = retry_after_s
+        self._rng = random.Random(seed)
+        self.requests = 0
+        self.tokens_sent = 0
+        self.status_counts: Dict[int, int] = {}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def words(self):
+        return [f"word{i}" for i in range(self.reply_words)]
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        status, headers, body = await self.respond(request.content)
+        return httpx.Response(status, content=body, headers=headers)
+
+    async def respond(self, content: bytes) -> Tuple[int, Dict[str, str], Body]:
+        """Answer one request body with (status, headers, body or chunk stream)."""
+        self.requests += 1
+        number = self.requests
+        payload = json.loads(content or b"{}")
+        first_token_s = self.latency.sample(self._rng) if self.latency is not None else self.first_token_s
+
+        if self.burst_every and (number - 1) % self.burst_every < self.burst_length:
+            return self._count(429, {"retry-after": f"{self.retry_after_s:g}"}, {"error": "rate limited"})
+        if self.error_rate and self._rng.random() < self.error_rate:
+            await asyncio.sleep(first_token_s)
+            return self._count(self.error_status, {}, {"error": "injected failure"})
+
+        if payload.get("stream"):
+            self.status_counts[200] = self.status_counts.get(200, 0) + 1
+            return 200, {"content-type": "text/event-stream"}, self._stream(first_token_s)
+
+        await asyncio.sleep(first_token_s + self.reply_words * self.token_delay_s)
+        self.tokens_sent += self.reply_words
+        content = " ".join(self.words())
+        # "text" serves clients that read the legacy completions shape
+        completion = {
+            "choices": [{"message": {"content": content}, "text": content}],
+            "usage": {"prompt_tokens": len(payload.get("input", "")) // 4, "completion_tokens": self.reply_words},
+        }
+        return self._count(200, {}, completion)
+
+    def _count(self, status: int, headers: Dict[str, str], data: dict) -> Tuple[int, Dict[str, str], bytes]:
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        return status, {"content-type": "application/json", **headers}, json.dumps(data).encode()
+
+    async def _stream(self, first_token_s: float):
+        await asyncio.sleep(first_token_s)
+        for i, word in enumerate(self.words()):
+            await asyncio.sleep(self.token_delay_s)
+            self.tokens_sent += 1
+            chunk = {"choices": [{"delta": {"content": word if i == 0 else " " + word}}]}
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+
+
+class MockServer:
+    """
+    Serves a MockOpenRouter over HTTP/1.1 on localhost.
+
+    Keep-alive is honoured and streamed replies use chunked encoding, so
+    clients behave as they would against the real API, connection pool
+    included. ``connections_opened`` counts accepted TCP connections.
+
+        async with MockServer(MockOpenRouter()) as server:
+            client = OpenRouterClient(..., base_url=server.url + "/api/v1")
+    """
+
+    def __init__(self, upstream: MockOpenRouter, host: str = "127.0.0.1", port: int = 0):
+        self.upstream = upstream
+        self.host = host
+        self.port = port
+        self.connections_opened = 0
+        self.open_connections = 0
+        self.max_open_connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def aclose(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "MockServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections_opened += 1
+        self.open_connections += 1
+        self.max_open_connections = max(self.max_open_connections, self.open_connections)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                content = await reader.readexactly(int(headers.get("content-length", "0")))
+
+                status, response_headers, body = await self.upstream.respond(content)
+                await self._write(writer, status, response_headers, body)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.open_connections -= 1
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], body: Body) -> None:
+        head = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        if isinstance(body, bytes):
+            head.append(f"content-length: {len(body)}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            return
+        head.append("transfer-encoding: chunked")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        async for chunk in body:
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
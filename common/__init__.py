@@ -0,0 +1,18 @@
+"""Building blocks shared by the Lab_3 client and the Lab_4 API.
+
+Both labs import these modules from here instead of keeping their own
+copies: deadlines, retries, rate limiting, circuit breaking, latency
+routing, fair scheduling, request coalescing, the SQLite cache and the
+metric primitives.
+"""
+__all__ = [
+    "breaker",
+    "deadline",
+    "metrics",
+    "ratelimit",
+    "retry",
+    "router",
+    "scheduler",
+    "singleflight",
+    "sqlite_cache",
+]
@@ -0,0 +1,165 @@
+"""Circuit breaker for upstream calls.
+
+The breaker watches a sliding window of recent calls. When enough of them
+fail, or are slower than ``slow_call_seconds``, it opens and rejects calls
+immediately with ``CircuitOpenError`` instead of letting each one wait out
+its timeout. After ``open_seconds`` it lets a few probe calls through
+(half-open); success closes it again, failure re-opens it.
+"""
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit breaker is open; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def _always_failure(_exc: BaseException) -> bool:
+    return True
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker driven by error rate and latency."""
+
+    def __init__(
+        self,
+        window_seconds: float = 30.0,
+        min_calls: int = 10,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[BaseException], bool] = _always_failure,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            window_seconds: How far back calls count towards the rates
+            min_calls: Calls needed in the window before the breaker may open
+            failure_rate_threshold: Failure fraction that opens the breaker
+            slow_call_seconds: Calls slower than this count as slow
+            slow_call_rate_threshold: Slow-call fraction that opens the breaker
+            open_seconds: How long to reject calls before probing again
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+            is_failure: Decides whether an exception counts against the upstream
+                (e.g. a 4xx caused by bad input should not)
+            clock: Monotonic time source (overridable in tests)
+        """
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+        self._clock = clock
+        # (finished_at, failed, slow)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def clone(self) -> "CircuitBreaker":
+        """A new, closed breaker with the same settings (e.g. for another upstream model)."""
+        return CircuitBreaker(
+            window_seconds=self.window_seconds,
+            min_calls=self.min_calls,
+            failure_rate_threshold=self.failure_rate_threshold,
+            slow_call_seconds=self.slow_call_seconds,
+            slow_call_rate_threshold=self.slow_call_rate_threshold,
+            open_seconds=self.open_seconds,
+            half_open_max_calls=self.half_open_max_calls,
+            is_failure=self.is_failure,
+            clock=self._clock,
+        )
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - self._clock())
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_max_calls):
+            self.rejected += 1
+            raise CircuitOpenError(self.retry_after() or self.open_seconds)
+        if state == HALF_OPEN:
+            self._probes += 1
+
+    def record(self, success: bool, latency: float) -> None:
+        """Record the outcome of an admitted call."""
+        now = self._clock()
+        slow = latency >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if success and not slow:
+                self._state = CLOSED
+                self._calls.clear()
+            else:
+                self._trip(now)
+            return
+
+        self._calls.append((now, not success, slow))
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+        if self._state == CLOSED and len(self._calls) >= self.min_calls:
+            failures = sum(1 for _, failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, _, was_slow in self._calls if was_slow)
+            if (
+                failures / len(self._calls) >= self.failure_rate_threshold
+                or slow_calls / len(self._calls) >= self.slow_call_rate_threshold
+            ):
+                self._trip(now)
+
+    def _trip(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.times_opened += 1
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wrap one upstream call: admit it, time it and record the outcome."""
+        self.before_call()
+        started = self._clock()
+        try:
+            yield
+        except Exception as exc:
+            self.record(not self.is_failure(exc), self._clock() - started)
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the upstream, but free the probe slot
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            raise
+        self.record(True, self._clock() - started)
+
+    def snapshot(self) -> dict:
+        state = self.state
+        return {
+            "state": state,
+            "retry_after": self.retry_after() if state == OPEN else 0.0,
+            "recent_calls": len(self._calls),
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,75 @@
+"""Deadlines that follow a request through retries, sleeps and sub-calls.
+
+A ``Deadline`` is an absolute point in time. ``deadline_scope`` makes it
+current for everything awaited inside the block, including tasks spawned
+from it, so retries, backoff sleeps and per-attempt timeouts all draw on
+the same remaining budget instead of each having a fixed timeout of their
+own. Nested scopes can only shorten the budget, never extend it.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional, Union
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when there is not enough time left to start or finish the work."""
+
+
+class Deadline:
+    """An absolute expiry time on a monotonic clock."""
+
+    def __init__(self, expires_at: float, clock: Callable[[], float] = time.monotonic):
+        self.expires_at = expires_at
+        self._clock = clock
+
+    @classmethod
+    def after(cls, seconds: float, clock: Callable[[], float] = time.monotonic) -> "Deadline":
+        return cls(clock() + seconds, clock)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self, needed: float = 0.0) -> None:
+        """Raise DeadlineExceeded unless more than ``needed`` seconds are left."""
+        remaining = self.remaining()
+        if remaining <= needed:
+            raise DeadlineExceeded(f"Deadline exceeded ({remaining:.3f}s left, {needed:.3f}s needed)")
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """The remaining budget as a timeout, capped at ``cap``; raises when spent."""
+        self.check()
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+
+_current: "ContextVar[Optional[Deadline]]" = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Union[None, float, Deadline]) -> Iterator[Optional[Deadline]]:
+    """
+    Make ``deadline`` (a Deadline, or a budget in seconds) current inside the block.
+
+    ``None`` keeps whatever deadline is already current.
+    """
+    if deadline is None:
+        yield _current.get()
+        return
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline.after(deadline)
+    outer = _current.get()
+    if outer is not None and outer.expires_at <= deadline.expires_at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
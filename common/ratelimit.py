@@ -0,0 +1,167 @@
+"""Client-side adaptive rate limiting for upstream LLM calls.
+
+A pair of token buckets (requests per second and, optionally, LLM tokens
+per minute) schedules calls instead of letting them hit the upstream and
+bounce off 429s. The request rate adapts AIMD-style: it creeps up while
+calls succeed and is cut multiplicatively on 429s, and ``Retry-After`` or
+exhausted rate-limit headers pause the limiter until the window resets.
+"""
+import asyncio
+import time
+from typing import Callable, Mapping, Optional
+
+
+class TokenBucket:
+    """A token bucket that lets callers reserve capacity ahead of time."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be > 0")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._last = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def set_rate(self, rate: float) -> None:
+        self._refill()
+        self.rate = rate
+
+    def reserve(self, amount: float) -> float:
+        """Take amount now (possibly going negative) and return the wait in seconds."""
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """Return unused capacity (or take more, if amount is negative)."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class AdaptiveRateLimiter:
+    """
+    Shared async limiter on requests/second and tokens/minute with AIMD control.
+
+    Call ``acquire(tokens)`` before each upstream request, then report the
+    outcome with ``on_success(headers)`` or ``on_rate_limited(retry_after,
+    headers)``. ``settle(reserved, actual)`` corrects the token bucket once
+    the real usage is known.
+    """
+
+    def __init__(
+        self,
+        max_rps: float = 20.0,
+        min_rps: float = 0.5,
+        tokens_per_minute: Optional[float] = None,
+        increase_per_second: float = 1.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+        burst: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_rps: Ceiling (and starting point) for the request rate
+            min_rps: Floor the rate is never cut below
+            tokens_per_minute: Optional LLM token budget per minute
+            increase_per_second: Additive increase per second of successful traffic
+            decrease_factor: Multiplier applied to the rate on a 429
+            decrease_cooldown: Minimum seconds between two decreases, so one
+                burst of 429s from the same window only cuts the rate once
+            burst: Seconds of traffic the request bucket may accumulate
+            clock: Monotonic time source (overridable in tests)
+        """
+        if not 0 < min_rps <= max_rps:
+            raise ValueError("require 0 < min_rps <= max_rps")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        self.max_rps = max_rps
+        self.min_rps = min_rps
+        self.increase_per_second = increase_per_second
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._clock = clock
+        self._requests = TokenBucket(max_rps, max(1.0, max_rps * burst), clock)
+        self._tokens = (
+            TokenBucket(tokens_per_minute / 60.0, tokens_per_minute, clock) if tokens_per_minute else None
+        )
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+
+    @property
+    def rps(self) -> float:
+        return self._requests.rate
+
+    def _set_rps(self, rps: float) -> None:
+        self._requests.set_rate(max(self.min_rps, min(self.max_rps, rps)))
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserve one request (and tokens) and return how long to wait before sending."""
+        delay = self._requests.reserve(1)
+        if self._tokens is not None and tokens:
+            delay = max(delay, self._tokens.reserve(tokens))
+        return max(delay, self._paused_until - self._clock())
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until a request estimated at ``tokens`` LLM tokens may be sent."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            self.throttled_seconds += delay
+            await asyncio.sleep(delay)
+
+    def settle(self, reserved: int, actual: int) -> None:
+        """Correct the token bucket with the usage reported by the upstream."""
+        if self._tokens is not None:
+            self._tokens.refund(reserved - actual)
+
+    def on_success(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Additive increase: about ``increase_per_second`` rps per second of success."""
+        self._set_rps(self.rps + self.increase_per_second / self.rps)
+        if headers is not None:
+            self._apply_headers(headers)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Multiplicative decrease, and pause for Retry-After if the upstream sent one."""
+        self.rate_limited += 1
+        now = self._clock()
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self._set_rps(self.rps * self.decrease_factor)
+            self._last_decrease = now
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if headers is not None:
+            self._apply_headers(headers)
+
+    def _apply_headers(self, headers: Mapping[str, str]) -> None:
+        """Pause until the window resets when X-RateLimit-Remaining hits zero."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            if int(float(remaining)) > 0:
+                return
+            reset_at = float(reset)
+        except ValueError:
+            return
+        # OpenRouter reports the reset as epoch milliseconds
+        if reset_at > 1e11:
+            reset_at /= 1000.0
+        wait = reset_at - time.time()
+        if wait > 0:
+            self._paused_until = max(self._paused_until, self._clock() + wait)
+
+    def stats(self) -> dict:
+        return {
+            "rps": self.rps,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": self.throttled_seconds,
+        }
@@ -0,0 +1,220 @@
+"""Retry utilities for calls to the upstream LLM API.
+
+One engine for sync and async callables: exponential backoff with full
+jitter, ``Retry-After`` support, a caller-supplied retryable predicate and
+an optional retry budget that caps retries at a fraction of base traffic.
+Both loops honour the current deadline (see ``deadline``): an attempt is
+not started, and a backoff sleep is not taken, when the remaining budget
+cannot cover it.
+"""
+import asyncio
+import inspect
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from common.deadline import current_deadline
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Return the server-requested delay carried by exc, if any."""
+    delay = getattr(exc, "retry_after", None)
+    if delay is not None:
+        return delay
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+class RetryBudget:
+    """
+    Cap retries at a fraction of base traffic.
+
+    Every first attempt deposits ``ratio`` tokens and every retry spends
+    one, so retries can never exceed ``ratio`` of requests. A small
+    time-based allowance (``min_per_second``) keeps low-traffic clients
+    able to retry at all. The budget starts full, allowing a burst of
+    ``max_tokens`` retries.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 10.0):
+        if ratio < 0 or min_per_second < 0:
+            raise ValueError("ratio and min_per_second must be >= 0")
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill()
+            self.requests += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry token; False means the budget is exhausted."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.retries += 1
+                return True
+            self.exhausted += 1
+            return False
+
+
+def _always(_exc: BaseException) -> bool:
+    return True
+
+
+class RetryPolicy:
+    """How many times to retry, which errors to retry, and how long to wait."""
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        retryable: Callable[[BaseException], bool] = _always,
+        budget: Optional[RetryBudget] = None,
+        max_retry_after: float = 60.0,
+        min_attempt_time: float = 0.0,
+    ):
+        """
+        ``min_attempt_time`` is the least remaining deadline budget worth
+        starting an attempt with; with less left the call fails fast.
+        """
+        if attempts < 1:
+            raise ValueError("attempts must be >= 1")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.budget = budget
+        self.max_retry_after = max_retry_after
+        self.min_attempt_time = min_attempt_time
+
+    def backoff(self, retry_number: int) -> float:
+        """Full-jitter exponential backoff: uniform in [0, min(max, base * 2**n)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry_number)))
+
+    def next_delay(self, retry_number: int, exc: BaseException) -> Optional[float]:
+        """
+        Return the delay before the next attempt, or None to stop retrying.
+
+        ``retry_number`` counts from 0 for the first retry.
+        """
+        if retry_number + 1 >= self.attempts or not self.retryable(exc):
+            return None
+        server_delay = retry_after_seconds(exc)
+        if server_delay is not None and server_delay > self.max_retry_after:
+            return None
+        if self.budget is not None and not self.budget.try_spend():
+            return None
+        if server_delay is not None:
+            return server_delay
+        return self.backoff(retry_number)
+
+
+def _out_of_time(deadline, delay: float, policy: RetryPolicy) -> bool:
+    """True when sleeping ``delay`` leaves too little budget for another attempt."""
+    return deadline is not None and deadline.remaining() - delay <= policy.min_attempt_time
+
+
+def call_with_retry(fn: Callable[..., Any], *args, policy: RetryPolicy, **kwargs) -> Any:
+    """Call fn, retrying according to policy and sleeping between attempts."""
+    deadline = current_deadline()
+    if policy.budget is not None:
+        policy.budget.record_request()
+    retry_number = 0
+    while True:
+        if deadline is not None:
+            deadline.check(policy.min_attempt_time)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as exc:
+            delay = policy.next_delay(retry_number, exc)
+            if delay is None or _out_of_time(deadline, delay, policy):
+                raise
+        time.sleep(delay)
+        retry_number += 1
+
+
+async def acall_with_retry(fn: Callable[..., Any], *args, policy: RetryPolicy, **kwargs) -> Any:
+    """Await fn, retrying according to policy without blocking the event loop."""
+    deadline = current_deadline()
+    if policy.budget is not None:
+        policy.budget.record_request()
+    retry_number = 0
+    while True:
+        if deadline is not None:
+            deadline.check(policy.min_attempt_time)
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as exc:
+            delay = policy.next_delay(retry_number, exc)
+            if delay is None or _out_of_time(deadline, delay, policy):
+                raise
+        await asyncio.sleep(delay)
+        retry_number += 1
+
+
+def retry(
+    attempts: int = 3,
+    delay: float = 1,
+    max_delay: float = 30.0,
+    retryable: Callable[[BaseException], bool] = _always,
+    budget: Optional[RetryBudget] = None,
+):
+    """Decorate a sync or async function with jittered exponential-backoff retries."""
+    policy = RetryPolicy(attempts, base_delay=delay, max_delay=max_delay, retryable=retryable, budget=budget)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await acall_with_retry(fn, *args, policy=policy, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return call_with_retry(fn, *args, policy=policy, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Kept for callers that import the async flavour by name
+retry_async = retry
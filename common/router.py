@@ -0,0 +1,224 @@
+"""Latency-aware routing over a pool of equivalent models or endpoints.
+
+Each target keeps an exponentially weighted moving average (EWMA) of its
+latency and error rate plus its current in-flight count. Calls are routed
+with power-of-two-choices: two healthy targets are sampled at random and
+the one with the lower load-weighted cost wins, which spreads load without
+herding everyone onto the single fastest target. Targets that keep failing
+are ejected for a while and re-probed in the background before they get
+real traffic again.
+"""
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+class TargetStats:
+    """Health and load of one routing target."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.ejected_until: Optional[float] = None
+        self.ejections = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "ejected": self.ejected_until is not None,
+        }
+
+
+class LatencyRouter:
+    """
+    Power-of-two-choices router with EWMA health tracking and ejection.
+
+    Wrap each upstream attempt in ``track(target)`` so its latency and
+    outcome are recorded. ``start()`` launches the background re-probe loop;
+    without it, ejected targets are let back in passively once their
+    ejection period has passed.
+    """
+
+    def __init__(
+        self,
+        targets: Sequence[str],
+        alpha: float = 0.3,
+        eject_error_rate: float = 0.5,
+        eject_consecutive_failures: int = 5,
+        min_calls: int = 5,
+        eject_seconds: float = 30.0,
+        max_eject_seconds: float = 300.0,
+        max_ejected_fraction: float = 0.5,
+        probe: Optional[Callable[[str], Awaitable[object]]] = None,
+        probe_interval: float = 5.0,
+        is_failure: Callable[[BaseException], bool] = lambda exc: True,
+        rng: Optional[random.Random] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            targets: Equivalent models or endpoints, in order of preference
+            alpha: EWMA weight of the newest sample (0 < alpha <= 1)
+            eject_error_rate: Error-rate EWMA that ejects a target
+            eject_consecutive_failures: Back-to-back failures that eject a target
+            min_calls: Calls needed before the error rate may eject a target
+            eject_seconds: First ejection period; doubles on each re-ejection
+            max_eject_seconds: Cap on the ejection period
+            max_ejected_fraction: Never eject more than this share of the pool
+            probe: Async health check run against ejected targets
+            probe_interval: Seconds between background probe sweeps
+            is_failure: Decides whether an exception counts against the target
+            rng: Random source for the two choices (overridable in tests)
+            clock: Monotonic time source (overridable in tests)
+        """
+        names = [t.strip() for t in targets if t and t.strip()]
+        if not names:
+            raise ValueError("at least one target is required")
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.eject_error_rate = eject_error_rate
+        self.eject_consecutive_failures = eject_consecutive_failures
+        self.min_calls = min_calls
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.max_ejected_fraction = max_ejected_fraction
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.is_failure = is_failure
+        self._rng = rng or random.Random()
+        self._clock = clock
+        self._stats: Dict[str, TargetStats] = {name: TargetStats(name) for name in dict.fromkeys(names)}
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def targets(self) -> List[str]:
+        return list(self._stats)
+
+    def _cost(self, stats: TargetStats) -> float:
+        # Unknown latency is optimistic so new targets get sampled; in-flight
+        # calls and errors make a target look proportionally slower
+        latency = stats.latency or 1e-3
+        return latency * (stats.in_flight + 1) / max(0.05, 1.0 - stats.error_rate)
+
+    def _healthy(self, exclude: Sequence[str] = ()) -> List[TargetStats]:
+        now = self._clock()
+        healthy = []
+        for stats in self._stats.values():
+            if stats.name in exclude:
+                continue
+            if stats.ejected_until is not None and self._probe_task is None and now >= stats.ejected_until:
+                # Nobody is probing: let it back in and judge it on live traffic
+                self._reinstate(stats)
+            if stats.ejected_until is None:
+                healthy.append(stats)
+        return healthy
+
+    def pick(self, exclude: Sequence[str] = ()) -> str:
+        """Choose a target with power-of-two-choices among healthy targets."""
+        candidates = self._healthy(exclude)
+        if not candidates:
+            # Fail open: the least recently ejected target beats no target at all
+            pool = [s for s in self._stats.values() if s.name not in exclude] or list(self._stats.values())
+            return min(pool, key=lambda s: s.ejected_until or 0.0).name
+        if len(candidates) == 1:
+            return candidates[0].name
+        first, second = self._rng.sample(candidates, 2)
+        return (first if self._cost(first) <= self._cost(second) else second).name
+
+    def order(self) -> List[str]:
+        """Every target, best first: repeated picks without replacement."""
+        ordered: List[str] = []
+        while len(ordered) < len(self._stats):
+            ordered.append(self.pick(exclude=ordered))
+        return ordered
+
+    def record(self, target: str, success: bool, latency: float) -> None:
+        """Fold one finished call into the target's EWMAs and eject it if unhealthy."""
+        stats = self._stats[target]
+        stats.calls += 1
+        stats.latency = latency if stats.calls == 1 else stats.latency + self.alpha * (latency - stats.latency)
+        stats.error_rate += self.alpha * ((0.0 if success else 1.0) - stats.error_rate)
+        stats.consecutive_failures = 0 if success else stats.consecutive_failures + 1
+        if success or stats.ejected_until is not None:
+            return
+        if stats.consecutive_failures >= self.eject_consecutive_failures or (
+            stats.calls >= self.min_calls and stats.error_rate >= self.eject_error_rate
+        ):
+            self._eject(stats)
+
+    def _eject(self, stats: TargetStats) -> None:
+        ejected = sum(1 for s in self._stats.values() if s.ejected_until is not None)
+        if ejected + 1 > self.max_ejected_fraction * len(self._stats):
+            return
+        period = min(self.max_eject_seconds, self.eject_seconds * (2 ** stats.ejections))
+        stats.ejections += 1
+        stats.ejected_until = self._clock() + period
+
+    def _reinstate(self, stats: TargetStats) -> None:
+        stats.ejected_until = None
+        stats.error_rate = 0.0
+        stats.consecutive_failures = 0
+
+    @contextmanager
+    def track(self, target: str) -> Iterator[None]:
+        """Wrap one call to target: count it in flight and record its outcome."""
+        stats = self._stats[target]
+        stats.in_flight += 1
+        started = self._clock()
+        try:
+            yield
+        except Exception as exc:
+            self.record(target, not self.is_failure(exc), self._clock() - started)
+            raise
+        finally:
+            stats.in_flight -= 1
+        self.record(target, True, self._clock() - started)
+
+    async def probe_ejected(self) -> None:
+        """Probe every target whose ejection period is over; reinstate the healthy ones."""
+        now = self._clock()
+        due = [s for s in self._stats.values() if s.ejected_until is not None and now >= s.ejected_until]
+        for stats in due:
+            try:
+                await self.probe(stats.name)
+            except Exception:
+                stats.ejected_until = None
+                self._eject(stats)
+                if stats.ejected_until is None:
+                    # Ejection cap reached meanwhile; keep it out for one more period
+                    stats.ejected_until = self._clock() + self.eject_seconds
+            else:
+                self._reinstate(stats)
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.probe_ejected()
+
+    def start(self) -> None:
+        """Start re-probing ejected targets in the background (needs a running loop)."""
+        if self.probe is not None and self._probe_task is None:
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+
+    async def aclose(self) -> None:
+        """Stop the background probe loop."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def snapshot(self) -> dict:
+        return {name: stats.snapshot() for name, stats in self._stats.items()}
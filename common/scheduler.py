@@ -0,0 +1,262 @@
+"""Priority classes and weighted fair queuing over one concurrency budget.
+
+Every upstream call takes a slot from a shared budget. When the budget is
+used up, callers queue by priority class (e.g. interactive before batch),
+and within a class by weighted fair queuing across tenants: each request
+gets a virtual finish tag of ``start + cost / weight``, and the smallest tag
+goes next. A tenant with twice the weight gets twice the share of slots,
+and a tenant flooding the queue only delays itself. Each tenant waits in
+its own FIFO queue and only its head carries a tag, so a tenant is charged
+when a slot is granted: requests cancelled or timed out while waiting
+(e.g. shed by admission) cost it nothing. Preemption happens at
+dispatch time: a freed slot always goes to the highest waiting class, but a
+running request is never interrupted.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+# (priority class, tenant) of the work running in the current task
+_current: "ContextVar[Optional[Tuple[Optional[str], Optional[str]]]]" = ContextVar("schedule", default=None)
+
+DEFAULT_TENANT = "default"
+
+
+@contextmanager
+def schedule_as(priority: Optional[str] = None, tenant: Optional[str] = None) -> Iterator[None]:
+    """Label upstream calls made inside this block (and tasks it spawns)."""
+    token = _current.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_priority() -> Optional[str]:
+    """Priority class set by the innermost ``schedule_as`` (None when unlabeled)."""
+    labels = _current.get()
+    return labels[0] if labels is not None else None
+
+
+class _ClassStats:
+    def __init__(self, window: int):
+        self.queued = 0
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def record(self, wait: float) -> None:
+        self.dispatched += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent.append(wait)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.recent)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        return {
+            "queued": self.queued,
+            "dispatched": self.dispatched,
+            "mean_wait": self.total_wait / self.dispatched if self.dispatched else 0.0,
+            "p95_wait": p95,
+            "max_wait": self.max_wait,
+        }
+
+
+class FairScheduler:
+    """
+    Shared concurrency budget with strict priority classes and per-tenant WFQ.
+
+    Use ``async with scheduler.slot(priority, tenant):`` around each
+    upstream call, or ``scheduler.wrap(fn, ...)`` to schedule a whole
+    runner job. Without explicit arguments, ``slot`` uses the labels set by
+    ``schedule_as`` and falls back to ``default_class`` and ``DEFAULT_TENANT``.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        classes: Sequence[str] = ("interactive", "batch"),
+        weights: Optional[Mapping[str, float]] = None,
+        default_weight: float = 1.0,
+        default_class: Optional[str] = None,
+        wait_window: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            concurrency: Global number of calls allowed in flight
+            classes: Priority classes, highest priority first
+            weights: Fair-share weight per tenant (e.g. per API key)
+            default_weight: Weight of tenants not listed in ``weights``
+            default_class: Class for unlabeled calls (defaults to the first)
+            wait_window: Recent queue waits kept per class for the p95
+            clock: Monotonic time source (overridable in tests)
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        if not classes:
+            raise ValueError("at least one priority class is required")
+        if default_weight <= 0 or any(w <= 0 for w in (weights or {}).values()):
+            raise ValueError("weights must be > 0")
+        self.concurrency = concurrency
+        self.classes = list(classes)
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self.default_class = default_class or self.classes[0]
+        if self.default_class not in self.classes:
+            raise ValueError(f"unknown default class {self.default_class!r}")
+        self._clock = clock
+        self._in_flight = 0
+        self._seq = itertools.count()
+        # Per class: heap of the head of each waiting tenant's queue,
+        # (finish_tag, seq, start_tag, tenant, enqueued_at, future)
+        self._queues: Dict[str, List[tuple]] = {c: [] for c in self.classes}
+        # Per (class, tenant): FIFO of (cost, enqueued_at, future) still waiting
+        self._flows: Dict[Tuple[str, str], Deque[Tuple[float, float, "asyncio.Future[None]"]]] = {}
+        self._virtual: Dict[str, float] = {c: 0.0 for c in self.classes}
+        self._last_finish: Dict[Tuple[str, str], float] = {}
+        self._stats: Dict[str, _ClassStats] = {c: _ClassStats(wait_window) for c in self.classes}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _resolve(self, priority: Optional[str], tenant: Optional[str]) -> Tuple[str, str]:
+        ctx_priority, ctx_tenant = _current.get() or (None, None)
+        priority = priority or ctx_priority or self.default_class
+        if priority not in self._queues:
+            raise ValueError(f"unknown priority class {priority!r}")
+        return priority, tenant or ctx_tenant or DEFAULT_TENANT
+
+    async def acquire(self, priority: Optional[str] = None, tenant: Optional[str] = None, cost: float = 1.0) -> None:
+        """Wait for a slot; higher classes and under-served tenants go first."""
+        priority, tenant = self._resolve(priority, tenant)
+        stats = self._stats[priority]
+        if self._in_flight < self.concurrency:
+            # A free slot means nobody is waiting (release hands slots out eagerly)
+            self._in_flight += 1
+            stats.record(0.0)
+            return
+
+        key = (priority, tenant)
+        future = asyncio.get_running_loop().create_future()
+        flow = self._flows.setdefault(key, deque())
+        flow.append((cost, self._clock(), future))
+        if len(flow) == 1:
+            self._push_head(key)
+        stats.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot on
+                self.release()
+            else:
+                stats.queued -= 1
+                self._withdraw(key, future)
+            raise
+
+    def _push_head(self, key: Tuple[str, str]) -> None:
+        """Tag the first waiter of a tenant's queue and offer it to its class."""
+        priority, tenant = key
+        cost, enqueued_at, future = self._flows[key][0]
+        start = max(self._virtual[priority], self._last_finish.get(key, 0.0))
+        finish = start + cost / self.weights.get(tenant, self.default_weight)
+        heapq.heappush(self._queues[priority], (finish, next(self._seq), start, tenant, enqueued_at, future))
+
+    def _withdraw(self, key: Tuple[str, str], future: "asyncio.Future[None]") -> None:
+        """Drop a waiter that left; its tenant is not charged for it."""
+        flow = self._flows[key]
+        if flow[0][2] is future:
+            # Its heap entry is skipped as done; the next waiter takes its place
+            flow.popleft()
+            if flow:
+                self._push_head(key)
+        else:
+            flow.remove(next(entry for entry in flow if entry[2] is future))
+        if not flow:
+            del self._flows[key]
+
+    def release(self) -> None:
+        """Free a slot and dispatch the next waiter, if any."""
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.concurrency:
+            entry = self._pop()
+            if entry is None:
+                return
+            priority, (finish, _, start, tenant, enqueued_at, future) = entry
+            key = (priority, tenant)
+            self._virtual[priority] = max(self._virtual[priority], start)
+            # Charged now that the slot is granted
+            self._last_finish[key] = finish
+            flow = self._flows[key]
+            flow.popleft()
+            if flow:
+                self._push_head(key)
+            else:
+                del self._flows[key]
+            self._forget_caught_up()
+            stats = self._stats[priority]
+            stats.queued -= 1
+            stats.record(self._clock() - enqueued_at)
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _forget_caught_up(self) -> None:
+        # Idle tenants whose share is used up to their class's virtual time
+        # start afresh anyway; forget them (in batches) so they don't accumulate
+        if len(self._last_finish) > 2 * len(self._flows) + 64:
+            caught_up = [
+                key
+                for key, finish in self._last_finish.items()
+                if finish <= self._virtual[key[0]] and key not in self._flows
+            ]
+            for key in caught_up:
+                del self._last_finish[key]
+
+    def _pop(self) -> Optional[Tuple[str, tuple]]:
+        for priority in self.classes:
+            queue = self._queues[priority]
+            while queue:
+                entry = heapq.heappop(queue)
+                if not entry[-1].done():
+                    return priority, entry
+        return None
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Optional[str] = None, tenant: Optional[str] = None, cost: float = 1.0
+    ) -> AsyncIterator[None]:
+        """Hold one slot of the budget for the duration of the block."""
+        await self.acquire(priority, tenant, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def wrap(
+        self, fn: Callable[..., Awaitable[Any]], priority: Optional[str] = None, tenant: Optional[str] = None
+    ) -> Callable[..., Awaitable[Any]]:
+        """Return fn with every call scheduled under the given class and tenant."""
+        async def scheduled(*args, **kwargs):
+            async with self.slot(priority, tenant):
+                return await fn(*args, **kwargs)
+
+        return scheduled
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self._in_flight,
+            "classes": {name: stats.snapshot() for name, stats in self._stats.items()},
+        }
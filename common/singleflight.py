@@ -0,0 +1,76 @@
+"""Request coalescing: concurrent calls with the same key share one upstream call."""
+import asyncio
+import contextvars
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from common.deadline import DeadlineExceeded, current_deadline
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent async calls by key.
+
+    The first caller for a key starts ``fn()`` as a task; callers arriving
+    while it runs await the same task. Results and exceptions are delivered
+    to every waiter. A waiter that is cancelled (e.g. its client hung up)
+    only stops waiting; the shared call keeps running for the others and
+    is cancelled only when the last waiter leaves.
+
+    The shared call runs in a fresh ``contextvars.Context``, not in the
+    first caller's: that caller's deadline, priority class and tenant are
+    not the other waiters'. Each waiter's own deadline bounds only its wait.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self.started = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn()`` for key, or join the call already in flight for it."""
+        task = self._calls.get(key)
+        if task is None:
+            task = contextvars.Context().run(asyncio.ensure_future, fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.started += 1
+        else:
+            self.shared += 1
+
+        self._waiters[key] += 1
+        try:
+            return await self._wait(task)
+        except (asyncio.CancelledError, DeadlineExceeded):
+            if not task.done() and self._waiters.get(key) == 1:
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    @staticmethod
+    async def _wait(task: "asyncio.Future[T]") -> T:
+        deadline = current_deadline()
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), deadline.timeout())
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            raise DeadlineExceeded("Deadline exceeded while waiting for a shared call") from None
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        # Mark the exception as retrieved when every waiter has already left
+        if not task.cancelled():
+            task.exception()
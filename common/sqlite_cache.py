@@ -0,0 +1,246 @@
+"""Persistent cache shared by every process on a host, backed by SQLite.
+
+Entries live in one local SQLite file in WAL mode, so any number of worker
+processes can read concurrently while one writes, and the cache survives
+restarts. Keys are SHA-256 digests of the request content; values are
+compact JSON, zlib-compressed when that makes them smaller. Each entry has
+a TTL on the wall clock (monotonic clocks do not carry across processes),
+and the file is kept under an entry and byte bound by evicting the least
+recently used entries. Running totals are kept in a one-row table by
+triggers, so checking the bounds never scans the cache.
+
+A cache must never take the caller down with it: database errors are
+counted and treated as misses (or dropped writes).
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+# Values shorter than this are not worth a compression attempt
+_COMPRESS_MIN = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+
+def content_key(*parts: Any) -> bytes:
+    """SHA-256 digest of the parts; equal content gives equal keys in every process."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.digest()
+
+
+def encode_value(value: Any) -> bytes:
+    """Compact JSON, compressed with zlib when that saves space."""
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) >= _COMPRESS_MIN:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return _ZLIB + packed
+    return _RAW + raw
+
+
+def decode_value(blob: bytes) -> Any:
+    tag, body = blob[:1], blob[1:]
+    if tag == _ZLIB:
+        body = zlib.decompress(body)
+    return json.loads(body.decode("utf-8"))
+
+
+class SQLiteCache:
+    """
+    Size-bounded LRU + TTL cache of JSON values in a shared SQLite file.
+
+    ``get`` is a short read through the memory map (well under a
+    millisecond on a warm page cache), so it is called inline from async
+    code. A write can wait up to ``busy_timeout`` for another process's lock
+    and may evict, so async code stores through ``aset``, which runs ``set``
+    on a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 24 * 3600.0,
+        touch_interval: float = 60.0,
+        busy_timeout: float = 0.1,
+        mmap_bytes: int = 64 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: SQLite file shared by the processes (":memory:" for a private cache)
+            max_entries: Maximum number of stored values
+            max_bytes: Maximum total size of the encoded values
+            ttl_seconds: How long a value stays valid after it is stored
+            touch_interval: Least time between access-time updates of one
+                entry, so hot reads rarely turn into writes
+            busy_timeout: Seconds to wait for another process's write lock;
+                a write that cannot get it in time is dropped (WAL readers
+                never wait)
+            mmap_bytes: Size of the memory-mapped read window (0 disables it)
+            clock: Wall-clock time source (overridable in tests)
+
+        Raises:
+            ValueError: If a limit is not positive
+        """
+        if max_entries <= 0 or max_bytes <= 0 or ttl_seconds <= 0:
+            raise ValueError("Cache limits must be positive")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.touch_interval = touch_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Autocommit; writes open their own IMMEDIATE transaction
+        self._db = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL never corrupts; at worst a crash loses the last writes
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self._db.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._totals()[0]
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return the value stored under key, or None if absent, expired or unreadable."""
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                now = self._clock()
+                if row is not None and row[1] <= now:
+                    self._db.execute("DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now))
+                    self.expirations += 1
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                if now - row[2] >= self.touch_interval:
+                    try:
+                        self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                    except sqlite3.OperationalError:
+                        pass  # Another process holds the write lock; recency is best-effort
+            value = decode_value(row[0])
+        except (sqlite3.Error, ValueError, zlib.error):
+            self.errors += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: bytes, value: Any) -> None:
+        """Store value under key, evicting expired, then least recently used, entries."""
+        blob = encode_value(value)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            with self._lock:
+                now = self._clock()
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.execute(
+                        "INSERT INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                        "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                        (key, blob, len(blob), now + self.ttl_seconds, now),
+                    )
+                    self._evict(now)
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error:
+            self.errors += 1
+
+    async def aset(self, key: bytes, value: Any) -> None:
+        """``set`` on a worker thread, so waiting for the write lock never stalls the event loop."""
+        await asyncio.to_thread(self.set, key, value)
+
+    def _evict(self, now: float) -> None:
+        entries, size = self._totals()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+        expired = self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+        self.expirations += max(0, expired)
+        entries, size = self._totals()
+        while entries > self.max_entries or size > self.max_bytes:
+            # Drop the whole entry-count excess at once; bytes are trimmed oldest first
+            batch = entries - self.max_entries if entries > self.max_entries else 1
+            removed = self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)", (batch,)
+            ).rowcount
+            if removed <= 0:
+                break
+            self.evictions += removed
+            entries, size = self._totals()
+
+    def _totals(self):
+        return self._db.execute("SELECT entries, bytes FROM totals WHERE id = 0").fetchone()
+
+    def clear(self) -> None:
+        """Drop every entry for all processes; counters are kept."""
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        """Shared size of the cache plus this process's hit/miss/eviction counters."""
+        with self._lock:
+            entries, size = self._totals()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+        }
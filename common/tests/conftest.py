@@ -0,0 +1,17 @@
+import pytest
+
+
+class FakeClock:
+    """Clock that only moves when a test sets or advances ``now``."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at zero."""
+    return FakeClock()
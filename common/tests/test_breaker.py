@@ -0,0 +1,46 @@
+import pytest
+
+from common.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def test_opens_on_failure_rate_and_rejects_fast(clock):
+    breaker = CircuitBreaker(min_calls=4, failure_rate_threshold=0.5, open_seconds=10, clock=clock)
+    for ok in (True, False, True, False):
+        breaker.record(ok, latency=0.1)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == 10
+
+
+def test_opens_on_slow_calls(clock):
+    breaker = CircuitBreaker(min_calls=3, slow_call_seconds=1.0, slow_call_rate_threshold=0.6, clock=clock)
+    for latency in (2.0, 2.0, 0.1):
+        breaker.record(True, latency)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    breaker = CircuitBreaker(min_calls=1, open_seconds=5, clock=clock)
+    breaker.record(False, 0.1)
+    clock.now = 5
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    clock.now = 10
+    breaker.before_call()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_guard_ignores_errors_that_are_not_failures():
+    breaker = CircuitBreaker(min_calls=1, is_failure=lambda exc: not isinstance(exc, KeyError))
+    with pytest.raises(KeyError):
+        with breaker.guard():
+            raise KeyError("bad input")
+    assert breaker.state == CLOSED
@@ -0,0 +1,55 @@
+import pytest
+
+from common.deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from common.retry import RetryPolicy, acall_with_retry
+
+
+def test_deadline_remaining_and_check(clock):
+    deadline = Deadline.after(2.0, clock)
+    assert deadline.timeout(cap=5.0) == 2.0
+    clock.now = 1.5
+    assert deadline.timeout(cap=0.2) == 0.2
+    with pytest.raises(DeadlineExceeded):
+        deadline.check(needed=1.0)
+    clock.now = 3.0
+    assert deadline.expired()
+
+
+def test_nested_scope_only_shortens():
+    with deadline_scope(10.0) as outer:
+        with deadline_scope(60.0) as inner:
+            assert inner is outer
+        with deadline_scope(1.0) as shorter:
+            assert shorter.expires_at < outer.expires_at
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+@pytest.mark.asyncio
+async def test_retry_skips_backoff_that_would_overrun_deadline():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        raise RuntimeError("transient")
+
+    policy = RetryPolicy(attempts=5, base_delay=10.0, max_delay=10.0)
+    policy.backoff = lambda retry_number: 5.0
+    with deadline_scope(1.0):
+        with pytest.raises(RuntimeError):
+            await acall_with_retry(fail, policy=policy)
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_attempt_is_not_started_without_enough_budget():
+    calls = []
+
+    async def work():
+        calls.append(1)
+
+    policy = RetryPolicy(min_attempt_time=0.5)
+    with deadline_scope(0.1):
+        with pytest.raises(DeadlineExceeded):
+            await acall_with_retry(work, policy=policy)
+    assert calls == []
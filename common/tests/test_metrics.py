@@ -0,0 +1,34 @@
+import pytest
+
+from common.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_histogram_buckets_are_cumulative_when_exposed():
+    registry = Registry()
+    histogram = Histogram("latency_seconds", "Latency", ["phase"], buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels("upstream").observe(value)
+
+    lines = registry.expose().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{phase="upstream",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{phase="upstream",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{phase="upstream",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{phase="upstream"} 4' in lines
+
+
+def test_counters_gauges_and_label_checks():
+    registry = Registry()
+    counter = Counter("calls_total", "Calls", ["status"], registry=registry)
+    gauge = Gauge("load", "Load", registry=registry)
+    counter.labels(200).inc()
+    counter.labels("200").inc(2)
+    gauge.set_function(lambda: 0.5)
+
+    assert counter.value(200) == 3.0
+    assert 'calls_total{status="200"} 3.0' in registry.expose()
+    assert "load 0.5" in registry.expose()
+    with pytest.raises(ValueError):
+        counter.labels()
+    with pytest.raises(ValueError):
+        Counter("calls_total", "Duplicate", registry=registry)
@@ -0,0 +1,47 @@
+import pytest
+
+from common.ratelimit import AdaptiveRateLimiter, TokenBucket
+
+
+def test_token_bucket_schedules_after_capacity(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=clock)
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(1) == pytest.approx(0.5)
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_rate_limited_halves_rate_once_per_cooldown(clock):
+    limiter = AdaptiveRateLimiter(max_rps=10, min_rps=1, decrease_cooldown=1.0, clock=clock)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.rps == 5
+    clock.now = 1.5
+    limiter.on_rate_limited()
+    assert limiter.rps == 2.5
+
+
+def test_success_increases_rate_additively_up_to_ceiling(clock):
+    limiter = AdaptiveRateLimiter(max_rps=10, min_rps=1, increase_per_second=1.0, clock=clock)
+    limiter.on_rate_limited()
+    for _ in range(5):
+        limiter.on_success()
+    assert 5 < limiter.rps < 6
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.rps == 10
+
+
+def test_retry_after_pauses_limiter(clock):
+    limiter = AdaptiveRateLimiter(max_rps=100, clock=clock)
+    limiter.on_rate_limited(retry_after=3.0)
+    assert limiter.reserve() == pytest.approx(3.0)
+
+
+def test_tokens_per_minute_budget_is_enforced_and_settled(clock):
+    limiter = AdaptiveRateLimiter(max_rps=100, tokens_per_minute=600, clock=clock)
+    assert limiter.reserve(600) == 0
+    # The bucket refills at 10 tokens/second
+    assert limiter.reserve(100) == pytest.approx(10.0)
+    limiter.settle(reserved=700, actual=100)
+    assert limiter.reserve(100) == 0
@@ -0,0 +1,98 @@
+import httpx
+import pytest
+
+from common.retry import (
+    RetryBudget,
+    RetryPolicy,
+    acall_with_retry,
+    call_with_retry,
+    parse_retry_after,
+    retry,
+)
+
+
+def rate_limited(retry_after: str) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://example.test")
+    response = httpx.Response(429, headers={"Retry-After": retry_after}, request=request)
+    return httpx.HTTPStatusError("429", request=request, response=response)
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy(attempts=10, base_delay=1.0, max_delay=4.0)
+    delays = [policy.backoff(n) for n in range(8) for _ in range(20)]
+    assert all(0 <= d <= 4.0 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_after_header_overrides_backoff():
+    policy = RetryPolicy(attempts=3, base_delay=100.0)
+    assert policy.next_delay(0, rate_limited("2")) == 2.0
+    assert parse_retry_after("not a date") is None
+
+
+def test_retry_after_beyond_limit_stops_retrying():
+    policy = RetryPolicy(attempts=3, max_retry_after=5.0)
+    assert policy.next_delay(0, rate_limited("120")) is None
+
+
+def test_sync_call_stops_on_non_retryable_error():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise KeyError("nope")
+
+    policy = RetryPolicy(attempts=5, base_delay=0, retryable=lambda e: not isinstance(e, KeyError))
+    with pytest.raises(KeyError):
+        call_with_retry(fn, policy=policy)
+    assert len(calls) == 1
+
+
+def test_sync_decorator_retries_until_success():
+    calls = []
+
+    @retry(attempts=3, delay=0)
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    assert flaky() == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_decorator_retries_until_success():
+    calls = []
+
+    @retry(attempts=2, delay=0)
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 2:
+            raise RuntimeError("transient")
+        return "ok"
+
+    assert await flaky() == "ok"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_budget_caps_retries_to_fraction_of_requests():
+    budget = RetryBudget(ratio=0.1, min_per_second=0, max_tokens=1)
+    policy = RetryPolicy(attempts=3, base_delay=0, budget=budget)
+    attempts = 0
+
+    async def always_fails():
+        nonlocal attempts
+        attempts += 1
+        raise RuntimeError("down")
+
+    for _ in range(20):
+        with pytest.raises(RuntimeError):
+            await acall_with_retry(always_fails, policy=policy)
+
+    assert budget.requests == 20
+    # One initial token plus 0.1 per request, never more
+    assert budget.retries <= 1 + 20 * 0.1
+    assert attempts == 20 + budget.retries
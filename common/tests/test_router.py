@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from common.router import LatencyRouter
+
+
+def test_prefers_faster_target():
+    router = LatencyRouter(["slow", "fast"], rng=random.Random(0))
+    router.record("slow", True, 2.0)
+    router.record("fast", True, 0.1)
+    picks = [router.pick() for _ in range(20)]
+    assert set(picks) == {"fast"}
+
+
+def test_in_flight_load_spreads_traffic():
+    router = LatencyRouter(["a", "b"], rng=random.Random(0))
+    router.record("a", True, 0.1)
+    router.record("b", True, 0.15)
+    router._stats["a"].in_flight = 3
+    assert router.pick() == "b"
+
+
+def test_ejects_failing_target_and_reinstates_after_period(clock):
+    router = LatencyRouter(["bad", "good"], eject_consecutive_failures=2, eject_seconds=10, clock=clock)
+    router.record("bad", False, 0.1)
+    router.record("bad", False, 0.1)
+    assert router.snapshot()["bad"]["ejected"]
+    assert {router.pick() for _ in range(10)} == {"good"}
+
+    clock.now = 10
+    assert router.pick(exclude=["good"]) == "bad"
+    assert not router.snapshot()["bad"]["ejected"]
+
+
+def test_never_ejects_more_than_allowed_fraction():
+    router = LatencyRouter(["a", "b"], eject_consecutive_failures=1)
+    router.record("a", False, 0.1)
+    router.record("b", False, 0.1)
+    snapshot = router.snapshot()
+    assert [snapshot["a"]["ejected"], snapshot["b"]["ejected"]] == [True, False]
+
+
+@pytest.mark.asyncio
+async def test_background_probe_reinstates_recovered_target(clock):
+    healthy = {"flaky": False}
+
+    async def probe(target):
+        if not healthy[target]:
+            raise RuntimeError("still down")
+
+    router = LatencyRouter(["flaky", "ok"], eject_consecutive_failures=1, eject_seconds=5, probe=probe, clock=clock)
+    router.record("flaky", False, 0.1)
+    clock.now = 5
+    await router.probe_ejected()
+    assert router.snapshot()["flaky"]["ejected"]  # failed probe: ejected for longer
+
+    clock.now = 100
+    healthy["flaky"] = True
+    await router.probe_ejected()
+    assert not router.snapshot()["flaky"]["ejected"]
+
+
+def test_order_lists_every_target_once():
+    router = LatencyRouter(["a", "b", "c"])
+    assert sorted(router.order()) == ["a", "b", "c"]
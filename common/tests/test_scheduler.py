@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from common.scheduler import FairScheduler
+
+
+async def fill(scheduler: FairScheduler) -> None:
+    for _ in range(scheduler.concurrency):
+        await scheduler.acquire()
+
+
+async def enqueue(scheduler, order, label, priority=None, tenant=None):
+    async with scheduler.slot(priority, tenant):
+        order.append(label)
+
+
+async def drain(scheduler: FairScheduler, tasks) -> None:
+    await asyncio.sleep(0)  # let every waiter queue up
+    for _ in range(scheduler.concurrency):
+        scheduler.release()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_higher_class_is_dispatched_first():
+    scheduler = FairScheduler(concurrency=1)
+    await fill(scheduler)
+    order = []
+    tasks = [asyncio.create_task(enqueue(scheduler, order, f"batch{i}", "batch")) for i in range(3)]
+    tasks.append(asyncio.create_task(enqueue(scheduler, order, "interactive", "interactive")))
+    await drain(scheduler, tasks)
+    assert order[0] == "interactive"
+    assert order[1:] == ["batch0", "batch1", "batch2"]
+
+
+@pytest.mark.asyncio
+async def test_weighted_fair_share_across_tenants():
+    scheduler = FairScheduler(concurrency=1, weights={"big": 2.0})
+    await fill(scheduler)
+    order = []
+    # The flooding tenant queues first, but only gets its share
+    tasks = [asyncio.create_task(enqueue(scheduler, order, "small", tenant="small")) for _ in range(6)]
+    tasks += [asyncio.create_task(enqueue(scheduler, order, "big", tenant="big")) for _ in range(6)]
+    await drain(scheduler, tasks)
+    assert order[:6].count("big") == 4
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_is_skipped_and_stats_report_wait(clock):
+    scheduler = FairScheduler(concurrency=1, clock=clock)
+    await fill(scheduler)
+    order = []
+    gone = asyncio.create_task(enqueue(scheduler, order, "gone", "batch"))
+    kept = asyncio.create_task(enqueue(scheduler, order, "kept", "batch"))
+    await asyncio.sleep(0)
+    gone.cancel()
+    clock.now = 2.0
+    await drain(scheduler, [kept])
+
+    assert order == ["kept"]
+    batch = scheduler.stats()["classes"]["batch"]
+    assert batch["queued"] == 0
+    assert batch["dispatched"] == 1
+    assert batch["max_wait"] == 2.0
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_do_not_charge_their_tenant():
+    scheduler = FairScheduler(concurrency=1)
+    await fill(scheduler)
+    order = []
+    # Tenant "shed" has a burst of requests time out in the queue...
+    shed = [asyncio.create_task(enqueue(scheduler, order, "gone", tenant="shed")) for _ in range(5)]
+    await asyncio.sleep(0)
+    for task in shed:
+        task.cancel()
+    await asyncio.gather(*shed, return_exceptions=True)
+    # ...and is then served in turn with a tenant that queued before it
+    tasks = [asyncio.create_task(enqueue(scheduler, order, f"other{i}", tenant="other")) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(enqueue(scheduler, order, "shed", tenant="shed")))
+    await drain(scheduler, tasks)
+    assert order == ["other0", "shed", "other1", "other2"]
+    assert scheduler.stats()["classes"]["interactive"]["queued"] == 0
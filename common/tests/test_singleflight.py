@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from common.deadline import DeadlineExceeded, current_deadline, deadline_scope
+from common.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test that waiters on the same key get the result of a single call."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.shared == 4
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_waiter():
+    """Test that a failure is raised in every waiter."""
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(flight.do("k", fn) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Test that one waiter leaving leaves the call running for the others."""
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    leaving = asyncio.ensure_future(flight.do("k", fn))
+    staying = asyncio.ensure_future(flight.do("k", fn))
+    await asyncio.sleep(0.01)
+    leaving.cancel()
+
+    assert await staying == "done"
+    assert leaving.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_last_waiter_leaving_cancels_call():
+    """Test that the shared call is cancelled once nobody is waiting."""
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def fn():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.ensure_future(flight.do("k", fn))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_call_does_not_inherit_the_first_callers_deadline():
+    """Test that a waiter's deadline ends only its own wait, not the shared call."""
+    flight = SingleFlight()
+    seen = []
+
+    async def fn():
+        seen.append(current_deadline())
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def impatient():
+        with deadline_scope(0.01):
+            return await flight.do("k", fn)
+
+    results = await asyncio.gather(impatient(), flight.do("k", fn), return_exceptions=True)
+
+    assert isinstance(results[0], DeadlineExceeded)
+    assert results[1] == "done"
+    assert seen == [None]
@@ -0,0 +1,95 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from common.sqlite_cache import SQLiteCache, content_key, decode_value, encode_value
+
+
+def test_encoding_round_trips_and_compresses_large_values():
+    small = {"summary": "short"}
+    large = {"summary": "word " * 500}
+    assert decode_value(encode_value(small)) == small
+    assert decode_value(encode_value(large)) == large
+    assert len(encode_value(large)) < len("word " * 500)
+
+
+def test_content_key_depends_on_every_part():
+    assert content_key("model", "text") == content_key("model", "text")
+    assert content_key("model", "text") != content_key("model", "text2")
+    assert content_key("a", "bc") != content_key("ab", "c")
+    assert len(content_key("x")) == 32
+
+
+def test_cache_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = SQLiteCache(path)
+    reader = SQLiteCache(path)
+    writer.set(content_key("k"), {"summary": "hello"})
+
+    assert reader.get(content_key("k")) == {"summary": "hello"}
+    assert reader.get(content_key("other")) is None
+    assert reader.stats()["entries"] == 1
+    assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl_seconds=10, clock=clock)
+    cache.set(b"k", "v")
+    clock.now += 9
+    assert cache.get(b"k") == "v"
+    clock.now += 2
+    assert cache.get(b"k") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), max_entries=2, touch_interval=0, clock=clock)
+    cache.set(b"a", "1")
+    clock.now += 1
+    cache.set(b"b", "2")
+    clock.now += 1
+    assert cache.get(b"a") == "1"  # "b" is now the least recently used
+    clock.now += 1
+    cache.set(b"c", "3")
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == "1"
+    assert cache.get(b"c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_bound_is_enforced(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), max_bytes=100, clock=clock)
+    for i in range(10):
+        clock.now += 1
+        cache.set(bytes([i]), "x" * 30)
+    stats = cache.stats()
+    assert stats["bytes"] <= 100
+    assert cache.get(bytes([9])) == "x" * 30
+
+
+@pytest.mark.asyncio
+async def test_write_waiting_for_the_lock_does_not_stall_the_event_loop(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, busy_timeout=0.3)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")  # another process is writing
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.ensure_future(tick())
+    await cache.aset(b"k", "v")
+    ticker.cancel()
+    holder.execute("ROLLBACK")
+
+    assert ticks >= 10
+    assert cache.stats()["errors"] == 1  # the write was dropped, not the loop
+    await cache.aset(b"k", "v")
+    assert cache.get(b"k") == "v"